@@ -7,14 +7,25 @@ __project__ = 'django-starter'
 
 import argparse
 import json
+import shlex
+import subprocess
 import sys
+import tarfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from dataclasses import dataclass
+from datetime import datetime
+from fnmatch import fnmatch
+from hashlib import sha256
+from io import StringIO
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Optional, List
+from time import time
+from typing import Optional, List, Dict, Callable, Union
 
 from fabric import Connection, Config
-from invoke import UnexpectedExit, run
+from invoke import Context, UnexpectedExit, run
 
 from django_starter.enums import Environment
 
@@ -24,6 +35,21 @@ ENVIRONMENT_OPTIONS_NAMES = '|'.join(it.name for it in ENVIRONMENT_OPTIONS)
 SCRIPT_DIR = Path(__file__).absolute().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 DJANGO_DIR = PROJECT_ROOT.joinpath('django')
+MANIFEST_FILE_NAME = '.deploy-manifest.json'
+
+# Release deployments
+LOCAL_HOST = 'local'  # runs the remote commands locally, stand-in for tests without ssh
+KEEP_RELEASES = 5
+# Not part of a release, linked from `<projectDir>/shared` into each release. Each release has its own `.venv`, so
+# installing doesn't change the environment of the running release and previous releases stay runnable (rollback).
+SHARED_PATHS = [
+    '.env',
+    f'{DJANGO_DIR.name}/django_starter/secret.txt',
+    f'{DJANGO_DIR.name}/django_starter/settings_local.py',
+]
+# Run in the directory of a new release (the django directory for migrations)
+INSTALL_COMMAND = 'POETRY_VIRTUALENVS_IN_PROJECT=true poetry install --no-dev && poetry check -q'
+MIGRATE_COMMAND = 'poetry run python manage.py migrate'
 
 
 @dataclass
@@ -31,8 +57,15 @@ class DeploymentConfig:
     hostname: str
     project_root: str
     django_root: str
+    # gunicorn master pid file (relative to the django root), enables zero-downtime reloads
+    pid_file: Optional[str] = None
+    # Deploy into `releases/<id>` and switch the `current` symlink (configs listing `hosts`)
+    releases: bool = False
+
+    def connection(self, config: Optional[Config] = None) -> Union[Connection, Context]:
+        if self.hostname == LOCAL_HOST:
+            return Context(config=config)
 
-    def connection(self, config: Optional[Config] = None) -> Connection:
         return Connection(self.hostname, config=config)
 
 
@@ -42,7 +75,7 @@ def fatal_error(message: str, stop: bool = True):
         exit(1)
 
 
-def get_config(env: Environment) -> DeploymentConfig:
+def get_configs(env: Environment) -> List[DeploymentConfig]:
     config_file_path = Path(DJANGO_DIR.joinpath(f'deploy_{env.name}.json'))
     if not config_file_path.exists():
         fatal_error(f'Config file missing for environment: {config_file_path.relative_to(DJANGO_DIR)}')
@@ -50,10 +83,30 @@ def get_config(env: Environment) -> DeploymentConfig:
     with config_file_path.open('r') as f:
         data = json.load(f)
 
-    return DeploymentConfig(
-        hostname=data['hostName'],
+    return [DeploymentConfig(
+        hostname=hostname,
         project_root=data['projectDir'],
-        django_root=data['djangoDir'])
+        django_root=data['djangoDir'],
+        pid_file=data.get('pidFile'),
+        releases='hosts' in data,
+    ) for hostname in data.get('hosts') or [data['hostName']]]
+
+
+def tracked_file_paths() -> List[Path]:
+    """
+    :return: Paths relative to `PROJECT_ROOT` of all files to deploy
+    """
+    git_tracked_path = run(f'cd {PROJECT_ROOT} && git ls-files', hide=True).stdout
+    file_paths = [PROJECT_ROOT.joinpath(it) for it in git_tracked_path.split('\n') if it.strip()]
+    api_doc_files = [it for it in DJANGO_DIR.glob('api_*.html')]
+    assert api_doc_files, 'Missing compiled api doc files!'
+    file_paths += api_doc_files
+    invalid_paths = [str(it) for it in file_paths if not it.exists()]
+    if invalid_paths:
+        invalid_paths_formatted = '\n'.join(invalid_paths)
+        fatal_error(f'Some paths are invalid:\n{invalid_paths_formatted}')
+
+    return sorted([it.relative_to(PROJECT_ROOT) for it in file_paths])
 
 
 # Fabric Functions
@@ -70,6 +123,34 @@ def path_exists(connection: Connection, path: str) -> bool:
         return False
 
 
+def rsync_paths(
+    connection: Connection, config: DeploymentConfig, file_paths: List[Path], exclude_file: Path, dry_run: bool,
+    verbose: bool
+):
+    with NamedTemporaryFile() as whitelist_file:
+        whitelist_file.write('\n'.join(str(it) for it in file_paths).encode())
+        whitelist_file.seek(0)
+
+        if verbose:
+            print(f'--file-from={whitelist_file.name}')
+            whitelist_file_content = whitelist_file.read()
+            print(whitelist_file_content.decode())
+            whitelist_file.seek(0)
+
+            print(f'--exclude-from={exclude_file}')
+            with exclude_file.open('r') as f:
+                print(f.read())
+
+        rsync_args = [f'--files-from={whitelist_file.name}']
+        rsync_args += [f'--exclude-from={exclude_file}']
+        rsync_command = f'rsync -avh{"n" if dry_run else ""} ' \
+                        f'{" ".join(rsync_args)} {PROJECT_ROOT} {config.hostname}:{config.project_root}'
+
+        if verbose:
+            print(rsync_command)
+        connection.local(rsync_command)
+
+
 def sync_paths(connection: Connection, files: List[Path], source_dir: Path, remote_dir: str, dry_run: bool):
     for path in files:
         remote_path = f'{remote_dir}/{path.relative_to(source_dir)}'
@@ -79,11 +160,288 @@ def sync_paths(connection: Connection, files: List[Path], source_dir: Path, remo
             connection.put(path, remote=remote_path)
 
 
+# Delta Deployment
+
+def read_exclude_patterns(exclude_file: Path) -> List[str]:
+    if not exclude_file.is_file():
+        return []
+
+    with exclude_file.open('r') as f:
+        return [it.strip() for it in f.readlines() if it.strip() and not it.startswith('#')]
+
+
+def is_excluded(path: Path, patterns: List[str]) -> bool:
+    """
+    Approximates rsync exclude patterns: patterns containing a slash match the whole path,
+    others any path component
+    """
+    for pattern in patterns:
+        pattern = pattern.rstrip('/')
+        if '/' in pattern:
+            if fnmatch(path.as_posix(), pattern.lstrip('/')):
+                return True
+        elif any(fnmatch(part, pattern) for part in path.parts):
+            return True
+
+    return False
+
+
+def sha256_from_file(file_path: Path) -> str:
+    file_hash = sha256()
+    with file_path.open('rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def build_manifest(file_paths: List[Path], root: Path) -> Dict[str, str]:
+    """
+    :return: sha256 hash per path relative to `root` (hashed in parallel, hashlib releases the GIL)
+    """
+    with ThreadPoolExecutor() as executor:
+        hashes = executor.map(sha256_from_file, [root.joinpath(it) for it in file_paths])
+
+    return {it.as_posix(): file_hash for it, file_hash in zip(file_paths, hashes)}
+
+
+def remote_manifest(connection: Connection, project_root: str) -> Dict[str, str]:
+    """
+    Manifest of the last deployment, empty if there was none (first delta deployment transfers all files)
+    """
+    try:
+        result = connection.run(f'cat "{project_root}/{MANIFEST_FILE_NAME}"', hide=True)
+        return json.loads(result.stdout)
+    except (UnexpectedExit, json.JSONDecodeError):
+        return {}
+
+
+def upload_archive(hostname: str, project_root: str, file_paths: List[str], source_dir: Path):
+    """
+    Streams `file_paths` as one gzip compressed tar archive through a single ssh connection
+    """
+    with subprocess.Popen(host_command(hostname, f'tar xzf - -C "{project_root}"'), stdin=subprocess.PIPE) as process:
+        with tarfile.open(fileobj=process.stdin, mode='w|gz') as archive:
+            for path in file_paths:
+                archive.add(str(source_dir.joinpath(path)), arcname=path, recursive=False)
+        process.stdin.close()
+        if process.wait() != 0:
+            fatal_error('Uploading the archive failed.')
+
+
+def verify_remote_hashes(connection: Connection, project_root: str, manifest: Dict[str, str]) -> bool:
+    checklist = ''.join(f'{file_hash}  {path}\n' for path, file_hash in manifest.items())
+    try:
+        return connection.run(f'cd "{project_root}" && sha256sum --quiet -c -', in_stream=StringIO(checklist),
+                              hide=True).ok
+    except UnexpectedExit as e:
+        print(e.result.stdout, file=sys.stderr)
+        return False
+
+
+def delta_sync(
+    connection: Connection, config: DeploymentConfig, file_paths: List[Path], exclude_file: Path, dry_run: bool,
+    verbose: bool
+):
+    """
+    Transfers the files whose content hash differs from the manifest of the last deployment, verifies them remotely
+    and stores the new manifest. Files removed locally are not deleted on the server.
+    """
+    start = time()
+    patterns = read_exclude_patterns(exclude_file)
+    file_paths = [it for it in file_paths if not is_excluded(it, patterns)]
+    manifest = build_manifest(file_paths, PROJECT_ROOT)
+    deployed_manifest = remote_manifest(connection, config.project_root)
+    changed = [path for path, file_hash in manifest.items() if deployed_manifest.get(path) != file_hash]
+    changed_size = sum(PROJECT_ROOT.joinpath(it).stat().st_size for it in changed)
+    print(f'{len(changed)}/{len(manifest)} files changed ({changed_size / 1024:.1f} KiB), '
+          f'hashed in {time() - start:.2f}s')
+    if verbose or dry_run:
+        print('\n'.join(changed))
+    if dry_run or not changed:
+        return
+
+    start = time()
+    upload_archive(config.hostname, config.project_root, changed, PROJECT_ROOT)
+    if not verify_remote_hashes(connection, config.project_root, {it: manifest[it] for it in changed}):
+        fatal_error('Hash verification of the transferred files failed.')
+
+    connection.run(f'cat > "{config.project_root}/{MANIFEST_FILE_NAME}"', in_stream=StringIO(json.dumps(manifest)),
+                   hide=True)
+    print(f'Transferred and verified in {time() - start:.2f}s')
+
+
+# Release Deployment
+
+class DeploymentError(Exception):
+    pass
+
+
+StepTimings = Dict[str, Dict[str, float]]
+
+
+@contextmanager
+def timed(timings: StepTimings, host: str, step: str):
+    start = time()
+    try:
+        yield
+    finally:
+        timings[host][step] = time() - start
+
+
+def host_command(hostname: str, command: str) -> List[str]:
+    if hostname == LOCAL_HOST:
+        return ['bash', '-c', command]
+
+    return ['ssh', hostname, f'bash --login -c {shlex.quote(command)}']
+
+
+def run_on_host(hostname: str, command: str, stdin_path: Optional[Path] = None, verbose: bool = False):
+    """
+    :raises DeploymentError
+    """
+    if verbose:
+        print(f'{hostname}: {command}')
+
+    stdin = stdin_path.open('rb') if stdin_path else None
+    try:
+        result = subprocess.run(host_command(hostname, command), stdin=stdin or subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    finally:
+        if stdin:
+            stdin.close()
+    if verbose and result.stdout:
+        print(result.stdout)
+    if result.returncode != 0:
+        raise DeploymentError(f'{command}\n{result.stdout}')
+
+
+def run_parallel(func: Callable[[DeploymentConfig], None], configs: List[DeploymentConfig], workers: int):
+    """
+    Runs `func` for each host with at most `workers` hosts at a time
+
+    :raises DeploymentError: if any host failed, after all hosts finished
+    """
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {executor.submit(func, it): it.hostname for it in configs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except DeploymentError as e:
+                errors[futures[future]] = e
+
+    if errors:
+        raise DeploymentError('\n'.join(f'[{host}] {error}' for host, error in errors.items()))
+
+
+def build_locally(verbose: bool) -> List[Path]:
+    """
+    Compiles messages and collects static files once for all hosts
+
+    :return: the built files relative to `PROJECT_ROOT`
+    """
+    run(f'cd {DJANGO_DIR} && python manage.py compilemessages --ignore .venv'
+        f' && DJANGO_STATIC_MANIFEST=1 python manage.py collectstatic --noinput --clear', hide=not verbose)
+    built_files = [it for it in DJANGO_DIR.rglob('*.mo') if '.venv' not in it.parts]
+    built_files += [it for it in DJANGO_DIR.joinpath('static').rglob('*') if it.is_file()]
+    return sorted(it.relative_to(PROJECT_ROOT) for it in built_files)
+
+
+def create_archive(archive_path: Path, file_paths: List[Path], source_dir: Path):
+    with tarfile.open(str(archive_path), mode='w:gz') as archive:
+        for path in file_paths:
+            archive.add(str(source_dir.joinpath(path)), arcname=path.as_posix(), recursive=False)
+
+
+def deploy_release(
+    configs: List[DeploymentConfig], file_paths: List[Path], exclude_file: Path, dry_run: bool, verbose: bool,
+    workers: int, release: Optional[str] = None
+):
+    """
+    Deploys to all hosts concurrently:
+
+    1. build (compilemessages, collectstatic) and archive once locally
+    2. per host: upload and extract into `releases/<id>`, link shared paths, `poetry install` into `releases/<id>/.venv`
+    3. migrate on the first host
+    4. per host: switch the `current` symlink atomically (rename) and reload
+
+    The symlinks are only switched if all hosts have been prepared successfully.
+    """
+    timings: StepTimings = defaultdict(dict)
+    release = release or datetime.now().strftime('%Y%m%d%H%M%S')
+    patterns = read_exclude_patterns(exclude_file)
+
+    with timed(timings, LOCAL_HOST, 'build'):
+        file_paths = [it for it in file_paths if not is_excluded(it, patterns)] + build_locally(verbose)
+
+    with NamedTemporaryFile(suffix='.tar.gz') as archive_file:
+        archive_path = Path(archive_file.name)
+        with timed(timings, LOCAL_HOST, 'archive'):
+            create_archive(archive_path, file_paths, PROJECT_ROOT)
+        print(f'Release {release}: {len(file_paths)} files, {archive_path.stat().st_size / 1024:.1f} KiB archive')
+        if dry_run:
+            return
+
+        def release_dir(config: DeploymentConfig) -> str:
+            return f'{config.project_root}/releases/{release}'
+
+        def prepare(config: DeploymentConfig):
+            host, directory = config.hostname, release_dir(config)
+            with timed(timings, host, 'upload'):
+                run_on_host(host, f'mkdir -p "{directory}" && tar xzf - -C "{directory}"', archive_path, verbose)
+            with timed(timings, host, 'link'):
+                run_on_host(host, ' && '.join(
+                    f'mkdir -p "$(dirname "{directory}/{it}")" && ln -sfn "{config.project_root}/shared/{it}" '
+                    f'"{directory}/{it}"' for it in SHARED_PATHS), verbose=verbose)
+            with timed(timings, host, 'install'):
+                run_on_host(host, f'cd "{directory}" && {INSTALL_COMMAND}', verbose=verbose)
+
+        def activate(config: DeploymentConfig):
+            host = config.hostname
+            with timed(timings, host, 'switch'):
+                run_on_host(host, f'cd "{config.project_root}" && ln -sfn "releases/{release}" current.new'
+                                  ' && mv -T current.new current', verbose=verbose)
+            with timed(timings, host, 'reload'):
+                run_on_host(host, f'cd "{config.project_root}/current/{DJANGO_DIR.name}"'
+                                  f' && bash reload.sh {config.pid_file or ""}', verbose=verbose)
+            with timed(timings, host, 'cleanup'):
+                run_on_host(host, f'cd "{config.project_root}/releases"'
+                                  f' && ls -1t | tail -n +{KEEP_RELEASES + 1} | xargs -r rm -rf', verbose=verbose)
+
+        try:
+            run_parallel(prepare, configs, workers)
+            primary = configs[0]
+            with timed(timings, primary.hostname, 'migrate'):
+                run_on_host(primary.hostname, f'cd "{release_dir(primary)}/{DJANGO_DIR.name}"'
+                                              f' && {MIGRATE_COMMAND}', verbose=verbose)
+            run_parallel(activate, configs, workers)
+        except DeploymentError as e:
+            print_timings(timings)
+            fatal_error(f'Deployment of release {release} failed:\n{e}')
+
+    print_timings(timings)
+
+
+def print_timings(timings: StepTimings):
+    steps = list(dict.fromkeys(step for it in timings.values() for step in it))
+    padding = max(len(it) for it in timings) + 2
+    print(f'{"":<{padding}}' + ''.join(f'{it:>10}' for it in steps) + f'{"total":>10}')
+    for host, host_timings in timings.items():
+        print(f'{host:<{padding}}' + ''.join(
+            f'{host_timings[it]:>9.2f}s' if it in host_timings else f'{"-":>10}' for it in steps
+        ) + f'{sum(host_timings.values()):>9.2f}s')
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Django Deployment Script')
     parser.add_argument('environment', type=str, help=f'Target environment ({ENVIRONMENT_OPTIONS_NAMES})')
     parser.add_argument('-n', '--dry-run', action='store_true')
     parser.add_argument('-v', '--verbose', action='store_true')
+    parser.add_argument('-d', '--delta', action='store_true',
+                        help='Transfer only files changed since the last deployment (content hash manifest)')
+    parser.add_argument('-w', '--workers', type=int, default=8,
+                        help='Hosts deployed concurrently (for configs with `hosts`)')
     args = parser.parse_args()
 
     environment_name = args.environment
@@ -92,12 +450,28 @@ if __name__ == '__main__':
         fatal_error(f'Invalid environment specified! ({ENVIRONMENT_OPTIONS_NAMES})')
     dry_run_mode = args.dry_run
     verbose = args.verbose
+    delta_mode = args.delta
 
     print(f'Loading config for: {environment.value}')
-    dc = get_config(environment)
-    print(f'Host: {dc.hostname}')
+    configs = get_configs(environment)
+    dc = configs[0]
+    print(f'Host: {", ".join(it.hostname for it in configs)}')
     print(f'Project: {dc.project_root}')
     print(f'Django: {dc.django_root}')
+    exclude_file = PROJECT_ROOT.joinpath(".rsync", "exclude")
+
+    if dc.releases:
+        if not dry_run_mode:
+            print()
+            choice = input(f'Continue deployment to {len(configs)} host(s)? (Y/n) ')
+            if choice.lower() == 'n':
+                fatal_error('Deployment aborted.')
+
+        print('Starting Deployment.')
+        deploy_release(configs, tracked_file_paths(), exclude_file, dry_run_mode, verbose, args.workers)
+        print('Finished Deployment.')
+        exit(0)
+
     c = dc.connection()
 
     # Pre Checks
@@ -120,53 +494,24 @@ if __name__ == '__main__':
     # Deployment
     print('Starting Deployment.')
     print('Syncing Files...')
-    git_tracked_path = run(f'cd {PROJECT_ROOT} && git ls-files', hide=True).stdout
-    file_paths = [PROJECT_ROOT.joinpath(it) for it in git_tracked_path.split('\n') if it.strip()]
-    api_doc_files = [it for it in DJANGO_DIR.glob('api_*.html')]
-    assert api_doc_files, 'Missing compiled api doc files!'
-    file_paths += api_doc_files
-    invalid_paths = [str(it) for it in file_paths if not it.exists()]
-    if invalid_paths:
-        invalid_paths_formatted = '\n'.join(invalid_paths)
-        fatal_error(f'Some paths are invalid:\n{invalid_paths_formatted}')
-
-    file_paths = sorted([it.relative_to(PROJECT_ROOT) for it in file_paths])
-    with NamedTemporaryFile() as whitelist_file:
-        whitelist_file.write('\n'.join(str(it) for it in file_paths).encode())
-        whitelist_file.seek(0)
-        exclude_file = PROJECT_ROOT.joinpath(".rsync", "exclude")
+    file_paths = tracked_file_paths()
+    if delta_mode:
+        delta_sync(c, dc, file_paths, exclude_file, dry_run_mode, verbose)
+    else:
+        rsync_paths(c, dc, file_paths, exclude_file, dry_run_mode, verbose)
+
+    ssh_command = f'ssh -A {dc.hostname} "bash --login -c \\"' \
+                  f'cd {dc.project_root}' \
+                  ' && poetry install --no-dev && poetry check -q' \
+                  ' && cd django' \
+                  ' && poetry run python manage.py migrate' \
+                  ' && poetry run python manage.py compilemessages' \
+                  ' && poetry run python manage.py collectstatic --noinput' \
+                  f' && bash reload.sh {dc.pid_file or ""}' \
+                  '\\""'
+    if verbose:
+        print(ssh_command)
 
-        if verbose:
-            print(f'--file-from={whitelist_file.name}')
-            whitelist_file_content = whitelist_file.read()
-            print(whitelist_file_content.decode())
-            whitelist_file.seek(0)
-
-            print(f'--exclude-from={exclude_file}')
-            with exclude_file.open('r') as f:
-                print(f.read())
-
-        rsync_args = [f'--files-from={whitelist_file.name}']
-        rsync_args += [f'--exclude-from={exclude_file}']
-        rsync_command = f'rsync -avh{"n" if dry_run_mode else ""} ' \
-                        f'{" ".join(rsync_args)} {PROJECT_ROOT} {dc.hostname}:{dc.project_root}'
-
-        if verbose:
-            print(rsync_command)
-        c.local(rsync_command)
-
-        ssh_command = f'ssh -A {dc.hostname} "bash --login -c \\"' \
-                      f'cd {dc.project_root}' \
-                      ' && poetry install --no-dev && poetry check -q' \
-                      ' && cd django' \
-                      ' && poetry run python manage.py migrate' \
-                      ' && poetry run python manage.py compilemessages' \
-                      ' && poetry run python manage.py collectstatic --noinput' \
-                      ' && touch django_starter/wsgi.py || (echo \'touch failed\' && exit 1)' \
-                      '\\""'
-        if verbose:
-            print(ssh_command)
-
-        if not dry_run_mode:
-            c.local(ssh_command)
-        print('Finished Deployment.')
+    if not dry_run_mode:
+        c.local(ssh_command)
+    print('Finished Deployment.')
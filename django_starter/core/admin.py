@@ -7,8 +7,9 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
 from core.models import User
+from django_starter.admin import LargeTableAdminMixin
 
 
 @admin.register(User)
-class AuthorAdmin(UserAdmin):
+class AuthorAdmin(LargeTableAdminMixin, UserAdmin):
     pass
@@ -4,10 +4,12 @@ __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
-        pass
+        from django_starter.throttling import check_throttle_cache
+        checks.register(check_throttle_cache, checks.Tags.caches, deploy=True)
@@ -0,0 +1,84 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from datetime import datetime, timedelta
+from itertools import count
+from typing import List, Callable, Any
+
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils.timezone import utc
+
+from core.models import User
+from core.templatetags.humanize_extras import intword_or_comma, naturaldaytimes
+from core.views import index
+from django_starter.benchmark import Benchmark
+from django_starter.data_view_utils import SuccessErrorJsonResponse
+from django_starter.enums import Environment
+from django_starter.utils import gettype, compile_gettype
+from django_starter.uuids import uuid7_batch
+
+BENCHMARK_USERS = 1000
+
+
+def create_data():
+    """
+    Users of the query benchmarks, every 10th soft deleted
+    """
+    users = User.objects.bulk_create([
+        User(id=key, username=f'bench{i}', email=f'bench{i}@example.com')
+        for i, key in enumerate(uuid7_batch(BENCHMARK_USERS))
+    ])
+    User.objects.filter(pk__in=[it.pk for it in users[::10]]).delete()
+
+
+def rolled_back(func: Callable[[], Any]) -> Callable[[], None]:
+    """
+    Runs `func` in a transaction which is rolled back, for benchmarks which write
+    """
+    def wrapper():
+        with transaction.atomic():
+            func()
+            transaction.set_rollback(True)
+
+    return wrapper
+
+
+def suite() -> List[Benchmark]:
+    """
+    The hot paths of the project, `manage.py bench` runs them with test databases (see `create_data`)
+    """
+    payload = {'name': 'a', 'count': 3, 'active': True}
+    get_count = compile_gettype('count', (int, float))
+    request = RequestFactory().get('/')
+    now = datetime.now(utc)
+    times = [now - timedelta(minutes=i * 37) for i in range(100)]
+    usernames = count()
+
+    def bulk_create():
+        User.objects.bulk_create([User(username=f'bulk{next(usernames)}') for _ in range(100)])
+
+    return [
+        Benchmark('enum from_value', lambda: Environment.from_value('production'), number=100_000),
+        Benchmark('enum from_key', lambda: Environment.from_key('production'), number=100_000),
+        Benchmark('enum localized_value (de)', lambda: Environment.production.localized_value, number=100_000,
+                  language='de'),
+        Benchmark('gettype (dict)', lambda: gettype(payload, 'count', (int, float)), number=100_000),
+        Benchmark('compile_gettype (dict)', lambda: get_count(payload), number=100_000),
+        Benchmark('SuccessErrorJsonResponse data', lambda: SuccessErrorJsonResponse(data={'items': list(range(20))}),
+                  number=10_000),
+        Benchmark('SuccessErrorJsonResponse error', lambda: SuccessErrorJsonResponse(error='invalid'), number=10_000),
+        Benchmark('render index.html', lambda: index(request), number=1000),
+        Benchmark('render index.html (de)', lambda: index(request), number=1000, language='de'),
+        Benchmark('intword_or_comma', lambda: intword_or_comma(123_456_789), number=100_000),
+        Benchmark('naturaldaytimes (100)', lambda: naturaldaytimes(times), number=100),
+        Benchmark('User count (active)', lambda: User.objects.count(), number=200, tolerance=0.5),
+        Benchmark('User page of 50 (active)', lambda: list(User.objects.order_by('-created_on', '-id')[:50]),
+                  number=200, tolerance=0.5),
+        Benchmark('User get by username', lambda: User.objects.get(username='bench1'), number=200, tolerance=0.5),
+        Benchmark('User count (with deleted)', lambda: User.objects.all_with_deleted().count(), number=200,
+                  tolerance=0.5),
+        Benchmark('User bulk_create (100)', rolled_back(bulk_create), number=20, tolerance=0.5),
+    ]
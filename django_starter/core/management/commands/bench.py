@@ -0,0 +1,76 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.test.utils import setup_databases, teardown_databases, override_settings
+
+from core.benchmarks import suite, create_data
+from django_starter.benchmark import save_baseline, load_baseline, compare, machine
+from django_starter.utils import LogCommand
+
+
+class Command(LogCommand):
+    help = 'Runs the benchmark suite of the hot paths (`core.benchmarks`) with test databases and compares it with ' \
+           'the JSON baseline (`settings.BENCHMARK_BASELINE`)'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--baseline', type=Path, help='Baseline file (defaults to settings.BENCHMARK_BASELINE)')
+        parser.add_argument('--save', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--check', action='store_true', help='Fail if a benchmark regressed')
+        parser.add_argument('--tolerance', type=float,
+                            help='Allowed slowdown, e.g. 0.2 for 20%% (defaults to settings.BENCHMARK_TOLERANCE)')
+        parser.add_argument('--filter', type=str, help='Only run benchmarks whose label contains this')
+        parser.add_argument('--scale', type=float, default=1, help='Factor of the calls per round, e.g. 0.1')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test databases between runs')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        path = options['baseline'] or Path(settings.BENCHMARK_BASELINE)
+        tolerance = options['tolerance'] if options['tolerance'] is not None else settings.BENCHMARK_TOLERANCE
+        if options['check'] and not options['save'] and not path.is_file():
+            raise CommandError(f'No baseline at {path}, create it with --save')
+        if options['save'] and options['scale'] != 1:
+            raise CommandError('--scale changes the precision of the results, save baselines without it')
+        if options['save'] and options['filter'] and path.is_file() and load_baseline(path).get('machine') != machine():
+            raise CommandError(f'The baseline {path} was created on another machine or Python version, '
+                               f'save all benchmarks without --filter')
+
+        # Test databases with the same data for each run, no query log
+        with override_settings(DEBUG=False):
+            old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+            try:
+                create_data()
+                benchmarks = [it for it in suite() if not options['filter'] or options['filter'] in it.label]
+                results = []
+                for it in benchmarks:
+                    results.append(it.run(options['scale']))
+                    self.stdout.write(str(results[-1]))
+            finally:
+                teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+        regressions = []
+        if path.is_file():
+            baseline = load_baseline(path)
+            if baseline.get('machine') != machine():
+                self.stderr.write(f'The baseline {path} was created on another machine or Python version: '
+                                  f'{baseline.get("machine")}')
+            self.stdout.write(f'\nCompared with {path} ({baseline.get("created")}), tolerance {tolerance:.0%}')
+            comparisons = compare(results, baseline, tolerance, {it.label: it.tolerance for it in benchmarks
+                                                                 if it.tolerance is not None})
+            for it in comparisons:
+                self.stdout.write(str(it))
+            regressions = [it for it in comparisons if it.regressed]
+
+        if options['save']:
+            # Results of benchmarks excluded by --filter are kept
+            save_baseline(path, results, merge=bool(options['filter']))
+            self.stdout.write(f'\nSaved the baseline to {path}')
+        elif regressions and options['check']:
+            labels = ', '.join(it.label for it in regressions)
+            raise CommandError(f'{len(regressions)} benchmark(s) regressed: {labels}')
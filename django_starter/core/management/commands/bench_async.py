@@ -0,0 +1,53 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from importlib import reload
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+from django_starter.benchmark import wsgi_load, asgi_load
+from django_starter.utils import LogCommand
+
+
+def reload_urls():
+    import core.urls
+    import django_starter.urls
+
+    clear_url_caches()
+    reload(core.urls)
+    reload(django_starter.urls)
+
+
+class Command(LogCommand):
+    help = 'Compares requests/s and latency of the WSGI and ASGI handlers with sync and async views. ' \
+           'Use staging/production settings, DEBUG adds sync-only middleware.'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--path', type=str, default='/')
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=100)
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        path, requests, concurrency = options['path'], options['requests'], options['concurrency']
+        self.stdout.write(f'{requests} requests to {path} at concurrency {concurrency}')
+
+        wsgi_application = get_wsgi_application()
+        asgi_application = get_asgi_application()
+        try:
+            for async_views in [False, True]:
+                with override_settings(ASYNC_VIEWS=async_views):
+                    reload_urls()
+                    views = 'async' if async_views else 'sync'
+                    self.stdout.write(str(wsgi_load(f'WSGI {views} views', wsgi_application,
+                                                    path, requests, concurrency)))
+                    self.stdout.write(str(asgi_load(f'ASGI {views} views', asgi_application,
+                                                    path, requests, concurrency)))
+        finally:
+            reload_urls()
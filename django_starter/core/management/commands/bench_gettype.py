@@ -0,0 +1,67 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import collections.abc
+from types import SimpleNamespace
+
+from django_starter.benchmark import benchmark
+from django_starter.utils import LogCommand, gettype, compile_gettype, compile_gettypes, gettypes
+
+
+def previous_gettype(instance, key, allowed_types, default=None):
+    # The previous implementation (`collections.Iterable` was removed in Python 3.10)
+    if isinstance(instance, object):
+        value = getattr(instance, key, default)
+    else:
+        value = instance.get(key, default)
+
+    iterable_types = (set, tuple, list, collections.abc.Iterable)
+    types = tuple(allowed_types) if isinstance(allowed_types, iterable_types) else (allowed_types, )
+    is_bool = isinstance(value, bool)
+    if is_bool and bool not in types:
+        has_valid_type = False
+    else:
+        has_valid_type = isinstance(value, types)
+
+    return value if has_valid_type else (default if default is not None else None)
+
+
+class Command(LogCommand):
+    help = 'Compares gettype with the compiled and batch variants'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--number', type=int, default=100_000, help='Calls per round')
+        parser.add_argument('--records', type=int, default=1000, help='Records per batch')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        number = options['number']
+        spec = {'name': str, 'count': (int, float), 'active': bool, 'tags': [list, tuple]}
+        payload = {'name': 'a', 'count': 3, 'active': True, 'tags': ['x']}
+        instance = SimpleNamespace(**payload)
+
+        def run(label: str, func, n: int = number):
+            self.stdout.write(str(benchmark(label, func, number=n)))
+
+        run('previous gettype (object)', lambda: previous_gettype(instance, 'count', (int, float)))
+        run('gettype (object)', lambda: gettype(instance, 'count', (int, float)))
+        run('gettype (dict)', lambda: gettype(payload, 'count', (int, float)))
+        get_count = compile_gettype('count', (int, float))
+        run('compile_gettype (dict)', lambda: get_count(payload))
+
+        records = [dict(payload, count=i) for i in range(options['records'])]
+        batch_number = max(number // options['records'] // len(spec), 10)
+        label = f'{len(records)} records x {len(spec)} fields'
+        objects = [SimpleNamespace(**it) for it in records]
+        run(f'previous gettype ({label}, objects)', lambda: [
+            {key: previous_gettype(it, key, types) for key, types in spec.items()} for it in objects
+        ], batch_number)
+        run(f'gettype ({label})', lambda: [
+            {key: gettype(it, key, types) for key, types in spec.items()} for it in records
+        ], batch_number)
+        validate = compile_gettypes(spec)
+        run(f'compile_gettypes ({label})', lambda: [validate(it) for it in records], batch_number)
+        run(f'gettypes ({label})', lambda: gettypes(records, spec), batch_number)
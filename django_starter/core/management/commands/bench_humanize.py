@@ -0,0 +1,75 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from datetime import datetime, date, timedelta
+from random import Random
+
+from django.contrib.humanize.templatetags.humanize import intcomma, intword, naturaltime, naturalday
+from django.template import Template, Context
+from django.utils import timezone
+
+from core.templatetags.humanize_extras import intword_or_comma, naturaldaytime, intwords_or_commas, naturaldaytimes
+from django_starter.benchmark import benchmark
+from django_starter.utils import LogCommand
+
+
+def previous_intword_or_comma(value, use_l10n=True) -> str:
+    if value is None:
+        return '-'
+
+    if not value or value < 1_000_000:
+        return intcomma(value, use_l10n=use_l10n)
+    else:
+        return intword(value)
+
+
+def previous_naturaldaytime(value, arg=None) -> str:
+    tzinfo = getattr(value, 'tzinfo', None)
+    value_date = date(value.year, value.month, value.day)
+    today = datetime.now(tzinfo).date()
+    delta = value_date - today
+    if delta.days == 0:
+        return naturaltime(value)
+    else:
+        return f'{naturalday(value, arg=arg)} {naturaltime(value)}'
+
+
+class Command(LogCommand):
+    help = 'Measures rendering a table of numbers and timestamps with the humanize filters'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--cells', type=int, default=10_000, help='Table cells, half numbers, half timestamps')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        rows = options['cells'] // 2
+        repeat = options['repeat']
+        random = Random(0)
+        now = timezone.now()
+        numbers = [random.choice([random.randint(0, 1000), random.randint(0, 10 ** 9)]) for _ in range(rows)]
+        timestamps = [timezone.localtime(now - timedelta(seconds=random.randint(0, 30 * 24 * 3600)))
+                      for _ in range(rows)]
+
+        def run(label: str, func):
+            self.stdout.write(str(benchmark(f'{label} ({rows * 2} cells)', func, number=1, repeat=repeat)))
+
+        run('previous filters', lambda: ([previous_intword_or_comma(it) for it in numbers],
+                                         [previous_naturaldaytime(it) for it in timestamps]))
+        run('filters', lambda: ([intword_or_comma(it) for it in numbers], [naturaldaytime(it) for it in timestamps]))
+        run('batch', lambda: (intwords_or_commas(numbers), naturaldaytimes(timestamps)))
+
+        context = Context({'rows': list(zip(numbers, timestamps))})
+        filter_template = Template(
+            '{% load humanize_extras %}<table>{% for number, timestamp in rows %}'
+            '<tr><td>{{ number|intword_or_comma }}</td><td>{{ timestamp|naturaldaytime }}</td></tr>'
+            '{% endfor %}</table>')
+        tag_template = Template(
+            '{% load humanize_extras %}<table>{% for number, timestamp in rows %}'
+            '<tr><td>{{ number|intword_or_comma }}</td><td>{% naturaldaytime_now timestamp %}</td></tr>'
+            '{% endfor %}</table>')
+        run('template (filters)', lambda: filter_template.render(context))
+        run('template (naturaldaytime_now)', lambda: tag_template.render(context))
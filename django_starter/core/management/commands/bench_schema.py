@@ -0,0 +1,51 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import json
+
+from rest_framework import serializers
+
+from django_starter.benchmark import benchmark
+from django_starter.schema import Schema, Field
+from django_starter.utils import LogCommand
+
+
+class PayloadSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    count = serializers.IntegerField(required=False, default=0)
+    active = serializers.BooleanField(required=False, default=False)
+    kind = serializers.ChoiceField(choices=['a', 'b', 'c'], required=False, allow_null=True, default=None)
+
+
+PAYLOAD_SCHEMA = Schema(
+    name=Field(str, required=True, max_length=100),
+    count=Field(int, default=0),
+    active=Field(bool, default=False),
+    kind=Field(str, choices=['a', 'b', 'c']),
+)
+
+
+class Command(LogCommand):
+    help = 'Compares validating a JSON payload with `Schema` and a DRF serializer'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--number', type=int, default=20_000, help='Validations per round')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        number = options['number']
+        valid = json.dumps({'name': 'Name', 'count': 3, 'active': True, 'kind': 'b'}).encode()
+        invalid = json.dumps({'name': ' ', 'count': '3', 'kind': 'x'}).encode()
+
+        def serializer_validate(body: bytes):
+            serializer = PayloadSerializer(data=json.loads(body))
+            return serializer.validated_data if serializer.is_valid() else serializer.errors
+
+        for label, body in [('valid', valid), ('invalid', invalid)]:
+            self.stdout.write(str(benchmark(f'DRF serializer ({label})', lambda: serializer_validate(body),
+                                            number=number)))
+            self.stdout.write(str(benchmark(f'Schema ({label})', lambda: PAYLOAD_SCHEMA.validate_json(body),
+                                            number=number)))
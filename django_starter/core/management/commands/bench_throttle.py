@@ -0,0 +1,48 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from itertools import cycle
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from django_starter.benchmark import benchmark
+from django_starter.throttling import IPTokenBucketThrottle, IPSlidingWindowThrottle
+from django_starter.utils import LogCommand
+
+
+class Command(LogCommand):
+    help = 'Measures the per-request overhead of the throttle classes'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--requests', type=int, default=10_000, help='Requests per round')
+        parser.add_argument('--clients', type=int, default=100, help='Number of distinct client IPs')
+        parser.add_argument('--rate', type=str, default='1000000/min', help='Throttle rate')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        factory = RequestFactory()
+        requests = []
+        for i in range(options['clients']):
+            request = Request(factory.get('/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}'))
+            request.user = AnonymousUser()
+            requests.append(request)
+
+        def run(throttle_class, label: str):
+            throttle_class = type(throttle_class.__name__, (throttle_class, ), {'rate': options['rate']})
+            next_request = cycle(requests).__next__
+            result = benchmark(label, lambda: throttle_class().allow_request(next_request(), None),
+                               number=options['requests'])
+            self.stdout.write(str(result))
+
+        run(IPSlidingWindowThrottle, 'sliding window')
+        run(IPTokenBucketThrottle, 'token bucket')
+        run(type('LeasedTokenBucket', (IPTokenBucketThrottle, ), {'lease_size': 10}), 'token bucket (lease 10)')
+
+        # Denied clients are answered from the in-process deny cache
+        options['rate'] = '1/day'
+        run(IPTokenBucketThrottle, 'token bucket (denied)')
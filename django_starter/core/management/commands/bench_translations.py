@@ -0,0 +1,59 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from typing import Any, Optional
+from unittest import mock
+
+from django.conf import settings
+from django.template import Template, Context
+from django.utils import translation
+
+from django_starter.benchmark import benchmark
+from django_starter.enums import BaseEnum, Environment
+from django_starter.translations import load_catalogs, pgettext_for
+from django_starter.utils import LogCommand
+
+
+def localize_with_override(context: str, enum_value: Any, language: Optional[str] = None) -> str:
+    # The previous implementation of `BaseEnum.localize`
+    language = language or translation.get_language()
+    with translation.override(language):
+        return translation.pgettext(context, str(enum_value))
+
+
+class Command(LogCommand):
+    help = 'Compares context translation lookups with `translation.override` against the preloaded catalogs, ' \
+           'per call and for a page rendering many localized enum values'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--number', type=int, default=10_000, help='Calls per round')
+        parser.add_argument('--rows', type=int, default=500, help='Enum values per page')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        number = options['number']
+        language = settings.LANGUAGE_CODES[-1]
+        load_catalogs()
+
+        self.stdout.write(str(benchmark('override + pgettext', lambda: localize_with_override(
+            'alt. month', 'January', language), number=number)))
+        self.stdout.write(str(benchmark('pgettext_for', lambda: pgettext_for(
+            language, 'alt. month', 'January'), number=number)))
+
+        template = Template('<table>{% for it in rows %}<tr><td>{{ it.localized_value }}</td>'
+                            '<td>{% for value in it.variant_base_values %}{{ value }} {% endfor %}</td></tr>'
+                            '{% endfor %}</table>')
+        members = list(Environment)
+        context = Context({'rows': [members[i % len(members)] for i in range(options['rows'])]})
+
+        def render():
+            with translation.override(language):
+                template.render(context)
+
+        page_number = max(number // options['rows'], 10)
+        with mock.patch.object(BaseEnum, 'localize', staticmethod(localize_with_override)):
+            self.stdout.write(str(benchmark(f'page ({options["rows"]} enums), override', render, number=page_number)))
+        self.stdout.write(str(benchmark(f'page ({options["rows"]} enums), catalogs', render, number=page_number)))
@@ -0,0 +1,60 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from time import perf_counter
+from typing import Callable, List
+from uuid import uuid4, UUID
+
+from django.db import connection, transaction
+
+from django_starter.benchmark import benchmark
+from django_starter.utils import LogCommand
+from django_starter.uuids import uuid7, uuid7_batch
+
+
+class Command(LogCommand):
+    help = 'Compares generating uuid4 and uuid7 keys and (PostgreSQL only) the insert throughput and primary key ' \
+           'index size of tables keyed by them'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Rows to insert per table')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        self.stdout.write(str(benchmark('uuid4', uuid4, number=100_000)))
+        self.stdout.write(str(benchmark('uuid7', uuid7, number=100_000)))
+        self.stdout.write(str(benchmark('uuid7_batch(1000)', lambda: uuid7_batch(1000), number=100)))
+
+        if connection.vendor != 'postgresql':
+            self.stderr.write(f'Insert benchmark skipped, requires PostgreSQL (not {connection.vendor})')
+            return
+
+        rows, batch_size = options['rows'], options['batch_size']
+        self.insert('uuid4', lambda count: [uuid4() for _ in range(count)], rows, batch_size)
+        self.insert('uuid7', uuid7_batch, rows, batch_size)
+
+    def insert(self, label: str, generate: Callable[[int], List[UUID]], rows: int, batch_size: int):
+        # One multi-row INSERT per batch, `executemany` of psycopg2 would send one statement per row and measure the
+        # round trips instead of the index
+        from psycopg2.extras import execute_values
+
+        table = f'bench_{label}'
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} (id uuid PRIMARY KEY, payload text) ON COMMIT DROP')
+            start = perf_counter()
+            for offset in range(0, rows, batch_size):
+                keys = generate(min(batch_size, rows - offset))
+                execute_values(cursor.cursor, f'INSERT INTO {table} (id, payload) VALUES %s', [
+                    (it, 'payload') for it in keys
+                ], page_size=batch_size)
+            duration = perf_counter() - start
+
+            cursor.execute(f"SELECT pg_relation_size('{table}_pkey')")
+            index_size = cursor.fetchone()[0]
+
+        self.stdout.write(f'{label + " insert":<40}{rows / duration:>10.0f} rows/s {index_size / 1024 ** 2:>8.1f}MB '
+                          f'primary key index ({rows} rows)')
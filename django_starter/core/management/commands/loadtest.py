@@ -0,0 +1,129 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from base64 import b64encode
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management import CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases, override_settings
+from django.utils.crypto import get_random_string
+
+from core.benchmarks import create_data
+from core.models import User
+from django_starter.benchmark import Scenario, wsgi_mix_load, asgi_mix_load, total_result
+from django_starter.utils import LogCommand
+
+AUTH_MODES = ('anonymous', 'session', 'basic')
+DEFAULT_MIX = [
+    'index=/:anonymous:8',
+    'index (logged in)=/:session:2',
+    'admin list=/admin/core/user/:session:1',
+]
+
+
+def parse_scenario(value: str) -> Dict[str, str]:
+    """
+    `label=path[:auth[:weight]]`, e.g. `api=/api/users/:basic:4`
+    """
+    label, separator, spec = value.partition('=')
+    parts = spec.split(':')
+    weight = parts.pop() if len(parts) > 2 or (len(parts) == 2 and parts[-1].isdigit()) else '1'
+    auth = parts.pop() if len(parts) > 1 else 'anonymous'
+    path = ':'.join(parts)
+    if not separator or not path.startswith('/') or auth not in AUTH_MODES or not weight.isdigit():
+        raise ValueError(f'Invalid scenario {value}, expected label=path[:{"|".join(AUTH_MODES)}[:weight]]')
+
+    return {'label': label, 'path': path, 'auth': auth, 'weight': weight}
+
+
+def production_settings(host: str) -> dict:
+    """
+    Settings overrides measuring the stack as deployed: no query log and no debug toolbar of DEBUG, which would
+    dominate the timings, and `host` allowed (not implied without DEBUG)
+    """
+    return {
+        'DEBUG': False,
+        'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, host],
+        'MIDDLEWARE': [it for it in settings.MIDDLEWARE if not it.startswith('debug_toolbar.')],
+    }
+
+
+class Command(LogCommand):
+    help = 'Load tests the whole stack of the settings (middleware, sessions, authentication, views) in-process ' \
+           'with WSGI and ASGI handlers against test databases, no network or server required'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--mix', type=parse_scenario, action='append',
+                            help='Scenario label=path[:anonymous|session|basic[:weight]], repeatable '
+                                 f'(defaults to {", ".join(DEFAULT_MIX)})')
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=50, help='Requests per scenario before measuring')
+        parser.add_argument('--https', action='store_true', help='Send the requests as https (SECURE_SSL_REDIRECT)')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test databases between runs')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        specs = options['mix'] or [parse_scenario(it) for it in DEFAULT_MIX]
+        hosts = [it for it in settings.ALLOWED_HOSTS if it != '*']
+        host = hosts[0].lstrip('.') if hosts else 'localhost'
+        scheme = 'https' if options['https'] else 'http'
+
+        with override_settings(**production_settings(host)):
+            self.run_load(specs, host, scheme, options)
+
+    def run_load(self, specs: List[Dict[str, str]], host: str, scheme: str, options: dict):
+        requests, concurrency = options['requests'], options['concurrency']
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            create_data()
+            scenarios = self.create_scenarios(specs)
+            servers = {'wsgi': wsgi_mix_load, 'asgi': asgi_mix_load}
+            names = list(servers) if options['server'] == 'both' else [options['server']]
+            applications = {'wsgi': get_wsgi_application, 'asgi': get_asgi_application}
+
+            self.stdout.write(f'{requests} requests at concurrency {concurrency} to {scheme}://{host}, mix: '
+                              + ', '.join(f'{it.label} {it.path} x{it.weight}' for it in scenarios))
+            for name in names:
+                application = applications[name]()
+                load = servers[name]
+                for it in scenarios:
+                    load(application, [it], options['warmup'], concurrency, host=host, scheme=scheme)
+
+                results = load(application, scenarios, requests, concurrency, host=host, scheme=scheme)
+                self.stdout.write(f'\n{name.upper()}')
+                for it in results.values():
+                    self.stdout.write(str(it))
+                self.stdout.write(str(total_result('total', results.values())))
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+
+    def create_scenarios(self, specs: List[Dict[str, str]]) -> List[Scenario]:
+        """
+        Logs a staff user in for `session` scenarios (session cookie), `basic` scenarios send its password
+        """
+        password = get_random_string(20)
+        user = User.objects.create_superuser(username='loadtest', email='loadtest@example.com', password=password)
+        client = Client()
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        basic = 'Basic ' + b64encode(f'{user.username}:{password}'.encode()).decode()
+        headers = {
+            'anonymous': {},
+            'session': {'Cookie': cookie},
+            'basic': {'Authorization': basic},
+        }
+
+        labels = [it['label'] for it in specs]
+        if len(set(labels)) != len(labels):
+            raise CommandError('Scenario labels must be unique')
+
+        return [Scenario(it['label'], it['path'], int(it['weight']), headers[it['auth']]) for it in specs]
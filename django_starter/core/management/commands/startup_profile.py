@@ -0,0 +1,64 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import os
+from typing import Dict
+
+from django.conf import settings
+from django.core.management import CommandError
+
+from django_starter.startup import profile_imports, median_import_times, package_import_times, exceeded_budgets
+from django_starter.utils import LogCommand
+
+
+def parse_budget(value: str) -> Dict[str, float]:
+    name, _, ms = value.partition('=')
+    return {name: float(ms)}
+
+
+class Command(LogCommand):
+    help = 'Reports the import time per module and package of a cold start (importing wsgi.py/asgi.py) ' \
+           'and checks it against `settings.IMPORT_TIME_BUDGETS`'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--entry-point', type=str, default='django_starter.wsgi', help='Module to import')
+        parser.add_argument('--top', type=int, default=15, help='Number of modules and packages to list')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs to take the median of')
+        parser.add_argument('--budget', type=parse_budget, action='append', default=[],
+                            help='Budget in ms per package or `total`, e.g. total=800 (overrides settings)')
+        parser.add_argument('--check', action='store_true', help='Fail if a budget is exceeded')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        entry_point = options['entry_point']
+        top = options['top']
+
+        runs = [profile_imports(f'import {entry_point}', cwd=settings.BASE_DIR, env={
+            'DJANGO_SETTINGS_MODULE': os.environ['DJANGO_SETTINGS_MODULE'],
+        }) for _ in range(max(options['repeat'], 1))]
+        times = median_import_times(runs)
+        packages = package_import_times(times)
+
+        self.stdout.write(f'Importing {entry_point}: {len(times)} modules, {packages["total"] / 1000:.1f}ms '
+                          f'(median of {len(runs)} runs)')
+        self.stdout.write(f'\n{"self [ms]":>10}  package')
+        for name, us in sorted(packages.items(), key=lambda it: it[1], reverse=True)[1:top + 1]:
+            self.stdout.write(f'{us / 1000:>10.2f}  {name}')
+
+        self.stdout.write(f'\n{"self [ms]":>10} {"cumulative [ms]":>16}  module')
+        for it in sorted(times, key=lambda it: it.self_us, reverse=True)[:top]:
+            self.stdout.write(f'{it.self_us / 1000:>10.2f} {it.cumulative_us / 1000:>16.2f}  {it.module}')
+
+        budgets = {**getattr(settings, 'IMPORT_TIME_BUDGETS', {})}
+        for budget in options['budget']:
+            budgets.update(budget)
+
+        exceeded = exceeded_budgets(packages, budgets)
+        for name, ms in exceeded.items():
+            self.stderr.write(f'Import time budget exceeded for {name}: {ms:.1f}ms > {budgets[name]:.1f}ms')
+
+        if exceeded and options['check']:
+            raise CommandError('Import time budget exceeded')
@@ -3,19 +3,25 @@ __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
-from uuid import uuid4
-
 from django.contrib.auth.models import AbstractUser
-from django.db.models import UUIDField, BooleanField, DateTimeField
+from django.db.models import UUIDField, BooleanField, Index, Q
 from safedelete.models import SafeDeleteModel
 
+from django_starter.fields import HistoryDateTimeField
 from django_starter.managers import SafeDeleteUserManager
 from django_starter.mixins import HistoryMixin
+from django_starter.uuids import uuid7
 
 
 class User(HistoryMixin, SafeDeleteModel, AbstractUser):
-    id = UUIDField(primary_key=True, default=uuid4, editable=False)
-    modified_on = DateTimeField(auto_now=True, db_index=True)
+    id = UUIDField(primary_key=True, default=uuid7, editable=False)
+    modified_on = HistoryDateTimeField(auto_now=True, db_index=True)
     email_verified = BooleanField(default=False)
 
     objects = SafeDeleteUserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Default ordering and keyset pagination of the admin (`LargeTableAdminMixin`) of the active users
+            Index(fields=['-created_on', '-id'], condition=Q(deleted__isnull=True), name='user_active_created_idx'),
+        ]
@@ -0,0 +1,133 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from hashlib import md5
+from typing import Any, Iterable, Optional
+
+from django import template
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Model, QuerySet, Max, Count
+from django.template.base import token_kwargs
+from django.utils.translation import get_language
+
+from django_starter.mixins import HistoryMixin
+
+register = template.Library()
+
+
+def queryset_key(queryset: QuerySet) -> str:
+    """
+    Changes if a row of the queryset is created, modified or deleted (one aggregate query)
+
+    :raises template.TemplateSyntaxError: if the model has no `modified_on` (see `HistoryMixin`)
+    """
+    model = queryset.model
+    if not issubclass(model, HistoryMixin):
+        raise template.TemplateSyntaxError(f'Fragment cache dependency {model.__name__} is not a HistoryMixin')
+
+    try:
+        query = str(queryset.query)
+    except EmptyResultSet:
+        return f'{model._meta.label}:empty'
+
+    stats = queryset.order_by().aggregate(modified=Max('modified_on'), count=Count('pk'))
+    modified = stats['modified'].timestamp() if stats['modified'] else None
+    return f'{model._meta.label}:{md5(query.encode()).hexdigest()}:{stats["count"]}:{modified}'
+
+
+def dependency_key(value: Any) -> str:
+    """
+    Key part of a fragment dependency:
+
+    - model instance: the primary key and `modified_on` of `HistoryMixin` models
+    - queryset: see `queryset_key`
+    - anything else: `str(value)`
+    """
+    if isinstance(value, Model):
+        modified = value.modified_on.timestamp() if isinstance(value, HistoryMixin) and value.modified_on else None
+        return f'{value._meta.label}:{value.pk}:{modified}'
+
+    if isinstance(value, QuerySet):
+        return queryset_key(value)
+
+    return str(value)
+
+
+def fragment_cache_key(name: str, dependencies: Iterable[Any], user: Optional[Any] = None) -> str:
+    parts = [get_language() or '', str(user.pk) if user is not None and user.is_authenticated else '']
+    parts += [dependency_key(it) for it in dependencies]
+    return f'template.fragment.{name}.{md5(chr(0).join(parts).encode()).hexdigest()}'
+
+
+class FragmentCacheNode(template.Node):
+
+    def __init__(self, nodelist, timeout, name, dependencies, per_user, using):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.dependencies = dependencies
+        self.per_user = per_user
+        self.using = using
+
+    def render(self, context: template.Context) -> str:
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            try:
+                timeout = int(timeout)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(f'fragmentcache timeout must be a number: {timeout}')
+
+        user = None
+        if self.per_user is None or self.per_user.resolve(context):
+            request = context.get('request')
+            user = getattr(request, 'user', None) or context.get('user')
+
+        key = fragment_cache_key(
+            self.name.resolve(context), [it.resolve(context) for it in self.dependencies], user)
+        cache = caches[self.using.resolve(context) if self.using else settings.FRAGMENT_CACHE]
+        content = cache.get(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, timeout)
+
+        return content
+
+
+@register.tag('fragmentcache')
+def do_fragmentcache(parser, token) -> FragmentCacheNode:
+    """
+    Caches the rendered content per language, user and dependencies::
+
+        {% fragmentcache 600 'project-list' projects project.owner per_user=False using='default' %}
+            ...
+        {% endfragmentcache %}
+
+    Dependencies are model instances and querysets of `HistoryMixin` models, whose `modified_on` timestamps
+    invalidate the entry on changes, or other values used by their string representation.
+    The timeout is in seconds (None caches forever), `per_user` (default True) varies on the user,
+    `using` selects the cache (defaults to `settings.FRAGMENT_CACHE`).
+    """
+    nodelist = parser.parse(('endfragmentcache',))
+    parser.delete_first_token()
+    bits = token.split_contents()[1:]
+    kwargs = token_kwargs([it for it in bits if '=' in it], parser)
+    args = [it for it in bits if '=' not in it]
+    if len(args) < 2:
+        raise template.TemplateSyntaxError('fragmentcache requires a timeout and a name')
+
+    unknown = set(kwargs) - {'per_user', 'using'}
+    if unknown:
+        raise template.TemplateSyntaxError(f'Unknown fragmentcache arguments: {", ".join(unknown)}')
+
+    return FragmentCacheNode(
+        nodelist,
+        timeout=parser.compile_filter(args[0]),
+        name=parser.compile_filter(args[1]),
+        dependencies=[parser.compile_filter(it) for it in args[2:]],
+        per_user=kwargs.get('per_user'),
+        using=kwargs.get('using'),
+    )
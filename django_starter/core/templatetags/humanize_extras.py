@@ -4,35 +4,187 @@ __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
 from datetime import datetime, date
+from collections.abc import Hashable
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from django import template
-from django.contrib.humanize.templatetags.humanize import intcomma, intword, naturaltime, naturalday
+from django.contrib.humanize.templatetags.humanize import intcomma, intword, naturaltime, NaturalTimeFormatter
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import defaultfilters
+from django.utils.timezone import utc, is_aware
+from django.utils.translation import get_language, gettext
 
 register = template.Library()
 
+MAX_CACHED_STRINGS = 10_000
+# Formatted strings per (value bucket, language), cleared when full or when settings change (formats, languages)
+_cache: Dict[Hashable, str] = {}
+
+
+def cached(key: Hashable, func: Callable[[], str]) -> str:
+    key = (key, get_language())
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+
+    if len(_cache) >= MAX_CACHED_STRINGS:
+        _cache.clear()
+
+    result = _cache[key] = func()
+    return result
+
+
+@receiver(setting_changed)
+def _clear_cache(**kwargs):
+    _cache.clear()
+
 
 @register.filter(is_safe=True)
 def intword_or_comma(value, use_l10n=True) -> str:
     if value is None:
         return '-'
 
+    if not isinstance(value, Hashable):
+        return _intword_or_comma(value, use_l10n)
+
+    return cached(('number', value, type(value), use_l10n), lambda: _intword_or_comma(value, use_l10n))
+
+
+def _intword_or_comma(value, use_l10n=True) -> str:
     if not value or value < 1_000_000:
         return intcomma(value, use_l10n=use_l10n)
     else:
         return intword(value)
 
 
-@register.filter(expects_localtime=True)
-def naturaldaytime(value, arg=None) -> str:
+def intwords_or_commas(values: Iterable[Any], use_l10n=True) -> List[str]:
+    return [intword_or_comma(it, use_l10n) for it in values]
+
+
+class FixedNaturalTimeFormatter(NaturalTimeFormatter):
+
+    @classmethod
+    def string_for_at(cls, value: datetime, now: datetime) -> str:
+        """
+        `NaturalTimeFormatter.string_for` relative to `now`
+        """
+        if value < now:
+            delta = now - value
+            if delta.days != 0:
+                return cls.time_strings['past-day'] % {
+                    'delta': defaultfilters.timesince(value, now, time_strings=cls.past_substrings),
+                }
+            elif delta.seconds == 0:
+                return cls.time_strings['now']
+            elif delta.seconds < 60:
+                return cls.time_strings['past-second'] % {'count': delta.seconds}
+            elif delta.seconds // 60 < 60:
+                return cls.time_strings['past-minute'] % {'count': delta.seconds // 60}
+            else:
+                return cls.time_strings['past-hour'] % {'count': delta.seconds // 60 // 60}
+        else:
+            delta = value - now
+            if delta.days != 0:
+                return cls.time_strings['future-day'] % {
+                    'delta': defaultfilters.timeuntil(value, now, time_strings=cls.future_substrings),
+                }
+            elif delta.seconds == 0:
+                return cls.time_strings['now']
+            elif delta.seconds < 60:
+                return cls.time_strings['future-second'] % {'count': delta.seconds}
+            elif delta.seconds // 60 < 60:
+                return cls.time_strings['future-minute'] % {'count': delta.seconds // 60}
+            else:
+                return cls.time_strings['future-hour'] % {'count': delta.seconds // 60 // 60}
+
+
+def naturaltime_at(value: datetime, now: datetime) -> str:
+    """
+    `naturaltime` relative to `now` (aware), cached per delta bucket of the displayed precision
+    """
+    if not isinstance(value, datetime):
+        return naturaltime(value)
+
+    if not is_aware(value):
+        # naturaltime compares naive values with the naive local time
+        now = now.astimezone().replace(tzinfo=None)
+
+    past = value < now
+    delta = now - value if past else value - now
+    if delta.days > 1:
+        # Displayed with units of at least days and hours, the years are needed for the leap day correction
+        key = (past, delta.days, delta.seconds // 3600, value.year, now.year)
+    elif delta.days == 1:
+        key = (past, delta.days, delta.seconds // 60, value.year, now.year)
+    elif delta.seconds < 60:
+        key = (past, 0, delta.seconds)
+    elif delta.seconds < 3600:
+        key = (past, 0, delta.seconds // 60 * 60)
+    else:
+        key = (past, 0, delta.seconds // 3600 * 3600)
+
+    return cached(('time', key), lambda: FixedNaturalTimeFormatter.string_for_at(value, now))
+
+
+def naturalday_at(value, today: date, arg: Optional[str] = None) -> str:
+    """
+    `naturalday` relative to `today`
+    """
+    try:
+        value_date = date(value.year, value.month, value.day)
+    except AttributeError:
+        # Passed value wasn't a date object
+        return value
+
+    days = (value_date - today).days
+    if days == 0:
+        return gettext('today')
+    elif days == 1:
+        return gettext('tomorrow')
+    elif days == -1:
+        return gettext('yesterday')
+
+    return cached(('day', value_date, arg), lambda: defaultfilters.date(value_date, arg))
+
+
+def naturaldaytime_at(value, now: datetime, arg: Optional[str] = None) -> str:
+    """
+    :param now: aware current time, compute it once for many values (e.g. a table)
+    """
     tzinfo = getattr(value, 'tzinfo', None)
     try:
         value_date = date(value.year, value.month, value.day)
     except AttributeError:
         # Passed value wasn't a date object
         return value
-    today = datetime.now(tzinfo).date()
-    delta = value_date - today
-    if delta.days == 0:
-        return naturaltime(value)
+
+    today = now.astimezone(tzinfo).date()
+    if value_date == today:
+        return naturaltime_at(value, now)
     else:
-        return f'{naturalday(value, arg=arg)} {naturaltime(value)}'
+        return f'{naturalday_at(value, today, arg=arg)} {naturaltime_at(value, now)}'
+
+
+def naturaldaytimes(values: Iterable[Any], arg: Optional[str] = None) -> List[str]:
+    now = datetime.now(utc)
+    return [naturaldaytime_at(it, now, arg) for it in values]
+
+
+@register.filter(expects_localtime=True)
+def naturaldaytime(value, arg=None) -> str:
+    return naturaldaytime_at(value, datetime.now(utc), arg)
+
+
+@register.simple_tag(takes_context=True)
+def naturaldaytime_now(context: template.Context, value, arg=None) -> str:
+    """
+    `naturaldaytime` with the current time taken once per template rendering,
+    e.g. `{% naturaldaytime_now row.created %}` in a table (expects local time, use `localtime` for aware values)
+    """
+    now = context.render_context.get('naturaldaytime_now')
+    if now is None:
+        now = context.render_context['naturaldaytime_now'] = datetime.now(utc)
+
+    return naturaldaytime_at(value, now, arg)
@@ -0,0 +1,48 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def read_static_file(path: str) -> str:
+    """
+    Reads the collected file (post-processed) if available, otherwise the file found in the app directories
+    """
+    if settings.STATIC_ROOT and staticfiles_storage.exists(path):
+        with staticfiles_storage.open(path) as f:
+            return f.read().decode()
+
+    file_path = finders.find(path)
+    if not file_path:
+        raise FileNotFoundError(f'Static file not found: {path}')
+
+    with open(file_path, encoding='utf-8') as f:
+        return f.read()
+
+
+cached_static_file = lru_cache(maxsize=None)(read_static_file)
+
+
+@register.simple_tag
+def stylesheet(path: str) -> str:
+    """
+    Links the static stylesheet or inlines it as `<style>` if `path` is in `settings.INLINE_CRITICAL_CSS`.
+    Inlined stylesheets must not reference other files with relative `url()`s.
+    """
+    if path not in settings.INLINE_CRITICAL_CSS:
+        return format_html('<link rel="stylesheet" href="{}">', static(path))
+
+    content = read_static_file(path) if settings.DEBUG else cached_static_file(path)
+    return format_html('<style>{}</style>', mark_safe(content))
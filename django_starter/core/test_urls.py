@@ -0,0 +1,13 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from django.urls import path
+
+from core.views import async_index
+
+# URLs of `core.tests.AsyncViewsTestCase`
+urlpatterns = [
+    path('', async_index),
+]
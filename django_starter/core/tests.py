@@ -1,4 +1,68 @@
-from django.test import TestCase, Client
+import gzip
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import timedelta, datetime
+from time import time
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipIf
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.template import Template, Context
+from django.test import TestCase, AsyncClient, Client, RequestFactory, override_settings
+from django.utils import translation, timezone
+from rest_framework.request import Request
+
+from core.admin import AuthorAdmin
+from core.benchmarks import suite, create_data
+from core.models import User
+from core.views import index
+from core.templatetags.humanize_extras import intword_or_comma, naturaldaytime, naturaldaytimes
+from core.management.commands.loadtest import parse_scenario, production_settings
+from django_starter.benchmark import Benchmark, BenchmarkResult, compare, save_baseline, load_baseline, Scenario, \
+    mix_order, wsgi_mix_load, total_result
+from django_starter.data_view_utils import SuccessErrorJsonResponse
+from django_starter.enums import Environment
+from django_starter.memory import MemoryTracer, rss_bytes
+from django_starter.log_handlers import AsyncStreamHandler, JsonFormatter
+from django_starter.middleware import StaticFilesMiddleware
+from django_starter.preload import preload_application, preload_templates
+from django_starter.schema import Schema, Field
+from django_starter.startup import parse_import_times, median_import_times, package_import_times, exceeded_budgets
+from django_starter.storage import CompressedManifestStaticFilesStorage
+from django_starter.test import TestRunner
+from django_starter.async_utils import acount
+from django_starter.throttling import IPTokenBucketThrottle, IPSlidingWindowThrottle, check_throttle_cache
+from django_starter.translations import pgettext_for, gettext_for
+from django_starter.utils import gettype, compile_gettype, gettypes, Measure, batched
+from django_starter.uuids import uuid7, uuid7_batch, uuid7_time_ms
+from metrics import histogram
+from metrics.collector import collector, _flush_at_exit
+from metrics.middleware import MemoryMiddleware
+from metrics.models import MetricRollup, MetricKind
+from metrics.profiler import SamplingProfiler, activity, parent_pid, sibling_workers, MAX_SECONDS
+from metrics.prometheus import Counter, collect, close_files, values_file
+from metrics.report import compare_versions
 
 
 class ViewsTestCase(TestCase):
@@ -10,3 +74,917 @@ class ViewsTestCase(TestCase):
         client = Client()
         # Frontend Views
         self.assertEqual(client.get('/').status_code, 200)
+
+    def test_async_response(self):
+        response = async_to_sync(SuccessErrorJsonResponse.acreate)(data={
+            'users': acount(User),
+            'emails': User.objects.values_list('email', flat=True),
+        })
+        self.assertEqual(json.loads(response.content), {'success': True, 'users': 0, 'emails': []})
+
+
+IMPORT_TIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       2000 |     django.utils.version
+import time:      3000 |       5000 |   django.utils
+import time:      1000 |       6000 | django
+import time:       500 |        500 | django_starter.enums
+some other output
+"""
+
+
+class StartupTestCase(TestCase):
+
+    def test_import_times(self):
+        times = parse_import_times(IMPORT_TIME_OUTPUT)
+        self.assertEqual([it.module for it in times],
+                         ['_io', 'django.utils.version', 'django.utils', 'django', 'django_starter.enums'])
+        self.assertEqual([it.depth for it in times], [1, 2, 1, 0, 0])
+        self.assertEqual(times[2].cumulative_us, 5000)
+
+        slower = parse_import_times(IMPORT_TIME_OUTPUT.replace('|       2000 |', '|       8000 |'))
+        median = median_import_times([times, slower, slower])
+        self.assertEqual(next(it for it in median if it.module == 'django.utils').cumulative_us, 5000)
+
+        packages = package_import_times(times)
+        self.assertEqual(packages, {'_io': 120, 'django': 6000, 'django_starter': 500, 'total': 6620})
+        self.assertEqual(exceeded_budgets(packages, {'django': 5, 'django_starter': 1, 'total': 10}), {'django': 6.0})
+
+    def test_startup_profile_check(self):
+        runs = [parse_import_times(IMPORT_TIME_OUTPUT)]
+        with mock.patch('core.management.commands.startup_profile.profile_imports', side_effect=runs * 2), \
+                override_settings(IMPORT_TIME_BUDGETS={}):
+            call_command('startup_profile', '--repeat=1', '--budget=total=10', '--check', stdout=StringIO())
+            with self.assertRaisesRegex(CommandError, 'budget exceeded'):
+                call_command('startup_profile', '--repeat=1', '--budget=django=5', '--check', stdout=StringIO(),
+                             stderr=StringIO())
+
+
+@override_settings(ROOT_URLCONF='core.test_urls')
+class AsyncViewsTestCase(TestCase):
+
+    async def test_async_index(self):
+        threads = []
+
+        def render_in_thread(*args):
+            threads.append(threading.get_ident())
+            return render(*args)
+
+        with mock.patch('core.views.render', side_effect=render_in_thread):
+            response = await AsyncClient().get('/')
+        # Rendered in the event loop, not in a thread of `sync_to_async`
+        self.assertEqual(threads, [threading.get_ident()])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, index(RequestFactory().get('/')).content)
+
+        with translation.override('de'):
+            response = await AsyncClient().get('/')
+        self.assertContains(response, '<html lang="de">')
+
+
+class PreloadTestCase(TestCase):
+
+    def test_preload_application(self):
+        # Must not open database connections, which the forked workers would share
+        with self.assertNumQueries(0):
+            timings = preload_application()
+        self.assertEqual(list(timings), ['urls', 'templates', 'translations'])
+        self.assertTrue(all(it >= 0 for it in timings.values()))
+        self.assertGreaterEqual(preload_templates(), 2)
+
+    def test_entry_points_preload(self):
+        for module in ['django_starter.wsgi', 'django_starter.asgi']:
+            for enabled in [True, False]:
+                with override_settings(PRELOAD_APPLICATION=enabled), mock.patch.dict(os.environ), \
+                        mock.patch('django_starter.preload.preload_application') as preload:
+                    importlib.reload(importlib.import_module(module))
+                self.assertEqual(preload.called, enabled)
+
+
+class ThrottlingTestCase(TestCase):
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.request = Request(RequestFactory().get('/', REMOTE_ADDR='10.0.0.1'))
+        self.request.user = AnonymousUser()
+
+    def test_throttles(self):
+        for throttle_class in [IPTokenBucketThrottle, IPSlidingWindowThrottle]:
+            throttle_class = type(throttle_class.__name__, (throttle_class, ), {'rate': '3/min', 'scope': 'test'})
+            results = []
+            for _ in range(4):
+                throttle = throttle_class()
+                results.append(throttle.allow_request(self.request, None))
+
+            self.assertEqual(results, [True, True, True, False], throttle_class.__name__)
+            self.assertGreater(throttle.wait(), 0)
+
+    def test_token_bucket_idle_burst(self):
+        clock = [0.0]
+        throttle_class = type('IPTokenBucketThrottle', (IPTokenBucketThrottle, ), {
+            'rate': '10/min', 'scope': 'test', 'timer': lambda self: clock[0],
+        })
+        self.assertTrue(throttle_class().allow_request(self.request, None))
+        clock[0] = 59
+        # Refilled to the bucket size, not beyond it
+        results = [throttle_class().allow_request(self.request, None) for _ in range(20)]
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(results[:10], [True] * 10)
+
+    def test_throttle_cache_check(self):
+        self.assertEqual([it.id for it in check_throttle_cache(None)], ['django_starter.W001'])
+        with override_settings(CACHES={'throttle': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'throttle',
+        }}, THROTTLE_CACHE='throttle'):
+            self.assertEqual(check_throttle_cache(None), [])
+        with override_settings(THROTTLE_CACHE='missing'):
+            self.assertEqual([it.id for it in check_throttle_cache(None)], ['django_starter.E001'])
+
+
+class LoggingTestCase(TestCase):
+
+    def test_async_json_logging(self):
+        stream = StringIO()
+        handler = AsyncStreamHandler(stream=stream, max_size=10)
+        handler.setFormatter(JsonFormatter())
+        log = logging.getLogger('test.async')
+        log.addHandler(handler)
+        try:
+            for i in range(5):
+                log.warning('record %d', i, extra={'job': 'test'})
+            handler.flush()
+        finally:
+            log.removeHandler(handler)
+            handler.close()
+
+        records = [json.loads(it) for it in stream.getvalue().splitlines()]
+        self.assertEqual([it['message'] for it in records], [f'record {i}' for i in range(5)])
+        self.assertEqual(records[0]['job'], 'test')
+        self.assertEqual(handler.dropped, 0)
+
+    def test_prepare_copies_record(self):
+        stream = StringIO()
+        handler = AsyncStreamHandler(stream=stream)
+        record = logging.LogRecord('test', logging.INFO, __file__, 0, 'record %d', (1, ), None)
+        try:
+            handler.handle(record)
+            handler.flush()
+        finally:
+            handler.close()
+
+        self.assertEqual(stream.getvalue(), 'record 1\n')
+        # Unchanged for other handlers
+        self.assertEqual((record.msg, record.args), ('record %d', (1, )))
+
+    def test_dropped_records_metric(self):
+        stream = StringIO()
+        handler = AsyncStreamHandler(stream=stream, max_size=1)
+        released = threading.Event()
+        target_handle = handler.target.handle
+        handler.target.handle = lambda record: released.wait() and target_handle(record)
+        log = logging.getLogger('test.async.dropped')
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        log.addHandler(handler)
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROMETHEUS_MULTIPROC_DIR=directory):
+            try:
+                # Blocks the writer thread, the queue fills up
+                log.error('kept')
+                for i in range(5):
+                    log.info('record %d', i)
+                released.set()
+                handler.flush()
+            finally:
+                log.removeHandler(handler)
+                log.propagate = True
+                handler.close()
+
+            self.assertGreater(handler.dropped, 0)
+            self.assertEqual(collect()['django_starter_log_records_dropped_total'][1][
+                ('django_starter_log_records_dropped_total', ())], handler.dropped)
+
+
+class StaticFilesTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.static_root = tempfile.TemporaryDirectory()
+        root = Path(self.static_root.name)
+        root.joinpath('app.0123456789ab.css').write_bytes(b'body {}' * 100)
+        root.joinpath('app.0123456789ab.css.gz').write_bytes(gzip.compress(b'body {}' * 100))
+        with override_settings(SERVE_STATIC=True, STATIC_ROOT=root):
+            self.middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+        self.factory = RequestFactory()
+
+    def tearDown(self) -> None:
+        self.static_root.cleanup()
+
+    def get(self, **headers) -> HttpResponse:
+        response = self.middleware(self.factory.get('/static/app.0123456789ab.css', **headers))
+        self.addCleanup(response.close)
+        return response
+
+    def test_negotiate_encoding(self):
+        static_file = SimpleNamespace(variants={'br': None, 'gzip': None})
+        for accept_encoding, encoding in [
+            ('gzip, deflate, br', 'br'),
+            ('GZIP', 'gzip'),
+            ('br;q=0, gzip;q=0', None),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('br;q=0, *', 'gzip'),
+            ('x-gzip-br', None),
+            ('', None),
+        ]:
+            request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+            self.assertEqual(self.middleware.negotiate_encoding(request, static_file), encoding, accept_encoding)
+
+    def test_static_files(self):
+        response = self.get(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'body {}' * 100)
+
+        # Each encoding has its own ETag
+        etag = response['ETag']
+        self.assertTrue(etag.endswith('-gzip"'))
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=f'"other", {response["ETag"]}').status_code, 304)
+
+        response = self.get(HTTP_RANGE='bytes=7-13', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 7-13/700')
+        self.assertEqual(b''.join(response.streaming_content), b'body {}')
+        self.assertEqual(self.get(HTTP_RANGE='bytes=-7')['Content-Range'], 'bytes 693-699/700')
+        self.assertEqual(self.get(HTTP_RANGE='bytes=700-').status_code, 416)
+        # Several or invalid ranges are ignored
+        for byte_range in ['bytes=0-6,14-20', 'bytes=13-7', 'lines=1-2']:
+            response = self.get(HTTP_RANGE=byte_range)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Length'], '700')
+
+        response = self.middleware(self.factory.get('/static/missing.css'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_compressed_manifest_storage(self):
+        content = b'body { background: url("logo.svg"); }\n' * 50
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as location:
+            Path(source, 'app.css').write_bytes(content)
+            Path(source, 'logo.svg').write_bytes(b'<svg/>')
+            files = FileSystemStorage(location=source)
+            storage = CompressedManifestStaticFilesStorage(location=location, base_url='/static/')
+            for name in ['app.css', 'logo.svg']:
+                with files.open(name) as f:
+                    storage.save(name, f)
+            list(storage.post_process({name: (files, name) for name in ['app.css', 'logo.svg']}))
+
+            hashed = storage.hashed_files['app.css']
+            self.assertRegex(hashed, r'^app\.[0-9a-f]{12}\.css$')
+            self.assertIn('app.css', json.loads(Path(location, 'staticfiles.json').read_text())['paths'])
+            self.assertIn('logo.', Path(location, hashed).read_text())
+            self.assertEqual(gzip.decompress(Path(location, hashed + '.gz').read_bytes()),
+                             Path(location, hashed).read_bytes())
+            # Too small to be compressed
+            self.assertFalse(Path(location, storage.hashed_files['logo.svg'] + '.gz').exists())
+
+    def test_stylesheet_tag(self):
+        template = Template("{% load static_extras %}{% stylesheet 'core/css/default.css' %}")
+        self.assertHTMLEqual(template.render(Context()),
+                             '<link rel="stylesheet" href="/static/core/css/default.css">')
+        with override_settings(INLINE_CRITICAL_CSS=['core/css/default.css']):
+            rendered = template.render(Context())
+        self.assertTrue(rendered.startswith('<style>'))
+        self.assertIn(Path(finders.find('core/css/default.css')).read_text(encoding='utf-8'), rendered)
+
+
+class TranslationsTestCase(TestCase):
+
+    def test_catalog_lookups(self):
+        for language in ['en', 'de', None]:
+            with translation.override(language):
+                self.assertEqual(pgettext_for(language, 'alt. month', 'January'),
+                                 translation.pgettext('alt. month', 'January'))
+                self.assertEqual(gettext_for(language, 'Yes'), translation.gettext('Yes'))
+                self.assertEqual(pgettext_for(language, 'unknown context', 'January'), 'January')
+
+        self.assertEqual(pgettext_for('de', 'alt. month', 'January'), 'Januar')
+        self.assertEqual(Environment.debug.get_localized_value('de'), 'debug')
+
+
+class HumanizeTestCase(TestCase):
+
+    def test_humanize_filters(self):
+        self.assertEqual(intword_or_comma(None), '-')
+        self.assertEqual(intword_or_comma(1234), '1,234')
+        self.assertEqual(intword_or_comma(1_200_000), '1.2 million')
+        self.assertEqual(intword_or_comma(1234.5), '1,234.5')
+
+        now = timezone.localtime()
+        self.assertEqual(naturaldaytime(now - timedelta(minutes=5)), '5\xa0minutes ago')
+        self.assertEqual(naturaldaytime(datetime.now() - timedelta(hours=25)).split()[0], 'yesterday')
+        with translation.override('de'):
+            self.assertIn('Minuten', naturaldaytimes([now + timedelta(minutes=5, seconds=1)])[0])
+
+        self.assertEqual(naturaldaytime('not a date'), 'not a date')
+
+
+class FragmentCacheTestCase(TestCase):
+
+    def test_fragment_cache(self):
+        cache.clear()
+        user = User.objects.create(username='a')
+        template = Template('{% load cache_extras %}{% fragmentcache 60 "users" users user %}'
+                            '{{ counter.value }}{% endfragmentcache %}')
+        counter = {'value': 0}
+
+        def render() -> str:
+            counter['value'] += 1
+            return template.render(Context({'users': User.objects.all(), 'user': user, 'counter': counter}))
+
+        self.assertEqual(render(), '1')
+        self.assertEqual(render(), '1')
+        with translation.override('de'):
+            self.assertEqual(render(), '3')
+
+        user.save()
+        self.assertEqual(render(), '4')
+        User.objects.create(username='b')
+        self.assertEqual(render(), '5')
+        self.assertEqual(render(), '5')
+
+
+class AdminTestCase(TestCase):
+
+    def test_user_changelist(self):
+        admin_user = User.objects.create_superuser(username='admin', email='admin@example.com', password='admin')
+        for i in range(5):
+            User.objects.create(username=f'user{i}')
+        User.objects.create(username='deleted').delete()
+
+        client = Client()
+        client.force_login(admin_user)
+        with mock.patch.object(AuthorAdmin, 'list_per_page', 4):
+            response = client.get('/admin/core/user/')
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Next page')
+            first_page = [it.username for it in response.context['cl'].result_list]
+            self.assertEqual(first_page, ['user4', 'user3', 'user2', 'user1'])
+
+            response = client.get('/admin/core/user/' + response.context['cl'].next_page_url)
+            self.assertEqual([it.username for it in response.context['cl'].result_list], ['user0', 'admin'])
+            self.assertIsNone(response.context['cl'].next_page_url)
+
+            response = client.get('/admin/core/user/?deleted=deleted')
+            self.assertEqual([it.username for it in response.context['cl'].result_list], ['deleted'])
+            # Change views opened from the filtered changelist
+            deleted = response.context['cl'].result_list[0]
+            model_admin = site._registry[User]
+            request = RequestFactory().get('/', {'_changelist_filters': 'deleted=deleted'})
+            self.assertEqual(model_admin.get_object(request, str(deleted.pk)), deleted)
+            self.assertIsNone(model_admin.get_object(RequestFactory().get('/'), str(deleted.pk)))
+            response = client.get('/admin/core/user/?deleted=all')
+            self.assertEqual(len(response.context['cl'].result_list), 4)
+
+            # Active rows through the default manager only
+            with mock.patch.object(User._default_manager, 'all_with_deleted') as all_with_deleted:
+                client.get('/admin/core/user/')
+            all_with_deleted.assert_not_called()
+
+            for cursor in ['invalid', '2021-01-01T00:00:00|not-a-uuid', '2021-13-01T00:00:00|1']:
+                response = client.get('/admin/core/user/', {'cursor': cursor})
+                self.assertRedirects(response, '/admin/core/user/?e=1', fetch_redirect_response=False)
+
+
+class GetTypeTestCase(TestCase):
+
+    def test_gettype(self):
+        payload = {'count': 3, 'active': True, 'name': 'a'}
+        for instance in [payload, SimpleNamespace(**payload)]:
+            self.assertEqual(gettype(instance, 'count', int), 3)
+            self.assertEqual(gettype(instance, 'count', [str, (float, int)]), 3)
+            self.assertIsNone(gettype(instance, 'active', int))
+            self.assertTrue(gettype(instance, 'active', (int, bool)))
+            self.assertEqual(gettype(instance, 'name', int, default=0), 0)
+            self.assertEqual(gettype(instance, 'missing', str, default='-'), '-')
+            self.assertEqual(compile_gettype('count', {int})(instance), 3)
+
+        self.assertEqual(gettypes([payload, {'count': 'x'}], {'count': int, 'active': bool}, {'count': 0}), [
+            {'count': 3, 'active': True},
+            {'count': 0, 'active': None},
+        ])
+        self.assertEqual(gettypes(payload, {'name': str}), {'name': 'a'})
+
+
+class SchemaTestCase(TestCase):
+
+    def test_schema(self):
+        schema = Schema(
+            name=Field(str, required=True, max_length=5),
+            count=Field(int, default=0),
+            kind=Field(str, choices=['a', 'b']),
+            ratio=Field((int, float), validator=lambda it: 0 <= it <= 1),
+        )
+        self.assertEqual(schema.validate_json(b'{"name": "x", "kind": " ", "ratio": 0.5}'), (
+            {'name': 'x', 'count': 0, 'kind': None, 'ratio': 0.5}, None,
+        ))
+
+        data, error = schema.validate({'name': ' ', 'count': True, 'kind': 'c', 'ratio': 2})
+        self.assertIsNone(data)
+        self.assertEqual(error, {'code': 'invalid_payload', 'fields': {
+            'name': 'blank', 'count': 'invalid_type', 'kind': 'invalid_choice', 'ratio': 'invalid',
+        }})
+        self.assertEqual(schema.validate({'name': 'abcdef'}).error['fields'], {'name': 'max_length'})
+        self.assertEqual(schema.validate_json(b'[').error['code'], 'invalid_json')
+        self.assertEqual(schema.validate([]).error['code'], 'invalid_payload')
+
+        response = SuccessErrorJsonResponse(error=schema.validate({}).error)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['error']['fields'], {'name': 'required'})
+
+
+class UUIDTestCase(TestCase):
+
+    def test_uuid7(self):
+        keys = [uuid7(), *uuid7_batch(10_000), uuid7()]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        self.assertTrue(all(it.version == 7 for it in keys))
+        self.assertLess(abs(uuid7_time_ms(keys[0]) - time() * 1000), 1000)
+
+        users = User.objects.bulk_create([User(id=it, username=str(it)) for it in uuid7_batch(3)])
+        self.assertEqual(list(User.objects.order_by('id')), users)
+
+
+class HistoryTestCase(TestCase):
+
+    def test_bulk_history_timestamps(self):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(3)])
+        self.assertEqual(len({(it.created_on, it.modified_on) for it in users}), 1)
+        created_on = users[0].created_on
+
+        for user in users:
+            user.first_name = 'First'
+        User.objects.bulk_update(users, ['first_name'])
+        modified_on = {it.modified_on for it in User.objects.all()}
+        self.assertEqual(len(modified_on), 1)
+        self.assertGreater(modified_on.pop(), created_on)
+
+        User.objects.filter(username='user0').update(last_name='Last')
+        user = User.objects.get(username='user0')
+        self.assertGreater(user.modified_on, users[0].modified_on)
+        self.assertEqual(user.created_on, created_on)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_FLUSH_INTERVAL=None)
+class MetricsTestCase(TestCase):
+
+    def tearDown(self) -> None:
+        # Discards the metrics of the test, e.g. of the called command
+        collector.take()
+
+    def test_histogram(self):
+        values = {}
+        for i in range(1, 1001):
+            histogram.add(values, i / 1000)
+        self.assertAlmostEqual(histogram.percentile(values, 50), 0.5, delta=0.05)
+        self.assertAlmostEqual(histogram.percentile(histogram.merge([values, values]), 95), 0.95, delta=0.05)
+
+    def test_collect_and_compare(self):
+        collector.take()
+        with override_settings(METRICS_VERSION='v1'):
+            Client().get('/')
+            collector.record(MetricKind.request, 'GET /slow/', 0.1)
+            self.assertEqual(collector.flush(), 2)
+        with override_settings(METRICS_VERSION='v2'):
+            collector.record(MetricKind.request, 'GET /slow/', 0.2)
+            collector.flush()
+
+        rollup = MetricRollup.objects.get(version='v1', name='GET /')
+        self.assertEqual((rollup.kind, rollup.count), (MetricKind.request, 1))
+
+        comparison = next(it for it in compare_versions('v1', 'v2') if it.name == 'GET /slow/')
+        self.assertAlmostEqual(comparison.p95_change, 100, delta=10)
+
+        out = StringIO()
+        call_command('metrics_compare', stdout=out)
+        self.assertIn('v1 -> v2', out.getvalue())
+        self.assertIn('GET /slow/', out.getvalue())
+
+        client = Client()
+        client.force_login(User.objects.create_superuser(username='admin', password='admin'))
+        response = client.get('/admin/metrics/metricrollup/compare/')
+        self.assertEqual((response.context['base'], response.context['target']), ('v1', 'v2'))
+        self.assertContains(response, 'GET /slow/')
+
+    def test_no_flush_when_disabled(self):
+        collector.record(MetricKind.command, 'test', 0.1)
+        with mock.patch.object(collector, 'stop') as stop:
+            with override_settings(METRICS_ENABLED=False):
+                _flush_at_exit()
+            stop.assert_not_called()
+            _flush_at_exit()
+            stop.assert_called_once()
+
+    def test_test_runner_disables_metrics(self):
+        runner = TestRunner()
+        with mock.patch('django.test.runner.DiscoverRunner.setup_test_environment'), \
+                mock.patch('django.test.runner.DiscoverRunner.teardown_test_environment'):
+            runner.setup_test_environment()
+            self.assertFalse(settings.METRICS_ENABLED)
+            collector.record(MetricKind.command, 'test', 0.1)
+            with override_settings(METRICS_ENABLED=True):
+                collector.record(MetricKind.command, 'test', 0.1)
+            runner.teardown_test_environment()
+        self.assertTrue(settings.METRICS_ENABLED)
+        # Discarded instead of written at exit
+        self.assertEqual(collector.take(), [])
+
+
+fork_counter = Counter('test_forked_total', 'Increments of forked processes')
+
+
+class PrometheusTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(PROMETHEUS_MULTIPROC_DIR=self.directory.name, PROMETHEUS_SCRAPE_TOKEN='t')
+        self.settings.enable()
+
+    def tearDown(self) -> None:
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def test_multiprocess_metrics(self):
+        fork_counter.inc()
+        pid = os.fork()
+        if pid == 0:
+            fork_counter.inc(2)
+            close_files()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        metrics = collect()
+        self.assertEqual(metrics['test_forked_total'][1][('test_forked_total', ())], 3)
+        # The exited process is merged into the archive, the sum stays the same
+        self.assertFalse(Path(self.directory.name, f'counter_{pid}.db').exists())
+        self.assertEqual(collect()['test_forked_total'][1][('test_forked_total', ())], 3)
+
+    def test_close_files(self):
+        fork_counter.inc()
+        values = values_file('counter')
+        close_files()
+        self.assertTrue(values._file.closed)
+        # Reopened with the previous values
+        fork_counter.inc()
+        self.assertIsNot(values_file('counter'), values)
+        self.assertEqual(collect()['test_forked_total'][1][('test_forked_total', ())], 2)
+
+    def test_endpoint(self):
+        client = Client()
+        client.get('/')
+        cache.get('prometheus-test')
+        cache.set('prometheus-test', 1)
+        cache.get('prometheus-test')
+        with Measure('span', output_handler=lambda message: None):
+            User.objects.exists()
+
+        self.assertEqual(client.get('/metrics/').status_code, 302)
+        response = client.get('/metrics/', HTTP_AUTHORIZATION='Bearer t')
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('django_http_requests_total{method="GET",route="/",status="200"} 1.0', content)
+        self.assertIn('django_http_request_duration_seconds_bucket{method="GET",route="/",le="+Inf"} 1.0', content)
+        self.assertIn('django_cache_requests_total{cache="default",result="hit"} 1.0', content)
+        self.assertIn('django_cache_requests_total{cache="default",result="miss"} 1.0', content)
+        self.assertIn('django_starter_measure_duration_seconds_count{label="span"} 1.0', content)
+        self.assertIn('django_db_query_duration_seconds_count{alias="default",statement="SELECT"}', content)
+
+
+def busy_loop(seconds: float):
+    end = time() + seconds
+    while time() < end:
+        pass
+
+
+class ProfilerTestCase(TestCase):
+
+    def test_sampling_profiler(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        with activity('command:test'):
+            busy_loop(0.2)
+        busy_loop(0.05)
+        profiler.stop()
+
+        self.assertGreater(profiler.samples, 10)
+        lines = profiler.collapsed().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(it.startswith('command:test;') for it in lines))
+        self.assertTrue(any('busy_loop (core/tests.py:' in it for it in lines))
+
+    def test_admin(self):
+        directory = tempfile.TemporaryDirectory()
+        client = Client()
+        client.force_login(User.objects.create_superuser(username='admin', password='admin'))
+        with override_settings(PROFILER_DIR=directory.name):
+            response = client.post('/admin/metrics/metricrollup/profiles/', {'seconds': 0.1})
+            self.assertEqual(response.status_code, 302)
+            busy_loop(0.3)
+            response = client.get('/admin/metrics/metricrollup/profiles/')
+            self.assertEqual(len(response.context['profiles']), 1)
+            response = client.get(f'/admin/metrics/metricrollup/profiles/{response.context["profiles"][0]["name"]}/')
+            self.assertEqual(response.status_code, 200)
+            response.close()
+
+            with mock.patch('metrics.admin.start_profiling') as start:
+                for seconds in ['abc', 'nan', '-1']:
+                    response = client.post('/admin/metrics/metricrollup/profiles/', {'seconds': seconds})
+                    self.assertEqual(response.status_code, 302)
+                start.assert_not_called()
+                client.post('/admin/metrics/metricrollup/profiles/', {'seconds': 1e9})
+                start.assert_called_once_with(MAX_SECONDS)
+        directory.cleanup()
+
+    def test_sibling_workers(self):
+        self.assertEqual(parent_pid(os.getpid()), os.getppid())
+        # Only processes forked by the same parent, e.g. not this process, its parent or exited processes
+        pids = [os.getpid(), os.getppid(), 2 ** 22 + 1]
+        self.assertEqual(sibling_workers(pids), [])
+        with subprocess.Popen(['sleep', '5']) as child, mock.patch('os.getppid', return_value=os.getpid()):
+            self.assertEqual(sibling_workers([child.pid, *pids]), [child.pid])
+            child.kill()
+
+
+class MemoryTestCase(TestCase):
+
+    def test_memory_tracer(self):
+        self.assertGreater(rss_bytes(), 0)
+        lines = []
+        tracer = MemoryTracer(3600, top=3, output=lines.append)
+        tracer.start()
+        leak = [str(i) * 100 for i in range(10_000)]
+        top = tracer.report()
+        tracer.stop()
+        self.assertTrue(any('core/tests.py' in str(it.traceback) for it in top))
+        self.assertTrue(lines[0].startswith('Memory: traced'))
+        self.assertEqual(len(leak), 10_000)
+
+    def test_batched_resets_queries(self):
+        connection.force_debug_cursor = True
+        try:
+            batches = []
+            for batch in batched(range(5), 2):
+                for _ in batch:
+                    User.objects.exists()
+                batches.append(len(connection.queries))
+        finally:
+            connection.force_debug_cursor = False
+        self.assertEqual(batches, [2, 2, 1])
+
+    def test_overlapping_requests_not_attributed(self):
+        with mock.patch('metrics.middleware.rss_bytes', side_effect=[1000, 1000, 2000, 5000, 7000, 8000, 9000]), \
+                mock.patch('metrics.middleware.request_rss_growth') as growth:
+            middleware = MemoryMiddleware(lambda request: HttpResponse())
+            first, second = RequestFactory().get('/'), RequestFactory().get('/')
+            middleware.process_request(first)
+            middleware.process_request(second)
+            middleware.process_response(second, HttpResponse())
+            middleware.process_response(first, HttpResponse())
+            growth.labels.assert_not_called()
+
+            third = RequestFactory().get('/')
+            middleware.process_request(third)
+            middleware.process_response(third, HttpResponse())
+            growth.labels.return_value.inc.assert_called_once_with(1000)
+
+    def test_restart_over_limit(self):
+        with override_settings(MEMORY_MAX_RSS=1, MEMORY_RESTART_SIGNAL='SIGUSR1'), \
+                mock.patch('metrics.middleware.os.kill') as kill:
+            client = Client()
+            client.get('/')
+            client.get('/')
+        kill.assert_called_once_with(os.getpid(), signal.SIGUSR1)
+
+
+class BenchmarkTestCase(TestCase):
+
+    def test_suite(self):
+        create_data()
+        results = [it.run(scale=0.001) for it in suite()]
+        self.assertTrue(all(it.best > 0 for it in results))
+        self.assertEqual(User.objects.count(), 900)
+
+    def test_language(self):
+        languages = []
+        with mock.patch('django.utils.translation.override', wraps=translation.override) as override:
+            Benchmark('language', lambda: languages.append(translation.get_language()), number=10, repeat=2,
+                      language='de').run()
+        # Activated once for the run
+        override.assert_called_once_with('de')
+        self.assertEqual(languages, ['de'] * 20)
+        self.assertNotEqual(translation.get_language(), 'de')
+
+    def test_compare(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'baseline.json')
+            save_baseline(path, [BenchmarkResult('a', 1, [1.0]), BenchmarkResult('b', 1, [1.0])])
+            baseline = load_baseline(path)
+
+        results = [BenchmarkResult('a', 1, [1.1]), BenchmarkResult('b', 1, [1.5]), BenchmarkResult('c', 1, [1.0])]
+        comparisons = compare(results, baseline, 0.2)
+        self.assertEqual([it.regressed for it in comparisons], [False, True, False])
+        self.assertIsNone(comparisons[2].change)
+        self.assertFalse(compare(results, baseline, 0.2, {'b': 0.6})[1].regressed)
+
+    def test_save_merged_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'baseline.json')
+            save_baseline(path, [BenchmarkResult('a', 1, [1.0]), BenchmarkResult('b', 1, [1.0])])
+            save_baseline(path, [BenchmarkResult('b', 1, [2.0])], merge=True)
+            self.assertEqual({label: it['best'] for label, it in load_baseline(path)['results'].items()},
+                             {'a': 1.0, 'b': 2.0})
+            save_baseline(path, [BenchmarkResult('b', 1, [3.0])])
+            self.assertEqual(list(load_baseline(path)['results']), ['b'])
+
+    def test_bench_arguments(self):
+        missing = Path(tempfile.gettempdir(), 'missing-baseline.json')
+        with self.assertRaisesRegex(CommandError, 'No baseline'):
+            call_command('bench', '--check', f'--baseline={missing}')
+        with self.assertRaisesRegex(CommandError, '--scale'):
+            call_command('bench', '--save', '--scale=0.1', f'--baseline={missing}')
+
+
+class LoadTestTestCase(TestCase):
+
+    def test_parse_scenario(self):
+        self.assertEqual(parse_scenario('admin=/admin/core/user/:session:2'),
+                         {'label': 'admin', 'path': '/admin/core/user/', 'auth': 'session', 'weight': '2'})
+        self.assertEqual(parse_scenario('index=/'), {'label': 'index', 'path': '/', 'auth': 'anonymous', 'weight': '1'})
+        self.assertEqual(parse_scenario('index=/:3')['weight'], '3')
+        with self.assertRaises(ValueError):
+            parse_scenario('index=/:token')
+
+    def test_production_settings(self):
+        with override_settings(MIDDLEWARE=[*settings.MIDDLEWARE, 'debug_toolbar.middleware.DebugToolbarMiddleware']):
+            overrides = production_settings('example.com')
+        self.assertFalse(overrides['DEBUG'])
+        self.assertIn('example.com', overrides['ALLOWED_HOSTS'])
+        self.assertFalse(any(it.startswith('debug_toolbar.') for it in overrides['MIDDLEWARE']))
+
+    def test_mix_load(self):
+        scenarios = [Scenario('index', '/', weight=3), Scenario('missing', '/missing/')]
+        order = mix_order(scenarios, 1000)
+        self.assertEqual(order, mix_order(scenarios, 1000))
+        self.assertAlmostEqual(order.count(scenarios[0]) / 1000, 0.75, delta=0.05)
+
+        results = wsgi_mix_load(get_wsgi_application(), scenarios, 40, 4, host='127.0.0.1')
+        self.assertEqual(results['index'].errors, 0)
+        self.assertEqual(results['missing'].errors, results['missing'].requests)
+        self.assertEqual(total_result('total', results.values()).requests, 40)
+
+
+def import_deploy():
+    """
+    `deploy.py` of the project root, None without its dev dependencies (fabric)
+    """
+    path = settings.BASE_DIR.parent / 'deploy.py'
+    try:
+        spec = importlib.util.spec_from_file_location('deploy', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except (ImportError, FileNotFoundError):
+        return None
+
+    return module
+
+
+deploy = import_deploy()
+
+
+@skipIf(deploy is None, 'deploy.py or fabric is missing')
+class DeployTestCase(TestCase):
+    """
+    Deploys to directories of this machine (`deploy.LOCAL_HOST`) instead of ssh hosts
+    """
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.source = self.root / 'source'
+        self.source.joinpath('django').mkdir(parents=True)
+        self.source.joinpath('django', 'reload.sh').write_text('touch reloaded\n')
+        self.source.joinpath('app.py').write_text('VERSION = 1\n')
+        self.files = [Path('app.py'), Path('django/reload.sh')]
+        self.patches = mock.patch.multiple(
+            deploy, PROJECT_ROOT=self.source, DJANGO_DIR=self.source / 'django', build_locally=lambda verbose: [],
+            INSTALL_COMMAND='mkdir .venv && test ! -e ../../fail', MIGRATE_COMMAND='touch migrated')
+        self.patches.start()
+        self.output = redirect_stdout(StringIO())
+        self.output.__enter__()
+
+    def tearDown(self) -> None:
+        self.output.__exit__(None, None, None)
+        self.patches.stop()
+        self.directory.cleanup()
+
+    def host(self, name: str) -> 'deploy.DeploymentConfig':
+        project_root = self.root / name
+        project_root.mkdir()
+        return deploy.DeploymentConfig(deploy.LOCAL_HOST, str(project_root), str(project_root / 'django'),
+                                       releases=True)
+
+    def test_get_configs(self):
+        self.source.joinpath('django', 'deploy_production.json').write_text(json.dumps({
+            'hosts': ['web1', 'web2'], 'projectDir': '/srv/app', 'djangoDir': '/srv/app/current/django',
+        }))
+        self.source.joinpath('django', 'deploy_staging.json').write_text(json.dumps({
+            'hostName': 'staging', 'projectDir': '/srv/app', 'djangoDir': '/srv/app/django',
+        }))
+
+        configs = deploy.get_configs(Environment.production)
+        self.assertEqual([it.hostname for it in configs], ['web1', 'web2'])
+        self.assertTrue(all(it.releases for it in configs))
+        self.assertFalse(deploy.get_configs(Environment.staging)[0].releases)
+
+    def test_run_parallel(self):
+        done = []
+
+        def run(config):
+            if config.hostname == 'web2':
+                raise deploy.DeploymentError('unreachable')
+            done.append(config.hostname)
+
+        configs = [deploy.DeploymentConfig(it, '/srv/app', '/srv/app/django') for it in ['web1', 'web2', 'web3']]
+        with self.assertRaisesRegex(deploy.DeploymentError, r'\[web2\] unreachable'):
+            deploy.run_parallel(run, configs, 2)
+        # The other hosts still finish
+        self.assertEqual(sorted(done), ['web1', 'web3'])
+
+    def test_deploy_release(self):
+        configs = [self.host('web1'), self.host('web2')]
+        missing = self.root / 'missing'
+        deploy.deploy_release(configs, self.files, missing, dry_run=False, verbose=False, workers=2, release='1')
+        self.source.joinpath('app.py').write_text('VERSION = 2\n')
+        deploy.deploy_release(configs, self.files, missing, dry_run=False, verbose=False, workers=2, release='2')
+
+        for config in configs:
+            project_root = Path(config.project_root)
+            self.assertEqual(os.readlink(project_root / 'current'), 'releases/2')
+            self.assertEqual((project_root / 'current' / 'app.py').read_text(), 'VERSION = 2\n')
+            self.assertTrue((project_root / 'current' / 'django' / 'reloaded').exists())
+            self.assertEqual(os.readlink(project_root / 'current' / '.env'), f'{project_root}/shared/.env')
+            # Each release has its own environment, the previous release can still be switched back to
+            self.assertFalse((project_root / 'current' / '.venv').is_symlink())
+            self.assertTrue((project_root / 'releases' / '1' / '.venv').is_dir())
+            self.assertEqual((project_root / 'releases' / '1' / 'app.py').read_text(), 'VERSION = 1\n')
+        self.assertTrue((Path(configs[0].project_root) / 'releases' / '2' / 'django' / 'migrated').exists())
+
+    def test_delta_sync(self):
+        config = self.host('web1')
+        target = Path(config.project_root)
+        upload = mock.patch.object(deploy, 'upload_archive', wraps=deploy.upload_archive)
+        with upload as uploaded:
+            deploy.delta_sync(config.connection(), config, self.files, self.root / 'missing', False, False)
+            self.assertEqual(sorted(uploaded.call_args.args[2]), ['app.py', 'django/reload.sh'])
+            self.assertEqual(json.loads(target.joinpath(deploy.MANIFEST_FILE_NAME).read_text())['app.py'],
+                             deploy.sha256_from_file(self.source / 'app.py'))
+
+            # Only the changed file is transferred
+            uploaded.reset_mock()
+            self.source.joinpath('app.py').write_text('VERSION = 2\n')
+            deploy.delta_sync(config.connection(), config, self.files, self.root / 'missing', False, False)
+            self.assertEqual(uploaded.call_args.args[2], ['app.py'])
+            self.assertEqual(target.joinpath('app.py').read_text(), 'VERSION = 2\n')
+
+            uploaded.reset_mock()
+            deploy.delta_sync(config.connection(), config, self.files, self.root / 'missing', False, False)
+            uploaded.assert_not_called()
+
+    def test_delta_sync_hash_mismatch(self):
+        config = self.host('web1')
+        target = Path(config.project_root)
+        upload_archive = deploy.upload_archive
+
+        def corrupting_upload(*args):
+            upload_archive(*args)
+            target.joinpath('app.py').write_text('corrupted\n')
+
+        with mock.patch.object(deploy, 'upload_archive', corrupting_upload), redirect_stderr(StringIO()), \
+                self.assertRaises(SystemExit):
+            deploy.delta_sync(config.connection(), config, self.files, self.root / 'missing', False, False)
+
+        # Not recorded as deployed, the next run transfers the files again
+        self.assertFalse(target.joinpath(deploy.MANIFEST_FILE_NAME).exists())
+
+    def test_failed_host_keeps_current_release(self):
+        configs = [self.host('web1'), self.host('web2')]
+        Path(configs[1].project_root, 'fail').touch()
+        with redirect_stderr(StringIO()), self.assertRaises(SystemExit):
+            deploy.deploy_release(configs, self.files, self.root / 'missing', dry_run=False, verbose=False,
+                                  workers=2, release='1')
+
+        # Not switched on any host, as one failed to prepare
+        for config in configs:
+            self.assertFalse(Path(config.project_root, 'current').exists())
@@ -3,10 +3,11 @@ __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
+from django.conf import settings
 from django.urls import path
 
-from core.views import index
+from core.views import index, async_index
 
 urlpatterns = [
-    path('', index, name='index'),
+    path('', async_index if settings.ASYNC_VIEWS else index, name='index'),
 ]
@@ -8,7 +8,19 @@ from django.http import HttpRequest
 from django.shortcuts import render
 
 
-def index(request: HttpRequest):
-    return render(request, 'index.html', {
+def index_context() -> dict:
+    return {
         'languages': {code: name for code, name in settings.LANGUAGES}
-    })
+    }
+
+
+def index(request: HttpRequest):
+    return render(request, 'index.html', index_context())
+
+
+async def async_index(request: HttpRequest):
+    """
+    `index` for ASGI deployments (`settings.ASYNC_VIEWS`). The template neither touches the database nor the lazy
+    `user` and `messages` of the context processors, so it is rendered in the event loop without a thread hop.
+    """
+    return render(request, 'index.html', index_context())
@@ -0,0 +1,225 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import json
+from typing import Optional, Sequence, Tuple, Any
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR, PAGE_VAR
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet, Q
+from django.http import HttpRequest, QueryDict
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+CURSOR_VAR = 'cursor'
+
+
+def estimated_count(queryset: QuerySet) -> Optional[int]:
+    """
+    Row estimate of the query planner (PostgreSQL only), takes the filters into account without counting
+
+    :return: None if not supported by the database
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner estimate instead of `COUNT(*)` if it's at least `exact_count_limit` rows
+    """
+    exact_count_limit = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        if isinstance(self.object_list, QuerySet):
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= self.exact_count_limit:
+                return estimate
+
+        return super().count
+
+
+class SoftDeleteListFilter(admin.SimpleListFilter):
+    """
+    Shows the rows which aren't soft deleted by default (`deleted IS NULL`, matching the partial indexes), the
+    admin's queryset has to include deleted rows if requested (see `LargeTableAdminMixin.get_queryset`)
+    """
+    title = _('deleted')
+    parameter_name = 'deleted'
+    field_name = 'deleted'
+
+    def lookups(self, request, model_admin):
+        return [
+            ('deleted', _('Deleted')),
+            ('all', _('All')),
+        ]
+
+    def choices(self, changelist):
+        # The default (no value) isn't "All" but the active rows
+        choices = list(super().choices(changelist))
+        choices[0]['display'] = _('Active')
+        return choices
+
+    def queryset(self, request, queryset):
+        if self.value() == 'deleted':
+            return queryset.filter(**{f'{self.field_name}__isnull': False})
+
+        # The default manager excludes the deleted rows already
+        return queryset
+
+    @classmethod
+    def includes_deleted(cls, request: HttpRequest) -> bool:
+        """
+        :return: whether deleted rows are requested, by the changelist or the filters preserved for the change views
+        """
+        preserved = QueryDict(request.GET.get('_changelist_filters', ''))
+        return (request.GET.get(cls.parameter_name) or preserved.get(cls.parameter_name)) in ('deleted', 'all')
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Pages with the default ordering by `keyset_field` and pk continue after the last row of the previous page
+    (`?cursor=`) instead of an `OFFSET`, which gets slower the further one pages.
+    Falls back to the regular pagination if ordered by another column.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Links to other filters or orderings start at the first page
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = [*(remove or []), CURSOR_VAR]
+
+        return super().get_query_string(new_params, remove)
+
+    @property
+    def keyset_field(self) -> str:
+        return self.model_admin.keyset_field
+
+    @cached_property
+    def keyset_pagination(self) -> bool:
+        return ORDER_VAR not in self.params and not self.show_all
+
+    def get_cursor(self) -> Optional[Tuple[Any, str]]:
+        value = self.params.get(CURSOR_VAR)
+        if not value:
+            return None
+
+        key, separator, pk = value.rpartition('|')
+        try:
+            key = parse_datetime(key)
+            pk = self.model._meta.pk.to_python(pk)
+        except (ValueError, ValidationError):
+            key = None
+        if key is None or pk is None:
+            raise IncorrectLookupParameters(f'Invalid cursor: {value}')
+
+        return key, pk
+
+    def get_ordering(self, request, queryset):
+        if ORDER_VAR in self.params:
+            return super().get_ordering(request, queryset)
+
+        return [f'-{self.keyset_field}', '-pk']
+
+    def get_results(self, request):
+        if not self.keyset_pagination:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        cursor = self.get_cursor()
+        if cursor:
+            key, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f'{self.keyset_field}__lt': key}) | Q(**{self.keyset_field: key, 'pk__lt': pk}))
+
+        result_list = list(queryset[:self.list_per_page + 1])
+        has_next = len(result_list) > self.list_per_page
+        result_list = result_list[:self.list_per_page]
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_next or cursor is not None
+        self.paginator = paginator
+        self.first_page_url = self.get_query_string(remove=[PAGE_VAR])
+        self.next_page_url = None
+        if has_next:
+            last = result_list[-1]
+            next_cursor = f'{getattr(last, self.keyset_field).isoformat()}|{last.pk}'
+            self.next_page_url = self.get_query_string({CURSOR_VAR: next_cursor}, [PAGE_VAR])
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.model_admin.list_prefetch_related:
+            queryset = queryset.prefetch_related(*self.model_admin.list_prefetch_related)
+
+        return queryset
+
+
+class LargeTableAdminMixin:
+    """
+    ModelAdmin defaults for tables with millions of rows:
+
+    - estimated counts (`EstimatedCountPaginator`), no second count of the unfiltered table
+    - keyset pagination over `keyset_field` (indexed, e.g. `HistoryMixin.created_on`) and the pk
+    - `list_select_related` and `list_prefetch_related` (many-to-many) presets for the changelist columns
+    - soft deleted rows are listed with `SoftDeleteListFilter` for `safedelete` models
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    keyset_field = 'created_on'
+    list_select_related = False
+    list_prefetch_related: Sequence[str] = ()
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if self.is_soft_delete_model():
+            return [SoftDeleteListFilter, *list_filter]
+
+        return list_filter
+
+    def get_queryset(self, request):
+        if not self.is_soft_delete_model() or not SoftDeleteListFilter.includes_deleted(request):
+            return super().get_queryset(request)
+
+        # Deleted rows only if `SoftDeleteListFilter` asks for them, the default manager's filter matches the indexes
+        queryset = self.model._default_manager.all_with_deleted()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        return queryset
+
+    def is_soft_delete_model(self) -> bool:
+        return hasattr(self.model._default_manager, 'all_with_deleted')
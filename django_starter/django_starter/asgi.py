@@ -12,5 +12,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_starter.settings_local')
+# Serve async views to avoid a thread hop per request (see `settings.ASYNC_VIEWS`)
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.PRELOAD_APPLICATION:
+    from django_starter.preload import preload_application
+
+    preload_application()
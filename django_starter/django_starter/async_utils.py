@@ -0,0 +1,91 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import inspect
+from typing import Any, Callable, List, Optional, TypeVar, Union, Type, Dict
+
+from asgiref.sync import sync_to_async
+from django.db.models import Model, QuerySet
+
+T = TypeVar('T')
+M = TypeVar('M', bound=Model)
+
+
+async def run_sync(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs `func` in the thread used for all synchronous database access (`thread_sensitive=True`),
+    so connections and transactions behave as in synchronous code.
+    """
+    return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+
+def _queryset(model_or_queryset: Union[Type[M], QuerySet]) -> QuerySet:
+    if isinstance(model_or_queryset, QuerySet):
+        return model_or_queryset
+
+    return model_or_queryset._default_manager.all()
+
+
+async def alist(model_or_queryset: Union[Type[M], QuerySet]) -> List[M]:
+    """
+    Evaluates the queryset with a single thread hop
+    """
+    return await run_sync(list, _queryset(model_or_queryset))
+
+
+async def aget(model_or_queryset: Union[Type[M], QuerySet], *args, **kwargs) -> M:
+    """
+    :raises Model.DoesNotExist
+    :raises Model.MultipleObjectsReturned
+    """
+    return await run_sync(_queryset(model_or_queryset).get, *args, **kwargs)
+
+
+async def aget_or_none(model_or_queryset: Union[Type[M], QuerySet], *args, **kwargs) -> Optional[M]:
+    return await run_sync(lambda: _queryset(model_or_queryset).filter(*args, **kwargs).first())
+
+
+async def afirst(model_or_queryset: Union[Type[M], QuerySet]) -> Optional[M]:
+    return await run_sync(_queryset(model_or_queryset).first)
+
+
+async def acount(model_or_queryset: Union[Type[M], QuerySet]) -> int:
+    return await run_sync(_queryset(model_or_queryset).count)
+
+
+async def aexists(model_or_queryset: Union[Type[M], QuerySet]) -> bool:
+    return await run_sync(_queryset(model_or_queryset).exists)
+
+
+async def acreate(model: Type[M], **kwargs) -> M:
+    return await run_sync(model._default_manager.create, **kwargs)
+
+
+async def asave(instance: M, **kwargs) -> M:
+    await run_sync(instance.save, **kwargs)
+    return instance
+
+
+async def adelete(instance: Model, **kwargs) -> Any:
+    return await run_sync(instance.delete, **kwargs)
+
+
+async def resolve_data(data: Optional[Dict]) -> Optional[Dict]:
+    """
+    Awaits awaitable values and evaluates querysets of `data` (one level deep), so the result can be serialized in
+    an async context without hitting `SynchronousOnlyOperation`
+    """
+    if not data:
+        return data
+
+    querysets = {key: value for key, value in data.items() if isinstance(value, QuerySet)}
+    resolved = {**data, **(await run_sync(lambda: {key: list(value) for key, value in querysets.items()}))} \
+        if querysets else dict(data)
+
+    for key, value in resolved.items():
+        if inspect.isawaitable(value):
+            resolved[key] = await value
+
+    return resolved
@@ -0,0 +1,363 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import asyncio
+import json
+import platform
+import statistics
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from random import Random
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Any, List, Optional, Dict, Iterable, Tuple
+
+from django.utils import translation
+
+
+@dataclass
+class BenchmarkResult:
+    label: str
+    number: int
+    timings: List[float]
+
+    @property
+    def per_call(self) -> List[float]:
+        return [it / self.number for it in self.timings]
+
+    @property
+    def best(self) -> float:
+        return min(self.per_call)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.per_call)
+
+    def __str__(self) -> str:
+        return f'{self.label:<40} {self.best * 1e6:>10.2f}µs best {self.median * 1e6:>10.2f}µs median ' \
+               f'({self.number} calls x {len(self.timings)})'
+
+
+def benchmark(label: str, func: Callable[[], Any], number: int = 1000, repeat: int = 5) -> BenchmarkResult:
+    """
+    Calls `func` `number` times per round for `repeat` rounds and records the duration of each round
+    """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        timings.append(perf_counter() - start)
+
+    return BenchmarkResult(label=label, number=number, timings=timings)
+
+
+@dataclass
+class Benchmark:
+    """
+    A benchmark of a suite, `tolerance` overrides the allowed regression of the comparison (e.g. for noisy ones).
+    `language` is activated for the whole run, not per call.
+    """
+    label: str
+    func: Callable[[], Any]
+    number: int = 1000
+    repeat: int = 5
+    tolerance: Optional[float] = None
+    language: Optional[str] = None
+
+    def run(self, scale: float = 1) -> BenchmarkResult:
+        with translation.override(self.language) if self.language else nullcontext():
+            return benchmark(self.label, self.func, number=max(int(self.number * scale), 1), repeat=self.repeat)
+
+
+def machine() -> Dict[str, str]:
+    """
+    :return: what the timings of a baseline depend on, baselines of other machines aren't comparable
+    """
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def save_baseline(path: Path, results: Iterable[BenchmarkResult], merge: bool = False):
+    """
+    :param merge: keep the results of other benchmarks in an existing baseline
+    """
+    previous = load_baseline(path)['results'] if merge and path.is_file() else {}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': machine(),
+        'results': {
+            **previous,
+            **{it.label: {'best': it.best, 'median': it.median, 'number': it.number} for it in results},
+        },
+    }, indent=2) + '\n')
+
+
+def load_baseline(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+@dataclass
+class Comparison:
+    label: str
+    baseline: Optional[float]
+    current: float
+    tolerance: float
+
+    @property
+    def change(self) -> Optional[float]:
+        """
+        :return: the relative change of the best time per call, e.g. 0.1 for 10% slower
+        """
+        return self.current / self.baseline - 1 if self.baseline else None
+
+    @property
+    def regressed(self) -> bool:
+        return self.change is not None and self.change > self.tolerance
+
+    def __str__(self) -> str:
+        change = f'{self.change * 100:+7.1f}%' if self.change is not None else '    new'
+        baseline = f'{self.baseline * 1e6:>10.2f}µs' if self.baseline else f'{"-":>12}'
+        return f'{self.label:<40} {baseline} -> {self.current * 1e6:>10.2f}µs {change}' \
+               f'{"  REGRESSION" if self.regressed else ""}'
+
+
+def compare(results: Iterable[BenchmarkResult], baseline: dict, tolerance: float,
+            tolerances: Optional[Dict[str, float]] = None) -> List[Comparison]:
+    """
+    Compares the best time per call (the least noisy statistic) with the baseline
+
+    :param tolerance: allowed relative slowdown, e.g. 0.2 for 20%
+    :param tolerances: per benchmark label
+    """
+    tolerances = tolerances or {}
+    previous = baseline.get('results', {})
+    return [Comparison(
+        label=it.label,
+        baseline=previous.get(it.label, {}).get('best'),
+        current=it.best,
+        tolerance=tolerances.get(it.label, tolerance),
+    ) for it in results]
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of `values` (`p` in 0..100)
+    """
+    if not values:
+        return 0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+@dataclass
+class LoadResult:
+    label: str
+    duration: float
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.duration if self.duration else 0
+
+    def __str__(self) -> str:
+        return f'{self.label:<40} {self.rps:>10.1f} req/s ' \
+               f'p50 {percentile(self.latencies, 50) * 1000:>8.2f}ms ' \
+               f'p95 {percentile(self.latencies, 95) * 1000:>8.2f}ms ' \
+               f'p99 {percentile(self.latencies, 99) * 1000:>8.2f}ms ' \
+               f'errors {self.errors}'
+
+
+@dataclass
+class Scenario:
+    """
+    A request of a load test mix, sent `weight` times as often as a scenario with weight 1
+
+    :param headers: e.g. `{'Cookie': 'sessionid=...'}` or `{'Authorization': 'Basic ...'}`
+    """
+    label: str
+    path: str
+    weight: int = 1
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def mix_order(scenarios: List[Scenario], requests: int, seed: int = 0) -> List[Scenario]:
+    """
+    :return: `requests` scenarios in a random order with the proportions of their weights (the same for a seed)
+    """
+    return Random(seed).choices(scenarios, weights=[it.weight for it in scenarios], k=requests)
+
+
+def wsgi_environ(path: str, method: str = 'GET', headers: Optional[dict] = None, host: str = 'localhost',
+                 scheme: str = 'http') -> dict:
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443' if scheme == 'https' else '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '10.0.0.1',
+        'HTTP_HOST': host,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scheme,
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        **(headers or {}),
+    }
+
+
+def wsgi_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    return {f'HTTP_{name.upper().replace("-", "_")}': value for name, value in headers.items()}
+
+
+def wsgi_load(label: str, application, path: str, requests: int, concurrency: int) -> LoadResult:
+    """
+    Sends `requests` requests to the WSGI `application` from `concurrency` threads (no network involved)
+    """
+    return wsgi_mix_load(application, [Scenario(label, path)], requests, concurrency)[label]
+
+
+def wsgi_mix_load(application, scenarios: List[Scenario], requests: int, concurrency: int,
+                  host: str = 'localhost', scheme: str = 'http') -> Dict[str, LoadResult]:
+    """
+    Sends `requests` requests of the mix of `scenarios` to the WSGI `application` from `concurrency` threads
+
+    :return: the results per scenario label, all share the duration of the whole run
+    """
+    results = {it.label: LoadResult(label=it.label, duration=0) for it in scenarios}
+    headers = {it.label: wsgi_headers(it.headers) for it in scenarios}
+    lock = Lock()
+
+    def request(scenario: Scenario):
+        status = []
+        start = perf_counter()
+        try:
+            body = application(wsgi_environ(scenario.path, headers=headers[scenario.label], host=host, scheme=scheme),
+                               lambda s, h, exc_info=None: status.append(s))
+            for _ in body:
+                pass
+            if hasattr(body, 'close'):
+                body.close()
+        except Exception:  # noqa
+            pass
+        latency = perf_counter() - start
+        with lock:
+            results[scenario.label].latencies.append(latency)
+            if not status or not status[0].startswith('2'):
+                results[scenario.label].errors += 1
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for it in mix_order(scenarios, requests):
+            executor.submit(request, it)
+    duration = perf_counter() - start
+    for it in results.values():
+        it.duration = duration
+    return results
+
+
+def asgi_scope(path: str, method: str = 'GET', headers: Optional[list] = None, host: str = 'localhost',
+               scheme: str = 'http') -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': scheme,
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', host.encode())] + (headers or []),
+        'client': ('10.0.0.1', 0),
+        'server': (host, 443 if scheme == 'https' else 80),
+    }
+
+
+def asgi_headers(headers: Dict[str, str]) -> List[Tuple[bytes, bytes]]:
+    return [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+
+
+def asgi_load(label: str, application, path: str, requests: int, concurrency: int) -> LoadResult:
+    """
+    Sends `requests` requests to the ASGI `application` from `concurrency` tasks (no network involved)
+    """
+    return asgi_mix_load(application, [Scenario(label, path)], requests, concurrency)[label]
+
+
+def asgi_mix_load(application, scenarios: List[Scenario], requests: int, concurrency: int,
+                  host: str = 'localhost', scheme: str = 'http') -> Dict[str, LoadResult]:
+    """
+    Sends `requests` requests of the mix of `scenarios` to the ASGI `application` from `concurrency` tasks
+
+    :return: the results per scenario label, all share the duration of the whole run
+    """
+    results = {it.label: LoadResult(label=it.label, duration=0) for it in scenarios}
+    headers = {it.label: asgi_headers(it.headers) for it in scenarios}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def request(semaphore: asyncio.Semaphore, scenario: Scenario):
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            start = perf_counter()
+            try:
+                scope = asgi_scope(scenario.path, headers=headers[scenario.label], host=host, scheme=scheme)
+                await application(scope, receive, send)
+            except Exception:  # noqa
+                pass
+            results[scenario.label].latencies.append(perf_counter() - start)
+        if not status or not 200 <= status[0] < 300:
+            results[scenario.label].errors += 1
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(request(semaphore, it) for it in mix_order(scenarios, requests)))
+
+    start = perf_counter()
+    asyncio.run(run())
+    duration = perf_counter() - start
+    for it in results.values():
+        it.duration = duration
+    return results
+
+
+def total_result(label: str, results: Iterable[LoadResult]) -> LoadResult:
+    """
+    :return: the results of all scenarios of a run combined
+    """
+    results = list(results)
+    return LoadResult(
+        label=label,
+        duration=max((it.duration for it in results), default=0),
+        latencies=[latency for it in results for latency in it.latencies],
+        errors=sum(it.errors for it in results),
+    )
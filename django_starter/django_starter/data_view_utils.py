@@ -9,6 +9,8 @@ from django.conf import settings
 from django.http import JsonResponse
 from rest_framework.response import Response
 
+from django_starter.async_utils import resolve_data
+
 
 class SuccessErrorJsonResponse(JsonResponse):
 
@@ -34,6 +36,19 @@ class SuccessErrorJsonResponse(JsonResponse):
         json_dumps_params = {**({'indent': 4} if settings.DEBUG else {}), **kwargs.get('json_dumps_params', {})}
         super().__init__(data=_data, json_dumps_params=json_dumps_params, status=status, *args, **kwargs)
 
+    @classmethod
+    async def acreate(
+        cls,
+        error: Optional[Any] = None,
+        data: Optional[Dict] = None,
+        status: Optional[int] = None,
+        *args, **kwargs
+    ) -> 'SuccessErrorJsonResponse':
+        """
+        Counterpart for async views, awaits awaitables and evaluates querysets in `data` before serialization
+        """
+        return cls(error, await resolve_data(data), status, *args, **kwargs)
+
 
 class SuccessErrorResponse(Response):
 
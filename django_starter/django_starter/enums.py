@@ -9,8 +9,6 @@ from enum import Enum, EnumMeta
 from typing import Any, Optional, Tuple, List, Set
 
 from django.conf import settings
-from django.utils import translation
-from django.utils.translation import pgettext, get_language
 
 
 class EnumCaseNotFound(Exception):
@@ -28,11 +26,14 @@ class BaseEnum(ABC, Enum, metaclass=MetaEnumABC):
         """
         :param context: Context used with `pgettext`
         :param enum_value: `BaseEnum.value` or an arbitrary value
-        :param language: Used for translation override, defaults to `get_language()`
+        :param language: Defaults to `get_language()`
         """
-        language = language or get_language()
-        with translation.override(language):
-            return pgettext(context, str(enum_value))
+        # Imported here as settings.py imports this module
+        from django.utils.translation import get_language
+        from django_starter.translations import pgettext_for
+
+        # Looked up in the preloaded catalog, activating the language per call is comparatively expensive
+        return pgettext_for(language or get_language(), context, str(enum_value))
 
     @classmethod
     def from_value(cls, value: Any, default: Optional['BaseEnum'] = None) -> Optional['BaseEnum']:
@@ -0,0 +1,42 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional, Iterator
+
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+_history_timestamp: ContextVar[Optional[datetime]] = ContextVar('history_timestamp', default=None)
+
+
+@contextmanager
+def history_timestamp(now: Optional[datetime] = None) -> Iterator[datetime]:
+    """
+    Uses a single timestamp for the `auto_now`/`auto_now_add` fields of `HistoryMixin` models saved within,
+    e.g. a batch of `bulk_create`
+    """
+    now = now or timezone.now()
+    token = _history_timestamp.set(now)
+    try:
+        yield now
+    finally:
+        _history_timestamp.reset(token)
+
+
+class HistoryDateTimeField(DateTimeField):
+    """
+    `DateTimeField` taking the `auto_now`/`auto_now_add` value from `history_timestamp()` if active
+    """
+
+    def pre_save(self, model_instance, add):
+        now = _history_timestamp.get()
+        if now is not None and (self.auto_now or (self.auto_now_add and add)):
+            setattr(model_instance, self.attname, now)
+            return now
+
+        return super().pre_save(model_instance, add)
@@ -0,0 +1,162 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import Optional, TextIO, Union
+from weakref import WeakSet
+
+from django.dispatch import Signal
+
+_handlers: 'WeakSet[AsyncStreamHandler]' = WeakSet()
+
+# Sent with `handler` when a record is dropped (e.g. for metrics)
+record_dropped = Signal()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, `extra` fields are included
+    """
+    RESERVED_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+        }
+        data.update({key: value for key, value in vars(record).items() if key not in self.RESERVED_ATTRIBUTES})
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+
+        return json.dumps(data, default=str)
+
+
+class OverflowPolicy:
+    drop = 'drop'
+    sample = 'sample'
+    block = 'block'
+
+
+class AsyncStreamHandler(QueueHandler):
+    """
+    Writes records to `stream` from a background thread, so logging threads never wait for the stream.
+    Records are buffered in a queue of `max_size` records, if it is full the `overflow` policy applies:
+
+    - drop: the record is dropped
+    - sample: every `sample_rate`-th record is kept (waiting for space), the others are dropped
+    - block: the logging thread waits for space
+
+    Records of `keep_level` and above are never dropped. Dropped records are counted in `dropped`
+    (see `dropped_records()`) and sent as `record_dropped`. Queued records are written on `flush()`/`close()`, which
+    `logging.shutdown()` calls at exit. The writer thread is restarted in forked processes.
+
+    Usable with `dictConfig`, the `formatter` is applied by the writer thread.
+    """
+
+    def __init__(
+        self,
+        stream: Optional[TextIO] = None,
+        max_size: int = 10_000,
+        overflow: str = OverflowPolicy.drop,
+        sample_rate: int = 10,
+        keep_level: Union[int, str] = logging.WARNING
+    ):
+        assert overflow in (OverflowPolicy.drop, OverflowPolicy.sample, OverflowPolicy.block), \
+            f'Unknown overflow policy: {overflow}'
+        self.target = logging.StreamHandler(stream)
+        self.max_size = max_size
+        self.overflow = overflow
+        self.sample_rate = max(sample_rate, 1)
+        self.keep_level = logging._checkLevel(keep_level)
+        self.dropped = 0
+        self._overflowed = 0
+        self._counter_lock = Lock()
+        self._running = False
+        super().__init__(queue.Queue(maxsize=max_size))
+        self.start()
+        _handlers.add(self)
+
+    def start(self):
+        # Threads don't survive a fork, a new queue avoids inheriting its (possibly held) lock
+        self.queue = queue.Queue(maxsize=self.max_size)
+        self._counter_lock = Lock()
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._running = True
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now as they may change, formatting is left to the writer thread. A copy, other handlers
+        # of the record still format the original message and arguments.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.overflow == OverflowPolicy.block or record.levelno >= self.keep_level:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self._overflowed += 1
+                keep = self.overflow == OverflowPolicy.sample and self._overflowed % self.sample_rate == 0
+                if not keep:
+                    self.dropped += 1
+
+            if keep:
+                self.queue.put(record)
+            else:
+                record_dropped.send(sender=AsyncStreamHandler, handler=self)
+
+    def flush(self):
+        if self._running:
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self._running:
+            self._running = False
+            self.listener.stop()
+        if self.dropped:
+            self.target.stream.write(f'{self.dropped} log records dropped{self.target.terminator}')
+        self.target.close()
+        super().close()
+
+
+def dropped_records() -> int:
+    """
+    Number of records dropped by all `AsyncStreamHandler` instances of this process
+    """
+    return sum(it.dropped for it in _handlers)
+
+
+def _restart_handlers():
+    for handler in _handlers:
+        if handler._running:
+            handler.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_handlers)
@@ -4,8 +4,52 @@ __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
 from django.contrib.auth.models import UserManager
+from django.db.models import QuerySet, Manager
+from django.utils import timezone
 from safedelete.managers import SafeDeleteManager
+from safedelete.queryset import SafeDeleteQueryset
 
+from django_starter.fields import history_timestamp
 
-class SafeDeleteUserManager(SafeDeleteManager, UserManager):
+
+class HistoryQuerySetMixin:
+    """
+    Stamps `modified_on` (see `HistoryMixin`) in the bulk operations, which don't call `save()`, with one timestamp
+    per call
+    """
+    history_field = 'modified_on'
+
+    def update(self, **kwargs):
+        kwargs.setdefault(self.history_field, timezone.now())
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            setattr(obj, self.history_field, now)
+
+        if self.history_field not in fields:
+            fields = [*fields, self.history_field]
+
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with history_timestamp():
+            return super().bulk_create(objs, *args, **kwargs)
+
+
+class HistoryQuerySet(HistoryQuerySetMixin, QuerySet):
     pass
+
+
+class HistoryManager(Manager.from_queryset(HistoryQuerySet)):
+    pass
+
+
+class SafeDeleteHistoryQuerySet(HistoryQuerySetMixin, SafeDeleteQueryset):
+    pass
+
+
+class SafeDeleteUserManager(SafeDeleteManager, UserManager):
+    _queryset_class = SafeDeleteHistoryQuerySet
@@ -0,0 +1,139 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import os
+import sys
+import tracemalloc
+from threading import Thread, Event
+from typing import Optional, Callable, Any, List
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_statm: Optional[int] = None
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    :return: the current resident set size (Linux only, None otherwise)
+    """
+    global _statm
+
+    if _statm is None:
+        try:
+            _statm = os.open('/proc/self/statm', os.O_RDONLY)
+        except OSError:
+            _statm = -1
+    if _statm < 0:
+        return None
+
+    # The file descriptor is kept open, reading it is about as fast as a syscall
+    return int(os.pread(_statm, 128, 0).split()[1]) * _PAGE_SIZE
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    :return: the highest resident set size of the process so far
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _reopen_statm():
+    # /proc/self was resolved when opening, the child has to read its own file
+    global _statm
+
+    if _statm is not None and _statm >= 0:
+        os.close(_statm)
+    _statm = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reopen_statm)
+
+
+def format_bytes(size: float) -> str:
+    return f'{size / 1024 / 1024:.1f}MB'
+
+
+class MemoryTracer:
+    """
+    Takes a `tracemalloc` snapshot every `interval` seconds and reports the `top` lines whose allocations grew the
+    most since the previous snapshot, e.g. to find what a long running command or worker keeps.
+    Tracing slows allocations down noticeably, enable it to investigate only.
+
+    :param frames: frames stored per allocation, more than 1 groups by the traceback (slower)
+    """
+
+    def __init__(self, interval: float, top: int = 10, frames: int = 1, output: Callable[[str], Any] = print):
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.output = output
+        self._started_tracing = False
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._previous = self.take_snapshot()
+        self._thread = Thread(target=self._run, name='memory-tracer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def report(self) -> List[tracemalloc.StatisticDiff]:
+        """
+        Outputs the largest differences to the previous snapshot
+
+        :return: the differences
+        """
+        if not tracemalloc.is_tracing():
+            return []
+
+        snapshot = self.take_snapshot()
+        differences = snapshot.compare_to(self._previous, 'traceback' if self.frames > 1 else 'lineno')
+        self._previous = snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        rss = rss_bytes()
+        self.output(f'Memory: traced {format_bytes(current)} (peak {format_bytes(peak)})'
+                    + (f', rss {format_bytes(rss)}' if rss is not None else ''))
+        top = [it for it in differences if it.size_diff > 0][:self.top]
+        for it in top:
+            self.output(f'  {it.size_diff / 1024:+.1f}kB ({it.count_diff:+d} blocks) '
+                        f'{" < ".join(str(frame) for frame in it.traceback)}')
+
+        return top
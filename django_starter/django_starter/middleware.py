@@ -0,0 +1,273 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import asyncio
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+from typing import Optional, Dict, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse, FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+
+class HybridMiddleware:
+    """
+    Base class for project middleware supporting sync and async request handling without thread hops.
+    Subclasses implement `process_request` and/or `process_response`, which must not block (no database access).
+    A response returned by `process_request` is returned without calling the following middleware and the view.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function for Django's middleware adaption (see `MiddlewareMixin`)
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request: HttpRequest):
+        if self.is_async:
+            return self.__acall__(request)
+
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request: HttpRequest):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_request(self, request: HttpRequest) -> Optional[HttpResponse]:
+        pass
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        return response
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    """
+    Adds the time spent in the following middleware and the view as `Server-Timing` header
+    """
+
+    def process_request(self, request: HttpRequest):
+        request.server_timing_start = perf_counter()
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        duration = (perf_counter() - request.server_timing_start) * 1000
+        response['Server-Timing'] = f'app;dur={duration:.1f}'
+        return response
+
+
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+
+@dataclass
+class StaticFile:
+    path: str
+    size: int
+    etag: str
+    last_modified: str
+    content_type: str
+    cache_control: str
+    # Content-Encoding -> (path, size) of the precompressed variant
+    variants: Dict[str, Tuple[str, int]] = field(default_factory=dict)
+
+
+class FileRange:
+    """
+    Limits reads of `file` to `length` bytes from its current position. Exposes `fileno()`, so `wsgi.file_wrapper`
+    implementations using `os.sendfile` (e.g. gunicorn) still send without copying, limited by `Content-Length`.
+    """
+
+    def __init__(self, file, length: int):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+@lru_cache(maxsize=64)
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """
+    :return: the quality value by (lower case) content coding of an `Accept-Encoding` header, including `*`
+    """
+    encodings = {}
+    for it in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in it.split(';')]
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        encodings[coding.lower()] = quality
+
+    return encodings
+
+
+class StaticFilesMiddleware(HybridMiddleware):
+    """
+    Serves `STATIC_ROOT` for deployments without a web server in front (`settings.SERVE_STATIC`).
+    The file metadata is indexed once at startup (collect static files before starting the workers).
+
+    - `ETag`/`If-None-Match` and single byte range requests (others are answered with the whole file)
+    - precompressed `.br`/`.gz` variants (see `CompressedManifestStaticFilesStorage`) by `Accept-Encoding`, each
+      with its own `ETag`
+    - `Cache-Control` of one year for content hashed file names
+    - `FileResponse`, which uses `wsgi.file_wrapper` (zero-copy `sendfile` with gunicorn)
+    """
+    ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+    IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+        self.prefix = settings.STATIC_URL
+        self.files = self.build_index(Path(settings.STATIC_ROOT))
+
+    @classmethod
+    def build_index(cls, root: Path) -> Dict[str, StaticFile]:
+        files = {}
+        suffixes = {suffix for _, suffix in cls.ENCODINGS}
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                if os.path.splitext(file_name)[1] in suffixes:
+                    continue
+
+                stat = os.stat(path)
+                content_type, _ = mimetypes.guess_type(file_name)
+                static_file = StaticFile(
+                    path=path,
+                    size=stat.st_size,
+                    etag=f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+                    last_modified=http_date(stat.st_mtime),
+                    content_type=content_type or 'application/octet-stream',
+                    cache_control=cls.IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.search(file_name)
+                    else cls.DEFAULT_CACHE_CONTROL,
+                )
+                for encoding, suffix in cls.ENCODINGS:
+                    if os.path.isfile(path + suffix):
+                        static_file.variants[encoding] = (path + suffix, os.path.getsize(path + suffix))
+
+                files[Path(path).relative_to(root).as_posix()] = static_file
+
+        return files
+
+    def process_request(self, request: HttpRequest) -> Optional[HttpResponse]:
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+
+        static_file = self.files.get(request.path_info[len(self.prefix):])
+        if static_file is None:
+            return None
+
+        # Ranges refer to the uncompressed file
+        byte_range = self.parse_range(request, static_file)
+        encoding = None if byte_range else self.negotiate_encoding(request, static_file)
+        etag = static_file.etag if encoding is None else f'{static_file.etag[:-1]}-{encoding}"'
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or f'W/{etag}' in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        elif byte_range:
+            response = self.range_response(static_file, *byte_range)
+        else:
+            response = self.file_response(static_file, encoding)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = static_file.last_modified
+        response['Cache-Control'] = static_file.cache_control
+        if static_file.variants:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+    def negotiate_encoding(self, request: HttpRequest, static_file: StaticFile) -> Optional[str]:
+        """
+        :return: the variant with the highest quality value (`q=0` is not acceptable), by `ENCODINGS` order if equal
+        """
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        best, best_quality = None, 0.0
+        for encoding, _ in self.ENCODINGS:
+            quality = accepted.get(encoding, accepted.get('*', 0.0))
+            if encoding in static_file.variants and quality > best_quality:
+                best, best_quality = encoding, quality
+
+        return best
+
+    def file_response(self, static_file: StaticFile, encoding: Optional[str]) -> HttpResponse:
+        path, size = static_file.variants[encoding] if encoding else (static_file.path, static_file.size)
+        response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+        del response['Content-Disposition']
+        response['Content-Length'] = size
+        response['Accept-Ranges'] = 'bytes'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def parse_range(request: HttpRequest, static_file: StaticFile) -> Optional[Tuple[int, int]]:
+        """
+        :return: first and last byte of a single range, None to send the whole file (no, several or invalid ranges,
+            which may be ignored per RFC 7233)
+        """
+        match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+        if not match or not (match.group('start') or match.group('end')):
+            return None
+
+        size = static_file.size
+        if match.group('start'):
+            start = int(match.group('start'))
+            if match.group('end') and int(match.group('end')) < start:
+                return None
+            end = min(int(match.group('end')), size - 1) if match.group('end') else size - 1
+        else:
+            start, end = max(size - int(match.group('end')), 0), size - 1
+
+        return start, end
+
+    def range_response(self, static_file: StaticFile, start: int, end: int) -> HttpResponse:
+        size = static_file.size
+        if start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        file = open(static_file.path, 'rb')
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=static_file.content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
@@ -3,12 +3,17 @@ __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
-from django.db.models import Model, DateTimeField
+from django.db.models import Model
+
+from django_starter.fields import HistoryDateTimeField
+from django_starter.managers import HistoryManager
 
 
 class HistoryMixin(Model):
-    created_on = DateTimeField(auto_now_add=True, db_index=True)
-    modified_on = DateTimeField(auto_now=True, db_index=True)
+    created_on = HistoryDateTimeField(auto_now_add=True, db_index=True)
+    modified_on = HistoryDateTimeField(auto_now=True, db_index=True)
+
+    objects = HistoryManager()
 
     class Meta:
         abstract = True
@@ -0,0 +1,77 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Callable
+
+from django.conf import settings
+from django.template import engines, TemplateSyntaxError, TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver
+from django.utils import translation
+
+from django_starter.translations import load_catalogs
+
+log = getLogger('default')
+
+
+def preload_urls() -> int:
+    resolver = get_resolver()
+    # Accessing `reverse_dict` populates the resolver including all included URLconfs
+    return len(resolver.reverse_dict)
+
+
+def preload_templates() -> int:
+    """
+    Compiles all templates of the Django template engines into their cached loaders (only active if DEBUG is off)
+    """
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+
+        for template_dir in engine.template_dirs:
+            template_dir = Path(template_dir)
+            for path in template_dir.rglob('*.htm*'):
+                try:
+                    engine.get_template(str(path.relative_to(template_dir)))
+                    count += 1
+                except (TemplateSyntaxError, TemplateDoesNotExist):
+                    pass
+
+    return count
+
+
+def preload_translations() -> int:
+    for code in settings.LANGUAGE_CODES:
+        with translation.override(code):
+            translation.gettext('')
+
+    return len(load_catalogs())
+
+
+def preload_application() -> Dict[str, float]:
+    """
+    Initializes everything Django otherwise loads lazily on the first requests of each worker.
+    Call it once in the master process of a pre-forking server (gunicorn `preload_app`), so the workers share the
+    memory via copy-on-write. Must not open database connections, as they can't be shared with forked workers.
+
+    :return: duration of each step in seconds
+    """
+    steps: Dict[str, Callable[[], int]] = {
+        'urls': preload_urls,
+        'templates': preload_templates,
+        'translations': preload_translations,
+    }
+    timings = {}
+    for name, step in steps.items():
+        start = perf_counter()
+        count = step()
+        timings[name] = perf_counter() - start
+        log.debug(f'Preloaded {count} {name} in {timings[name]:.3f}s')
+
+    return timings
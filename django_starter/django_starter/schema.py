@@ -0,0 +1,124 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Collection, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from django_starter.utils import TypeSpec, type_plan, is_mapping
+
+_missing = object()
+
+
+class SchemaErrorCode:
+    invalid_json = 'invalid_json'
+    invalid_payload = 'invalid_payload'
+    required = 'required'
+    invalid_type = 'invalid_type'
+    blank = 'blank'
+    max_length = 'max_length'
+    invalid_choice = 'invalid_choice'
+    invalid = 'invalid'
+
+
+@dataclass(frozen=True)
+class Field:
+    """
+    :param types: allowed types as for `gettype`, bool values only match if `bool` is included
+    :param required: missing, `None` and (if not `allow_blank`) blank values are errors, otherwise `default` is used
+    :param allow_blank: keep blank strings, otherwise they are handled as missing (as `none_if_blank`)
+    :param validator: additional check of the value, returns False for invalid values
+    """
+    types: TypeSpec
+    required: bool = False
+    default: Any = None
+    allow_blank: bool = False
+    max_length: Optional[int] = None
+    choices: Optional[Collection] = None
+    validator: Optional[Callable[[Any], bool]] = None
+
+
+def in_choices(value: Any, choices: frozenset) -> bool:
+    try:
+        return value in choices
+    except TypeError:
+        # Unhashable values (list, dict) can't be choices
+        return False
+
+
+class ValidationResult(NamedTuple):
+    data: Optional[Dict[str, Any]]
+    error: Optional[Dict[str, Any]]
+
+
+class Schema:
+    """
+    Validates JSON payloads against fields declared once per endpoint::
+
+        schema = Schema(name=Field(str, required=True, max_length=100), count=Field(int, default=0))
+
+        def view(request):
+            data, error = schema.validate_json(request.body)
+            if error:
+                return SuccessErrorJsonResponse(error=error)
+
+    The result contains all declared fields (with defaults), the error the code per invalid field:
+    `{'code': 'invalid_payload', 'fields': {'name': 'required'}}`
+    """
+
+    def __init__(self, **fields: Field):
+        self.fields = fields
+        # The checks of each field are prepared once, `validate` only iterates over them
+        self._plans: List[Tuple[str, Tuple[type, ...], bool, Field, Optional[frozenset]]] = []
+        for key, field in fields.items():
+            types, allow_bool = type_plan(field.types)
+            choices = frozenset(field.choices) if field.choices is not None else None
+            self._plans.append((key, types, allow_bool, field, choices))
+
+    def validate(self, payload: Any) -> ValidationResult:
+        if not is_mapping(payload):
+            return ValidationResult(None, {'code': SchemaErrorCode.invalid_payload, 'fields': {}})
+
+        data = {}
+        errors = {}
+        for key, types, allow_bool, field, choices in self._plans:
+            value = payload.get(key, _missing)
+            if value.__class__ is str and not field.allow_blank and not value.strip():
+                if field.required:
+                    errors[key] = SchemaErrorCode.blank
+                    continue
+
+                value = _missing
+
+            if value is _missing or value is None:
+                if field.required:
+                    errors[key] = SchemaErrorCode.required
+                else:
+                    data[key] = field.default
+                continue
+
+            if (value.__class__ is bool and not allow_bool) or not isinstance(value, types):
+                errors[key] = SchemaErrorCode.invalid_type
+            elif field.max_length is not None and len(value) > field.max_length:
+                errors[key] = SchemaErrorCode.max_length
+            elif choices is not None and not in_choices(value, choices):
+                errors[key] = SchemaErrorCode.invalid_choice
+            elif field.validator is not None and not field.validator(value):
+                errors[key] = SchemaErrorCode.invalid
+            else:
+                data[key] = value
+
+        if errors:
+            return ValidationResult(None, {'code': SchemaErrorCode.invalid_payload, 'fields': errors})
+
+        return ValidationResult(data, None)
+
+    def validate_json(self, body: Union[str, bytes]) -> ValidationResult:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return ValidationResult(None, {'code': SchemaErrorCode.invalid_json, 'fields': {}})
+
+        return self.validate(payload)
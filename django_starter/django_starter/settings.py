@@ -9,6 +9,8 @@ https://docs.djangoproject.com/en/3.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.0/ref/settings/
 """
+import tempfile
+from os import environ
 from pathlib import Path
 
 from django.core.exceptions import ImproperlyConfigured
@@ -51,6 +53,7 @@ INSTALLED_APPS = [
     'safedelete',
     'rest_framework',
     'core.apps.CoreConfig',
+    'metrics.apps.MetricsConfig',
 ]
 if DEBUG:
     INSTALLED_APPS += [
@@ -58,7 +61,12 @@ if DEBUG:
     ]
 
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
+    'metrics.middleware.PrometheusMiddleware',
+    'metrics.middleware.ProfilerMiddleware',
+    'metrics.middleware.MemoryMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'django_starter.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -68,7 +76,9 @@ MIDDLEWARE = [
 ]
 if DEBUG:
     MIDDLEWARE += [
-        'debug_toolbar.middleware.DebugToolbarMiddleware'
+        'django_starter.middleware.ServerTimingMiddleware',
+        # sync only, causes a thread hop per request under ASGI
+        'debug_toolbar.middleware.DebugToolbarMiddleware',
     ]
 
 ROOT_URLCONF = 'django_starter.urls'
@@ -114,6 +124,20 @@ DATABASES = {
     }
 }
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        # Counts hits and misses of the backend in `OPTIONS`
+        'BACKEND': 'metrics.cache.MetricsCache',
+        'OPTIONS': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'NAME': 'default',
+        },
+    },
+}
+
 # Logging
 # https://docs.djangoproject.com/en/3.0/topics/logging/
 
@@ -133,12 +157,18 @@ LOGGING = {
             'format': '[{levelname}] {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'django_starter.log_handlers.JsonFormatter',
+        },
     },
     'handlers': {
+        # Writes from a background thread, see `django_starter.log_handlers.AsyncStreamHandler`
         'console': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'standard'
+            'class': 'django_starter.log_handlers.AsyncStreamHandler',
+            'formatter': 'standard' if DEBUG else 'json',
+            'max_size': 10_000,
+            'overflow': 'sample',
         },
     },
     'loggers': {
@@ -207,6 +237,7 @@ LOCALE_PATHS = [
 
 LANGUAGE_CODE = 'en'
 
+
 LANGUAGES = [
     ('en', _('English')),
     ('de', _('German')),
@@ -227,6 +258,10 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR.joinpath('static')
+# Content hashed file names (cacheable forever) and precompressed .gz/.br variants. Also forced with
+# DJANGO_STATIC_MANIFEST=1 for `collectstatic` of release builds, which run with the (DEBUG) settings of the developer.
+if not DEBUG or environ.get('DJANGO_STATIC_MANIFEST') == '1':
+    STATICFILES_STORAGE = 'django_starter.storage.CompressedManifestStaticFilesStorage'
 
 # Other Django Settings
 CSRF_COOKIE_SECURE = True
@@ -252,8 +287,13 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        # TODO
-    ]
+        'django_starter.throttling.IPSlidingWindowThrottle',
+        'django_starter.throttling.UserTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'ip': '600/min',
+        'user': '120/min',
+    }
 }
 
 # Django Debug Toolbar
@@ -262,3 +302,66 @@ INTERNAL_IPS = [
 ]
 
 # Custom Settings
+
+# Disables the metrics collection while testing
+TEST_RUNNER = 'django_starter.test.TestRunner'
+
+# Cache alias used for the throttle counters of `django_starter.throttling`, must be shared between workers
+# (`check --deploy` warns about per process backends such as the LocMemCache of `default`)
+THROTTLE_CACHE = 'default'
+
+# Collect request and command durations per release into `MetricRollup` rows (`metrics` app)
+METRICS_ENABLED = not DEBUG
+# Release the metrics are recorded for, defaults to the release directory of deploy.py (releases/<timestamp>)
+METRICS_VERSION = environ.get('DJANGO_RELEASE', BASE_DIR.resolve().parent.name)
+# Seconds between writes of the aggregated metrics per process (None: only at exit)
+METRICS_FLUSH_INTERVAL = 300
+
+# Prometheus metrics of requests, database queries, caches and `Measure` spans (`metrics.prometheus`)
+PROMETHEUS_ENABLED = True
+# Directory of the per process metric files, shared by all workers of the release
+PROMETHEUS_MULTIPROC_DIR = environ.get(
+    'PROMETHEUS_MULTIPROC_DIR', str(Path(tempfile.gettempdir()) / f'django-starter-metrics-{METRICS_VERSION}'))
+# Bearer token of scrapers for /metrics/ (staff users can view it without), None: staff only
+PROMETHEUS_SCRAPE_TOKEN = denv.get('PROMETHEUS_SCRAPE_TOKEN')
+
+# Sampling profiler of live workers (`metrics.profiler`), started by this signal (`kill -URG <pid>`, None disables
+# it) or the admin, writes collapsed stacks per worker to PROFILER_DIR. SIGURG is ignored by processes without the
+# handler and unused by gunicorn (which handles USR1/USR2 itself)
+PROFILER_SIGNAL = 'SIGURG'
+PROFILER_SECONDS = 30
+PROFILER_INTERVAL = 0.01
+PROFILER_DIR = environ.get('PROFILER_DIR', str(Path(tempfile.gettempdir()) / 'django-starter-profiles'))
+
+# Log the lines allocating the most memory every N seconds per worker with tracemalloc (slow, None disables)
+MEMORY_TRACE_INTERVAL = None
+# Restart workers whose resident memory exceeds this many bytes after the current request (None disables)
+MEMORY_MAX_RSS = None
+# Signal a worker sends itself to restart, SIGTERM stops gunicorn workers gracefully
+MEMORY_RESTART_SIGNAL = 'SIGTERM'
+
+# Results of `manage.py bench --save` (machine specific) and the slowdown failing `manage.py bench --check`
+BENCHMARK_BASELINE = BASE_DIR.parent / '.benchmarks' / 'baseline.json'
+BENCHMARK_TOLERANCE = 0.2
+
+# Cache of the `fragmentcache` template tag
+FRAGMENT_CACHE = 'default'
+
+# Route to async views (set by asgi.py), sync views are faster under WSGI
+ASYNC_VIEWS = environ.get('DJANGO_ASYNC_VIEWS') == '1'
+
+# Serve STATIC_ROOT from the app for deployments without web server in front (`StaticFilesMiddleware`)
+SERVE_STATIC = False
+
+# Stylesheets inlined by the `stylesheet` template tag instead of linked (e.g. 'core/css/default.css')
+INLINE_CRITICAL_CSS = []
+
+# Load URLconf, templates and translations when wsgi.py/asgi.py is imported (see `django_starter.preload`)
+PRELOAD_APPLICATION = not DEBUG
+
+# Import time budgets in ms for a cold start per top level package or `total` (`manage.py startup_profile --check`)
+IMPORT_TIME_BUDGETS = {
+    'total': 1000,
+    'django_starter': 100,
+    **({} if DEBUG else {'debug_toolbar': 0}),
+}
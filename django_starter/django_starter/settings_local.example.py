@@ -15,6 +15,14 @@ from .settings import *  # pylint: disable=wildcard-import,unused-wildcard-impor
 # }}
 # ...
 
+# Shared cache for throttling, sessions, etc.
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+#         'LOCATION': '127.0.0.1:11211',
+#     }
+# }
+
 if ENVIRONMENT == ENVIRONMENT.debug:
     # For local development
     ALLOWED_HOSTS += [
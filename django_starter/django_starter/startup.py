@@ -0,0 +1,99 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Dict
+
+IMPORT_TIME_RE = re.compile(
+    r'^import time:\s+(?P<self>\d+)\s+\|\s+(?P<cumulative>\d+)\s+\|(?P<indent>\s+)(?P<module>\S+)')
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(output: str) -> List[ImportTime]:
+    """
+    Parses the output of `python -X importtime`
+    """
+    times = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            times.append(ImportTime(
+                module=match.group('module'),
+                self_us=int(match.group('self')),
+                cumulative_us=int(match.group('cumulative')),
+                depth=(len(match.group('indent')) - 1) // 2,
+            ))
+
+    return times
+
+
+def profile_imports(statement: str, cwd: Path, env: Optional[dict] = None) -> List[ImportTime]:
+    """
+    Runs `statement` in a fresh interpreter with `-X importtime`, so already imported modules don't hide costs
+
+    :raises subprocess.CalledProcessError
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=cwd, env={**os.environ, **(env or {})}, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, statement, stderr=result.stderr)
+
+    return parse_import_times(result.stderr)
+
+
+def median_import_times(runs: List[List[ImportTime]]) -> List[ImportTime]:
+    """
+    Combines the import times of several runs into the median per module
+    """
+    by_module: Dict[str, List[ImportTime]] = defaultdict(list)
+    for run in runs:
+        for it in run:
+            by_module[it.module].append(it)
+
+    return [ImportTime(
+        module=module,
+        self_us=int(statistics.median(it.self_us for it in times)),
+        cumulative_us=int(statistics.median(it.cumulative_us for it in times)),
+        depth=times[0].depth,
+    ) for module, times in by_module.items()]
+
+
+def package_import_times(times: List[ImportTime]) -> Dict[str, int]:
+    """
+    Sums the self import time (µs) per top level package, the key `total` holds the sum of all modules
+    """
+    packages: Dict[str, int] = defaultdict(int)
+    for it in times:
+        packages[it.module.split('.')[0]] += it.self_us
+        packages['total'] += it.self_us
+
+    return dict(packages)
+
+
+def exceeded_budgets(package_times: Dict[str, int], budgets: Dict[str, float]) -> Dict[str, float]:
+    """
+    :param package_times: import time per package in µs (see `package_import_times`)
+    :param budgets: budget per package (or `total`) in ms
+    :return: the packages over budget with their import time in ms
+    """
+    return {
+        name: package_times.get(name, 0) / 1000
+        for name, budget in budgets.items() if package_times.get(name, 0) / 1000 > budget
+    }
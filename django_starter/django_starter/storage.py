@@ -0,0 +1,84 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import List, Callable, Tuple
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional dependency, only gzip variants are created without it
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.html', '.txt', '.xml', '.ico', '.ttf', '.otf', '.eot',
+}
+
+
+def gzip_compress(data: bytes) -> bytes:
+    # mtime=0 for reproducible output
+    buffer = BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as f:
+        f.write(data)
+
+    return buffer.getvalue()
+
+
+def brotli_compress(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Collects files with a content hash in their name (long-term cacheable) and writes precompressed `.gz` and `.br`
+    (requires `brotli`) siblings of compressible files, so they don't need to be compressed per request.
+    """
+    min_size = 256
+    # Compressed variants are only kept if they are at most this fraction of the original size
+    max_ratio = 0.9
+
+    def compressors(self) -> List[Tuple[str, Callable[[bytes], bytes]]]:
+        compressors = [('.gz', gzip_compress)]
+        if brotli is not None:
+            compressors.append(('.br', brotli_compress))
+
+        return compressors
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = {*paths, *self.hashed_files.values()}
+        names = [it for it in names if os.path.splitext(it)[1].lower() in COMPRESSIBLE_EXTENSIONS]
+        # zlib and brotli release the GIL while compressing
+        with ThreadPoolExecutor() as executor:
+            for _ in executor.map(self.compress, names):
+                pass
+
+    def compress(self, name: str) -> List[str]:
+        """
+        :return: the names of the created variants
+        """
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        created = []
+        if len(data) < self.min_size:
+            return created
+
+        for suffix, compress in self.compressors():
+            compressed = compress(data)
+            if len(compressed) <= len(data) * self.max_ratio:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+                created.append(name + suffix)
+
+        return created
@@ -2,3 +2,27 @@ __author__ = 'adrian'
 __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
+
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Disables the metrics collection (`METRICS_ENABLED`) for the test run, tests enable it where needed.
+    Otherwise the remaining metrics would be written to the real database at exit.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.metrics_settings = override_settings(METRICS_ENABLED=False)
+        self.metrics_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        if apps.is_installed('metrics'):
+            # Imported lazily, `django_starter` doesn't depend on the metrics app
+            from metrics.collector import collector
+            collector.take()
+        self.metrics_settings.disable()
+        super().teardown_test_environment(**kwargs)
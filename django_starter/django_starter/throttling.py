@@ -0,0 +1,262 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import math
+from threading import Lock
+from typing import Dict, Optional, Tuple, Any, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core import checks
+from rest_framework.throttling import SimpleRateThrottle
+
+_local_lock = Lock()
+
+# Backends storing the counters per process, each worker would allow the full rate
+PER_PROCESS_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def check_throttle_cache(app_configs, **kwargs) -> List[checks.CheckMessage]:
+    """
+    Deployment check (`manage.py check --deploy`) that `settings.THROTTLE_CACHE` is shared between the workers
+    """
+    alias = getattr(settings, 'THROTTLE_CACHE', 'default')
+    config = settings.CACHES.get(alias)
+    if config is None:
+        return [checks.Error(f'THROTTLE_CACHE {alias!r} is not configured in CACHES', id='django_starter.E001')]
+
+    backend = config['BACKEND']
+    # Wrapping backends (e.g. `metrics.cache.MetricsCache`) name the actual backend in their options
+    while 'BACKEND' in config.get('OPTIONS', {}):
+        config = config['OPTIONS']
+        backend = config['BACKEND']
+    if backend not in PER_PROCESS_CACHE_BACKENDS:
+        return []
+
+    return [checks.Warning(
+        f'THROTTLE_CACHE {alias!r} uses {backend.rpartition(".")[2]}, which counts per process: the throttle rates '
+        f'are multiplied by the number of workers',
+        hint='Use a cache shared by all workers for THROTTLE_CACHE, e.g. Redis or Memcached',
+        id='django_starter.W001',
+    )]
+
+
+class CacheThrottle(SimpleRateThrottle):
+    """
+    Base class for throttles backed by atomic counters (`add`/`incr`) of the cache `settings.THROTTLE_CACHE`.
+    Use a shared cache (memcached, redis) in production, the default `LocMemCache` only counts per process.
+
+    Denied clients are remembered in-process until their retry time, so a blocked client does not cause any
+    cache round-trips. The retry time is exposed via `wait()`, which DRF sends as `Retry-After` header.
+    """
+    MAX_LOCAL_ENTRIES = 10_000
+
+    _denied: Dict[str, float] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Deny decisions are specific to the algorithm and rate of each throttle class
+        cls._denied = {}
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+        self.key: Optional[str] = None
+        self.now: float = 0
+        self.retry_after: Optional[float] = None
+
+    def allow_request(self, request, view) -> bool:
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        denied_until = self._denied.get(self.key)
+        if denied_until is not None:
+            if denied_until > self.now:
+                self.retry_after = denied_until - self.now
+                return False
+
+            self._denied.pop(self.key, None)
+
+        retry_after = self.consume()
+        if retry_after is None:
+            return True
+
+        self.retry_after = max(retry_after, 0)
+        self.remember(self._denied, self.key, self.now + self.retry_after)
+        return False
+
+    def consume(self) -> Optional[float]:
+        """
+        Counts the current request for `self.key`
+
+        :return: `None` if the request is allowed, otherwise the seconds until the client may retry
+        """
+        raise NotImplementedError('.consume() must be overridden')
+
+    def wait(self) -> Optional[float]:
+        return self.retry_after
+
+    def incr(self, key: str, delta: int, timeout: float) -> int:
+        """
+        Atomically increments `key` by `delta` and creates it with `timeout` if missing.
+        Costs a single cache round-trip if the key exists.
+        """
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            if self.cache.add(key, delta, timeout):
+                return delta
+
+            return self.cache.incr(key, delta)
+
+    @classmethod
+    def remember(cls, store: Dict[str, Any], key: str, value: Any):
+        with _local_lock:
+            if len(store) >= cls.MAX_LOCAL_ENTRIES:
+                store.clear()
+
+            store[key] = value
+
+
+class TokenBucketThrottle(CacheThrottle):
+    """
+    Bucket holding up to `num_requests` tokens, refilled at `num_requests / duration` tokens per second.
+    Allows bursts up to the bucket size while enforcing the average rate.
+
+    The bucket is stored as the number of consumed tokens (atomic counter) and the time the bucket was (re)based.
+    Once per `duration` and when the bucket overflowed (after idle time) the bucket is rebased to keep the counters
+    small and alive; concurrent requests during the rebase may get lost, which is an accepted inaccuracy.
+
+    With `lease_size > 1` tokens are taken from the shared bucket in leases and the remaining tokens of a lease are
+    served in-process without a cache round-trip, trading accuracy across processes for lower overhead.
+    """
+    lease_size: int = 1
+
+    _leases: Dict[str, Tuple[int, float]] = {}
+
+    def consume(self) -> Optional[float]:
+        if self.lease_size > 1:
+            with _local_lock:
+                tokens, expires_on = self._leases.get(self.key, (0, 0))
+                if tokens > 0 and expires_on > self.now:
+                    self._leases[self.key] = (tokens - 1, expires_on)
+                    return None
+
+        rate = self.num_requests / self.duration
+        timeout = self.duration * 2
+        count_key = f'{self.key}:n'
+        start_key = f'{self.key}:t'
+
+        lease = min(self.lease_size, self.num_requests)
+        consumed = self.incr(count_key, lease, timeout)
+        start = self.cache.get(start_key)
+        if start is None:
+            self.cache.add(start_key, self.now, timeout)
+            start = self.now
+
+        allowance = self.num_requests + (self.now - start) * rate
+        available = allowance - (consumed - lease)
+        # Tokens refilled beyond the bucket size (while idle) are lost, rebased below
+        overflowed = available > self.num_requests
+        available = min(available, self.num_requests)
+        granted = min(lease, math.floor(available))
+        if granted < lease:
+            self.cache.decr(count_key, lease - max(granted, 0))
+        if granted <= 0:
+            return (1 - available) / rate
+
+        if overflowed or self.now - start >= self.duration:
+            tokens = available - granted
+            self.cache.set_many({
+                start_key: self.now,
+                count_key: math.ceil(self.num_requests - tokens),
+            }, timeout)
+
+        if granted > 1:
+            self.remember(self._leases, self.key, (granted - 1, self.now + self.duration))
+
+        return None
+
+
+class SlidingWindowThrottle(CacheThrottle):
+    """
+    Sliding window approximated by two fixed windows: the count of the previous window is weighted by its overlap
+    with the sliding window. Needs a single cache round-trip per request, as the count of a closed window is cached
+    in-process.
+    """
+
+    _previous: Dict[str, Tuple[int, int]] = {}
+
+    def consume(self) -> Optional[float]:
+        window = int(self.now // self.duration)
+        elapsed = self.now - window * self.duration
+        window_key = f'{self.key}:{window}'
+
+        count = self.incr(window_key, 1, self.duration * 2)
+        previous = self.previous_count(window)
+        if previous * (1 - elapsed / self.duration) + count <= self.num_requests:
+            return None
+
+        self.cache.decr(window_key)
+        if count > self.num_requests:
+            return self.duration - elapsed
+
+        return self.duration * (1 - (self.num_requests - count) / previous) - elapsed
+
+    def previous_count(self, window: int) -> int:
+        cached_window, count = self._previous.get(self.key, (None, 0))
+        if cached_window == window - 1:
+            return count
+
+        count = self.cache.get(f'{self.key}:{window - 1}', 0)
+        self.remember(self._previous, self.key, (window - 1, count))
+        return count
+
+
+class UserScopeMixin:
+    """
+    Authenticated requests are throttled per user, anonymous requests per client IP
+    """
+
+    def get_cache_key(self, request, view) -> Optional[str]:
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPScopeMixin:
+    """
+    All requests are throttled per client IP
+    """
+
+    def get_cache_key(self, request, view) -> Optional[str]:
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class UserTokenBucketThrottle(UserScopeMixin, TokenBucketThrottle):
+    scope = 'user'
+
+
+class IPTokenBucketThrottle(IPScopeMixin, TokenBucketThrottle):
+    scope = 'ip'
+
+
+class UserSlidingWindowThrottle(UserScopeMixin, SlidingWindowThrottle):
+    scope = 'user'
+
+
+class IPSlidingWindowThrottle(IPScopeMixin, SlidingWindowThrottle):
+    scope = 'ip'
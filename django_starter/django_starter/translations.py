@@ -0,0 +1,95 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import trans_real
+
+CONTEXT_SEPARATOR = '\x04'
+
+_catalogs: Dict[str, Dict[str, str]] = {}
+_lock = Lock()
+
+
+def build_catalog(language: str) -> Dict[str, str]:
+    """
+    Flattens the merged catalogs of all apps and `LOCALE_PATHS` and the fallback language into a single dict.
+    Keys of context messages are `context + CONTEXT_SEPARATOR + message` (as in the .mo files), plural forms are
+    left out.
+    """
+    catalog: Dict[str, str] = {}
+    translation = trans_real.translation(language)
+    while translation is not None:
+        # Django >= 3.2 uses a `TranslationCatalog` (earlier entries take precedence), before a plain dict
+        items = getattr(translation, '_catalog', None) or {}
+        for key, value in items.items():
+            if isinstance(key, str):
+                catalog.setdefault(key, value)
+
+        translation = getattr(translation, '_fallback', None)
+
+    return catalog
+
+
+def load_catalogs(languages: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Loads the catalogs of `languages` (defaults to `settings.LANGUAGE_CODES`) once per process.
+    Called by `preload_application()`, so pre-forked workers share them.
+    """
+    for language in languages or settings.LANGUAGE_CODES:
+        get_catalog(language)
+
+    return _catalogs
+
+
+def get_catalog(language: str) -> Dict[str, str]:
+    catalog = _catalogs.get(language)
+    if catalog is None:
+        with _lock:
+            catalog = _catalogs.get(language)
+            if catalog is None:
+                catalog = _catalogs[language] = build_catalog(language)
+
+    return catalog
+
+
+def gettext_for(language: Optional[str], message: str) -> str:
+    """
+    `gettext` for `language` without activating it (`translation.override`)
+
+    :param language: None returns the message untranslated (as with `translation.override(None)`)
+    """
+    if not language or not settings.USE_I18N:
+        return message
+
+    return get_catalog(language).get(message, message)
+
+
+def pgettext_for(language: Optional[str], context: str, message: str) -> str:
+    """
+    `pgettext` for `language` without activating it (`translation.override`)
+
+    :param language: None returns the message untranslated (as with `translation.override(None)`)
+    """
+    if not language or not settings.USE_I18N:
+        return message
+
+    return get_catalog(language).get(f'{context}{CONTEXT_SEPARATOR}{message}', message)
+
+
+def clear_catalogs():
+    with _lock:
+        _catalogs.clear()
+
+
+@receiver(setting_changed)
+def _clear_catalogs_on_setting_changed(setting: str, **kwargs):
+    # Django resets its own translations for the same settings
+    if setting in {'LANGUAGES', 'LANGUAGE_CODE', 'LOCALE_PATHS', 'INSTALLED_APPS', 'USE_I18N'}:
+        clear_catalogs()
@@ -13,18 +13,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-import debug_toolbar
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from metrics.views import prometheus_metrics
+
 urlpatterns = [
     path('', include('core.urls')),
     path('admin/', admin.site.urls),
+    path('metrics/', prometheus_metrics, name='prometheus_metrics'),
 ]
 
 if settings.DEBUG:
     urlpatterns += [
-        path('__debug__/', include(debug_toolbar.urls)),
+        # Imported lazily, debug_toolbar is only installed for development
+        path('__debug__/', include('debug_toolbar.urls')),
         path('api-auth/', include('rest_framework.urls'))
     ]
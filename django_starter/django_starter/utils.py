@@ -3,15 +3,18 @@ __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
-import collections
 import functools
 from enum import Enum
 from logging import Logger, getLogger
-from time import time
-from typing import List, Optional, Any, Callable, AnyStr, Union, Mapping, TypeVar, Tuple
+from time import time, perf_counter
+from typing import List, Optional, Any, Callable, AnyStr, Union, Mapping, TypeVar, Tuple, Set, Dict, Iterable, Iterator
 
+from django.apps import apps
 from django.core.management import BaseCommand
-from django.db import transaction
+from django.db import transaction, reset_queries
+from django.dispatch import Signal
+
+from django_starter.memory import MemoryTracer
 
 T = TypeVar('T')
 
@@ -44,6 +47,37 @@ class LogCommand(BaseCommand):
         parser.add_argument('-l', '--log-level', type=str,
                             help='Log messages below this level will be omitted. '
                                  f'({", ".join(f"{it.short_name}[{it.name}]" for it in self.LOG_LEVEL_OPTIONS)})')
+        parser.add_argument('--trace-memory', type=float, metavar='SECONDS',
+                            help='Log the lines allocating the most memory since the last report every SECONDS')
+
+    def execute(self, *args, **options):
+        tracer = None
+        if options.get('trace_memory'):
+            tracer = MemoryTracer(options['trace_memory'], output=self.log.info)
+            tracer.start()
+
+        try:
+            return self._execute_with_metrics(*args, **options)
+        finally:
+            if tracer:
+                tracer.stop()
+
+    def _execute_with_metrics(self, *args, **options):
+        if not apps.is_installed('metrics'):
+            return super().execute(*args, **options)
+
+        # Imported lazily, `django_starter` doesn't depend on the metrics app
+        from metrics.collector import record
+        from metrics.models import MetricKind
+        from metrics.profiler import activity
+
+        name = self.__module__.rpartition('.')[2]
+        start = perf_counter()
+        try:
+            with activity(f'command:{name}'):
+                return super().execute(*args, **options)
+        finally:
+            record(MetricKind.command, name, perf_counter() - start)
 
     def handle(self, *args, **options):
         self.cron = options.get('cron', False)
@@ -64,6 +98,25 @@ class LogCommand(BaseCommand):
             self.log.setLevel(self.log_level.value)
 
 
+def batched(iterable: Iterable[T], size: int = 1000) -> Iterator[List[T]]:
+    """
+    Splits `iterable` into lists of `size` items for batch loops of commands. Resets the query log after each
+    batch, which grows with every query with DEBUG (`connection.queries`) and would otherwise keep all SQL of a
+    long run in memory.
+    """
+    batch = []
+    for it in iterable:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+            reset_queries()
+
+    if batch:
+        yield batch
+        reset_queries()
+
+
 class DryRunException(Exception):
     pass
 
@@ -106,6 +159,10 @@ def measure(label: Optional[str] = None, output_handler: Optional[Callable[[str]
     return actual_decorator
 
 
+# Sent with `label` and `seconds` when a labeled `Measure` span ends (e.g. for metrics)
+measure_finished = Signal()
+
+
 class Measure(object):
 
     def __init__(self, label: Optional[str] = None, output_handler: Optional[Callable[[str], Any]] = None):
@@ -117,7 +174,11 @@ class Measure(object):
         self.start = time()
 
     def __exit__(self, exc_type, exc_value, traceback):
-        duration = round(time() - self.start, 3)
+        seconds = time() - self.start
+        if self.label:
+            measure_finished.send(sender=Measure, label=self.label, seconds=seconds)
+
+        duration = round(seconds, 3)
         if self.label:
             message = f'{self.label} took {duration:.3f}s'
         else:
@@ -128,16 +189,63 @@ class Measure(object):
             print(message)
 
 
+TypeSpec = Union[type, Tuple[Union[type, Tuple[Any, ...]], ...], List[type], Set[type]]
+
+
+def build_type_plan(allowed_types: TypeSpec) -> Tuple[Tuple[type, ...], bool]:
+    """
+    :return: the flattened types for `isinstance` and whether bool values are allowed
+    """
+    pending = list(allowed_types) if isinstance(allowed_types, (set, frozenset, tuple, list)) else [allowed_types]
+    types = []
+    while pending:
+        it = pending.pop(0)
+        if isinstance(it, (set, frozenset, tuple, list)):
+            pending[:0] = it
+        else:
+            types.append(it)
+
+    # bool workaround
+    # https://stackoverflow.com/questions/37888620/comparing-boolean-and-int-using-isinstance
+    return tuple(types), bool in types
+
+
+# Type plans per `allowed_types` and `isinstance(it, Mapping)` per class (the ABC check is comparatively slow),
+# both are looked up inline by `gettype`
+_type_plans: Dict[Any, Tuple[Tuple[type, ...], bool]] = {}
+_mapping_classes: Dict[type, bool] = {dict: True}
+
+
+def type_plan(allowed_types: TypeSpec) -> Tuple[Tuple[type, ...], bool]:
+    try:
+        return _type_plans[allowed_types]
+    except KeyError:
+        plan = _type_plans[allowed_types] = build_type_plan(allowed_types)
+        return plan
+    except TypeError:
+        # Unhashable (list, set)
+        return build_type_plan(allowed_types)
+
+
+def is_mapping(instance: Any) -> bool:
+    try:
+        return _mapping_classes[instance.__class__]
+    except KeyError:
+        result = _mapping_classes[instance.__class__] = isinstance(instance, Mapping)
+        return result
+
+
 def gettype(
     instance: Union[Mapping, object],
     key: str,
-    allowed_types: Union[type, Tuple[Union[type, Tuple[Any, ...]]]],
+    allowed_types: TypeSpec,
     default: Optional[T] = None
 ) -> Optional[T]:
     """
     Attempts to retrieve the value from `instance` (`None` if not present) and checks it's type.
     If the type does not match `None` is returned.
-    Uses `instance.get()` when `instance` is a dict like type and `getattr()` for all other types
+    Uses `instance.get()` when `instance` is a dict like type and `getattr()` for all other types.
+    Use `compile_gettype` for repeated lookups of the same key.
 
     :param instance: dict or object to retrieve the value/attribute from
     :param key: key for lookup
@@ -145,22 +253,88 @@ def gettype(
     :param default: default value if key was not found and/or type check failed
     :return: A value of type specified in `type` parameter otherwise None or default value (if provided)
     """
-    if isinstance(instance, object):
-        value = getattr(instance, key, default)
-    else:
-        value = instance.get(key, default)
+    mapping = _mapping_classes.get(instance.__class__)
+    if mapping is None:
+        mapping = is_mapping(instance)
 
-    # bool workaround
-    # https://stackoverflow.com/questions/37888620/comparing-boolean-and-int-using-isinstance
-    iterable_types = (set, tuple, list, collections.Iterable)
-    types = tuple(allowed_types) if isinstance(allowed_types, iterable_types) else (allowed_types, )
-    is_bool = isinstance(value, bool)
-    if is_bool and bool not in types:
-        has_valid_type = False
+    if mapping:
+        value = instance.get(key, default)
     else:
-        has_valid_type = isinstance(value, types)
+        value = getattr(instance, key, default)
+
+    try:
+        types, allow_bool = _type_plans[allowed_types]
+    except (KeyError, TypeError):
+        types, allow_bool = type_plan(allowed_types)
+
+    if value.__class__ is bool and not allow_bool:
+        return default
+
+    return value if isinstance(value, types) else default
+
+
+def compile_gettype(
+    key: str,
+    allowed_types: TypeSpec,
+    default: Optional[T] = None
+) -> Callable[[Union[Mapping, object]], Optional[T]]:
+    """
+    Compiles `gettype(instance, key, allowed_types, default)` into a function of `instance`, the type check is
+    prepared once
+
+    :return: function returning the value of `instance` or `default`
+    """
+    types, allow_bool = type_plan(allowed_types)
+
+    def compiled_gettype(instance: Union[Mapping, object]) -> Optional[T]:
+        if is_mapping(instance):
+            value = instance.get(key, default)
+        else:
+            value = getattr(instance, key, default)
+
+        if value.__class__ is bool and not allow_bool:
+            return default
+
+        return value if isinstance(value, types) else default
+
+    return compiled_gettype
+
+
+def compile_gettypes(
+    spec: Mapping[str, TypeSpec],
+    defaults: Optional[Mapping[str, Any]] = None
+) -> Callable[[Union[Mapping, object]], Dict[str, Any]]:
+    """
+    Compiles `gettype` for each field of a record
+
+    :param spec: allowed types per key
+    :param defaults: default value per key (None if missing)
+    :return: function returning the values of a record (dict or object) by key
+    """
+    defaults = defaults or {}
+    getters = [(key, compile_gettype(key, allowed_types, defaults.get(key))) for key, allowed_types in spec.items()]
+
+    def compiled_gettypes(instance: Union[Mapping, object]) -> Dict[str, Any]:
+        return {key: getter(instance) for key, getter in getters}
+
+    return compiled_gettypes
+
+
+def gettypes(
+    records: Union[Mapping, object, Iterable[Union[Mapping, object]]],
+    spec: Mapping[str, TypeSpec],
+    defaults: Optional[Mapping[str, Any]] = None
+) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    `gettype` for each key of `spec` of a record or a list of records
+
+    :return: the values by key, a list of them if `records` is a list (or other iterable besides a dict)
+    """
+    compiled = compile_gettypes(spec, defaults)
+    if isinstance(records, Mapping) or not isinstance(records, Iterable) or isinstance(records, (str, bytes)):
+        return compiled(records)
 
-    return value if has_valid_type else (default if default is not None else None)
+    return [compiled(it) for it in records]
 
 
 def is_blank(string: Optional[AnyStr]) -> bool:
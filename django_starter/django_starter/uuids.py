@@ -0,0 +1,78 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import os
+from threading import Lock
+from time import time_ns
+from typing import List
+from uuid import UUID
+
+# Time ordered UUIDs (UUIDv7 layout, RFC 9562): 48 bit unix timestamp in ms, version, 12 bit counter (rand_a),
+# variant, 62 random bits. Consecutive keys are appended to the end of B-tree indexes instead of random pages.
+_VERSION_AND_VARIANT = (0x7 << 76) | (0b10 << 62)
+_MAX_COUNTER = 0xFFF
+_RANDOM_MASK = (1 << 62) - 1
+
+_lock = Lock()
+_last_ms = 0
+_counter = 0
+
+
+def _next_timestamps(count: int) -> List[int]:
+    """
+    :return: the timestamp and counter bits of `count` keys, strictly increasing within the process
+    """
+    global _last_ms, _counter
+
+    with _lock:
+        ms = time_ns() // 1_000_000
+        if ms > _last_ms:
+            # Starts with a random counter in the lower half, leaving room for keys in the same ms
+            counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            # Same ms or the clock went backwards: continue after the last key
+            ms = _last_ms
+            counter = _counter + 1
+
+        values = []
+        for _ in range(count):
+            if counter > _MAX_COUNTER:
+                # Counter overflow borrows the next ms
+                ms += 1
+                counter = 0
+            values.append(ms << 80 | counter << 64)
+            counter += 1
+
+        _last_ms = ms
+        _counter = counter - 1
+
+    return values
+
+
+def uuid7() -> UUID:
+    """
+    Time ordered, otherwise random UUID for primary keys (`UUIDField(default=uuid7)`)
+    """
+    return uuid7_batch(1)[0]
+
+
+def uuid7_batch(count: int) -> List[UUID]:
+    """
+    `count` increasing `uuid7` keys with a single lock and read of the random source, e.g. for `bulk_create`
+    """
+    random = int.from_bytes(os.urandom(8 * count), 'big')
+    keys = []
+    for timestamp in _next_timestamps(count):
+        keys.append(UUID(int=timestamp | _VERSION_AND_VARIANT | (random & _RANDOM_MASK)))
+        random >>= 64
+
+    return keys
+
+
+def uuid7_time_ms(key: UUID) -> int:
+    """
+    :return: the unix timestamp in ms of a `uuid7` key
+    """
+    return key.int >> 80
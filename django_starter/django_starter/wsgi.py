@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_starter.settings_local')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.PRELOAD_APPLICATION:
+    from django_starter.preload import preload_application
+
+    preload_application()
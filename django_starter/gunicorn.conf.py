@@ -0,0 +1,23 @@
+# Gunicorn config, run from the django directory with: gunicorn -c gunicorn.conf.py django_starter.wsgi
+# Reload without downtime with `./reload.sh gunicorn.pid` (used by deploy.py if `pidFile` is configured)
+import gc
+import multiprocessing
+
+bind = '127.0.0.1:8000'
+workers = multiprocessing.cpu_count() * 2 + 1
+pidfile = 'gunicorn.pid'
+
+# Import the application (and `django_starter.preload`) in the master, workers share its memory via copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Keep the garbage collector from touching (and thereby copying) the preloaded objects in the workers
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Workers reset some of the signal handlers inherited from the master (e.g. USR1, USR2), install the profiler's
+    # again in case `PROFILER_SIGNAL` is one of them
+    from metrics.profiler import install_signal_handler
+    install_signal_handler()
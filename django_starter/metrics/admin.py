@@ -0,0 +1,126 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.translation import gettext_lazy as _
+
+from metrics.models import MetricRollup, MetricKind
+from metrics.profiler import profile_dir, start_profiling, signal_workers, sibling_workers, MAX_SECONDS
+from metrics.prometheus import process_ids
+from metrics.report import latest_versions, compare_versions
+
+
+@admin.register(MetricRollup)
+class MetricRollupAdmin(admin.ModelAdmin):
+    list_display = ('period_start', 'version', 'kind', 'name', 'count', 'average_ms', 'max_ms')
+    list_filter = ('kind', 'version')
+    search_fields = ('name', )
+    date_hierarchy = 'period_start'
+    ordering = ('-period_start', )
+    show_full_result_count = False
+    change_list_template = 'admin/metrics/change_list.html'
+
+    @admin.display(description=_('average [ms]'))
+    def average_ms(self, obj: MetricRollup) -> str:
+        return f'{obj.total / obj.count * 1000:.1f}' if obj.count else '-'
+
+    @admin.display(description=_('max [ms]'))
+    def max_ms(self, obj: MetricRollup) -> str:
+        return f'{obj.max * 1000:.1f}'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('compare/', self.admin_site.admin_view(self.compare_view), name='metrics_metricrollup_compare'),
+            path('profiles/', self.admin_site.admin_view(self.profiles_view), name='metrics_metricrollup_profiles'),
+            path('profiles/<str:name>/', self.admin_site.admin_view(self.profile_view),
+                 name='metrics_metricrollup_profile'),
+            *super().get_urls(),
+        ]
+
+    def compare_view(self, request):
+        """
+        p50/p95 per endpoint and command of two releases (`?base=&target=&kind=`, defaults to the latest two)
+        """
+        versions = latest_versions(20)
+        target = request.GET.get('target') or (versions[0] if versions else None)
+        base = request.GET.get('base') or next((it for it in versions if it != target), None)
+        kind = request.GET.get('kind') or None
+        comparisons = compare_versions(base, target, kind=kind) if base and target else []
+
+        return TemplateResponse(request, 'admin/metrics/compare.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Compare releases'),
+            'subtitle': None,
+            'versions': versions,
+            'kinds': [MetricKind.request, MetricKind.command],
+            'base': base,
+            'target': target,
+            'kind': kind,
+            'comparisons': comparisons,
+        })
+
+    def profiles_view(self, request):
+        """
+        Lists the written profiles, POST starts profiling this worker or all workers of the host
+        """
+        if request.method == 'POST':
+            if not request.user.is_superuser:
+                raise PermissionDenied()
+
+            try:
+                seconds = float(request.POST.get('seconds') or settings.PROFILER_SECONDS)
+            except ValueError:
+                seconds = math.nan
+            if not math.isfinite(seconds) or seconds <= 0:
+                self.message_user(request, _('Enter a number of seconds.'), messages.ERROR)
+                return HttpResponseRedirect(reverse('admin:metrics_metricrollup_profiles'))
+
+            workers = 1 if start_profiling(min(seconds, MAX_SECONDS)) else 0
+            if request.POST.get('all') and settings.PROFILER_SIGNAL:
+                # The signal uses `PROFILER_SECONDS`
+                workers += signal_workers(sibling_workers(process_ids()))
+            self.message_user(request, _('Profiling %(workers)d worker(s), reload in a few seconds.') % {
+                'workers': workers,
+            }, messages.SUCCESS if workers else messages.WARNING)
+            return HttpResponseRedirect(reverse('admin:metrics_metricrollup_profiles'))
+
+        profiles = [{
+            'name': it.name,
+            'size': it.stat().st_size,
+            'modified': datetime.fromtimestamp(it.stat().st_mtime),
+        } for it in profile_dir().glob('*.collapsed')]
+
+        return TemplateResponse(request, 'admin/metrics/profiles.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Profiles'),
+            'subtitle': None,
+            'profiles': sorted(profiles, key=lambda it: it['modified'], reverse=True),
+            'seconds': settings.PROFILER_SECONDS,
+            'max_seconds': MAX_SECONDS,
+            'signal': settings.PROFILER_SIGNAL,
+        })
+
+    def profile_view(self, request, name: str):
+        path = profile_dir() / name
+        if path.suffix != '.collapsed' or path.name != name or not path.is_file():
+            raise Http404()
+
+        return FileResponse(path.open('rb'), as_attachment=True, content_type='text/plain')
@@ -0,0 +1,16 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    name = 'metrics'
+
+    def ready(self):
+        # Connects the receivers instrumenting database queries, `Measure` spans and dropped log records
+        from metrics import instrumentation  # noqa: F401
+        from metrics.profiler import install_signal_handler
+        install_signal_handler()
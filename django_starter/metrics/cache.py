@@ -0,0 +1,66 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from typing import Any
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from metrics.instrumentation import cache_requests
+
+_missing = object()
+
+
+class MetricsCache:
+    """
+    Cache backend counting the hits and misses of `get` and `get_many` of another backend
+    (`django_cache_requests_total`)::
+
+        CACHES = {
+            'default': {
+                'BACKEND': 'metrics.cache.MetricsCache',
+                'LOCATION': 'unique-snowflake',
+                'OPTIONS': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'NAME': 'default'},
+            },
+        }
+
+    All other methods are passed through.
+    """
+
+    def __init__(self, location: str, params: dict):
+        options = {**params.get('OPTIONS', {})}
+        backend = options.pop('BACKEND')
+        name = options.pop('NAME', backend.rpartition('.')[2])
+        self.cache = import_string(backend)(location, {**params, 'OPTIONS': options})
+        self._hits = cache_requests.labels(name, 'hit')
+        self._misses = cache_requests.labels(name, 'miss')
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.cache, name)
+
+    def __contains__(self, key) -> bool:
+        return key in self.cache
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, _missing, version=version)
+        if value is _missing:
+            if settings.PROMETHEUS_ENABLED:
+                self._misses.inc()
+            return default
+
+        if settings.PROMETHEUS_ENABLED:
+            self._hits.inc()
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self.cache.get_many(keys, version=version)
+        if settings.PROMETHEUS_ENABLED:
+            if values:
+                self._hits.inc(len(values))
+            if len(keys) > len(values):
+                self._misses.inc(len(keys) - len(values))
+
+        return values
@@ -0,0 +1,152 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import atexit
+import os
+from dataclasses import dataclass, field
+from logging import getLogger
+from threading import Lock, Thread, Event
+from typing import Dict, Tuple, List, Optional
+
+from django.conf import settings
+from django.db import connection, DatabaseError
+from django.utils import timezone
+
+from metrics import histogram
+from metrics.histogram import Histogram
+from metrics.models import MetricRollup
+
+log = getLogger('default')
+
+
+@dataclass
+class Aggregate:
+    count: int = 0
+    total: float = 0
+    min: float = float('inf')
+    max: float = 0
+    histogram: Histogram = field(default_factory=dict)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        histogram.add(self.histogram, seconds)
+
+
+class MetricsCollector:
+    """
+    Aggregates durations per (kind, name) in memory and writes them as `MetricRollup` rows with one bulk insert per
+    flush. `start()` flushes every `settings.METRICS_FLUSH_INTERVAL` seconds from a background thread, so recording
+    never waits for the database. Remaining aggregates are flushed at exit.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._aggregates: Dict[Tuple[str, str], Aggregate] = {}
+        self._period_start = timezone.now()
+        self._thread: Optional[Thread] = None
+        self._stopped = Event()
+
+    def record(self, kind: str, name: str, seconds: float):
+        if not settings.METRICS_ENABLED:
+            return
+
+        if self._thread is None:
+            self.start()
+
+        with self._lock:
+            aggregate = self._aggregates.get((kind, name))
+            if aggregate is None:
+                aggregate = self._aggregates[(kind, name)] = Aggregate()
+            aggregate.add(seconds)
+
+    def take(self) -> List[MetricRollup]:
+        """
+        :return: the rollups since the last call, resets the aggregates
+        """
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+            period_start, self._period_start = self._period_start, timezone.now()
+
+        return [MetricRollup(
+            version=settings.METRICS_VERSION,
+            kind=kind,
+            name=name[:200],
+            period_start=period_start,
+            count=it.count,
+            total=it.total,
+            min=it.min,
+            max=it.max,
+            histogram=it.histogram,
+        ) for (kind, name), it in aggregates.items()]
+
+    def flush(self) -> int:
+        """
+        :return: the number of written rollups
+        """
+        rollups = self.take()
+        if not rollups:
+            return 0
+
+        try:
+            MetricRollup.objects.bulk_create(rollups)
+        except DatabaseError as e:
+            log.warning(f'Failed to write {len(rollups)} metric rollups: {e}')
+            return 0
+
+        return len(rollups)
+
+    def start(self):
+        """
+        Starts the flush thread (once per process)
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            interval = settings.METRICS_FLUSH_INTERVAL
+            self._thread = Thread(target=self._run, args=(interval, ), name='metrics-flush', daemon=True)
+            if interval:
+                self._thread.start()
+
+    def reset_after_fork(self):
+        # Threads don't survive a fork and the lock may be held, the parent flushes its own aggregates
+        self._lock = Lock()
+        self._aggregates = {}
+        self._period_start = timezone.now()
+        self._thread = None
+        self._stopped = Event()
+
+    def _run(self, interval: float):
+        while not self._stopped.wait(interval):
+            try:
+                self.flush()
+            finally:
+                # The thread's own connection, closed as the thread idles most of the time
+                connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+
+collector = MetricsCollector()
+
+
+def record(kind: str, name: str, seconds: float):
+    collector.record(kind, name, seconds)
+
+
+@atexit.register
+def _flush_at_exit():
+    # Not when disabled meanwhile, e.g. by `django_starter.test.TestRunner` (the test databases are gone at exit)
+    if collector._aggregates and settings.METRICS_ENABLED:
+        collector.stop()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=collector.reset_after_fork)
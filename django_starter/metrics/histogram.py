@@ -0,0 +1,67 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import math
+from typing import Dict, Iterable
+
+# Log scale buckets from 0.1ms with 10% width (~2% error of percentiles, 146 buckets up to 1000s), sparse and
+# mergeable, so rollups of any period can be combined
+MIN_SECONDS = 0.0001
+GROWTH = 1.1
+_LOG_GROWTH = math.log(GROWTH)
+
+Histogram = Dict[str, int]
+
+
+def bucket_index(seconds: float) -> int:
+    if seconds <= MIN_SECONDS:
+        return 0
+
+    return int(math.log(seconds / MIN_SECONDS) / _LOG_GROWTH) + 1
+
+
+def bucket_value(index: int) -> float:
+    """
+    :return: the middle of the bucket in seconds
+    """
+    if index == 0:
+        return MIN_SECONDS
+
+    return MIN_SECONDS * GROWTH ** (index - 0.5)
+
+
+def add(histogram: Histogram, seconds: float):
+    # JSON object keys are strings
+    key = str(bucket_index(seconds))
+    histogram[key] = histogram.get(key, 0) + 1
+
+
+def merge(histograms: Iterable[Histogram]) -> Histogram:
+    merged: Histogram = {}
+    for histogram in histograms:
+        for key, count in histogram.items():
+            merged[key] = merged.get(key, 0) + count
+
+    return merged
+
+
+def percentile(histogram: Histogram, p: float) -> float:
+    """
+    :param p: 0-100
+    :return: the approximate percentile in seconds, NaN if empty
+    """
+    buckets = sorted((int(key), count) for key, count in histogram.items())
+    total = sum(count for _, count in buckets)
+    if not total:
+        return math.nan
+
+    rank = max(math.ceil(total * p / 100), 1)
+    seen = 0
+    for index, count in buckets:
+        seen += count
+        if seen >= rank:
+            return bucket_value(index)
+
+    return bucket_value(buckets[-1][0])
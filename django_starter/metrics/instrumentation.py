@@ -0,0 +1,75 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from django_starter.log_handlers import record_dropped
+from django_starter.utils import measure_finished
+from metrics.prometheus import Counter, Gauge, Histogram
+
+# Default metrics, recorded if `settings.PROMETHEUS_ENABLED`
+http_requests = Counter('django_http_requests_total', 'Responses by method, URL pattern and status code',
+                        ('method', 'route', 'status'))
+http_request_duration = Histogram('django_http_request_duration_seconds',
+                                  'Duration of the middleware and view by method and URL pattern', ('method', 'route'))
+http_requests_in_progress = Gauge('django_http_requests_in_progress', 'Requests being handled by all workers')
+db_query_duration = Histogram('django_db_query_duration_seconds', 'Duration of database queries by statement',
+                              ('alias', 'statement'))
+db_query_errors = Counter('django_db_query_errors_total', 'Failed database queries', ('alias', 'statement'))
+cache_requests = Counter('django_cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+                         ('cache', 'result'))
+request_rss_growth = Counter('django_http_request_rss_growth_bytes_total',
+                             'Growth of the resident memory while handling requests by method and URL pattern',
+                             ('method', 'route'))
+request_peak_rss_growth = Counter('django_http_request_peak_rss_growth_bytes_total',
+                                  'Growth of the peak resident memory by requests by method and URL pattern',
+                                  ('method', 'route'))
+resident_memory = Gauge('process_resident_memory_bytes', 'Resident memory per worker process', multiprocess_mode='all')
+measure_duration = Histogram('django_starter_measure_duration_seconds', 'Duration of `Measure` spans by label',
+                             ('label', ))
+log_records_dropped = Counter('django_starter_log_records_dropped_total',
+                              'Log records dropped by `AsyncStreamHandler` as its queue was full')
+
+
+class QueryMetrics:
+    """
+    Execute wrapper of a database connection, see `connection.execute_wrapper`
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        statement = sql.split(None, 1)[0].upper() if sql else ''
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except Exception:
+            db_query_errors.labels(self.alias, statement).inc()
+            raise
+        finally:
+            db_query_duration.labels(self.alias, statement).observe(perf_counter() - start)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if settings.PROMETHEUS_ENABLED and not any(isinstance(it, QueryMetrics) for it in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, QueryMetrics(connection.alias))
+
+
+@receiver(measure_finished)
+def _observe_measure(sender, label: str, seconds: float, **kwargs):
+    if settings.PROMETHEUS_ENABLED:
+        measure_duration.labels(label).observe(seconds)
+
+
+@receiver(record_dropped)
+def _count_dropped_record(sender, handler, **kwargs):
+    if settings.PROMETHEUS_ENABLED:
+        log_records_dropped.inc()
@@ -0,0 +1,54 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import math
+from typing import Optional
+
+from django.core.management import CommandError
+
+from django_starter.utils import LogCommand
+from metrics.report import latest_versions, compare_versions, Stats
+
+
+def format_ms(seconds: Optional[float]) -> str:
+    return '-' if seconds is None or math.isnan(seconds) else f'{seconds * 1000:.1f}'
+
+
+def format_change(change: Optional[float]) -> str:
+    return '-' if change is None else f'{change:+.0f}%'
+
+
+class Command(LogCommand):
+    help = 'Compares the p50/p95 durations per endpoint and command of two releases (defaults to the latest two)'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--base', type=str, help='Version to compare against')
+        parser.add_argument('--target', type=str, help='Version to compare')
+        parser.add_argument('--kind', type=str, help='Only compare `request` or `command` metrics')
+        parser.add_argument('--min-count', type=int, default=1, help='Skip names with fewer measurements')
+        parser.add_argument('--top', type=int, default=30, help='Number of names to list')
+
+    def handle(self, *args, **options):
+        super().handle(*args, **options)
+        target, base = options['target'], options['base']
+        if not target or not base:
+            versions = [it for it in latest_versions(3) if it not in (target, base)]
+            target = target or (versions.pop(0) if versions else None)
+            base = base or (versions.pop(0) if versions else None)
+        if not target or not base:
+            raise CommandError('Two versions with metrics are required')
+
+        comparisons = compare_versions(base, target, kind=options['kind'], min_count=options['min_count'])
+        self.stdout.write(f'{base} -> {target} (durations in ms)\n')
+        self.stdout.write(f'{"p50":>8} {"p50 new":>8} {"change":>7} {"p95":>8} {"p95 new":>8} {"change":>7} '
+                          f'{"count":>8}  name')
+        for it in comparisons[:options['top']]:
+            base_stats = it.base or Stats(0, math.nan, math.nan)
+            target_stats = it.target or Stats(0, math.nan, math.nan)
+            self.stdout.write(
+                f'{format_ms(base_stats.p50):>8} {format_ms(target_stats.p50):>8} {format_change(it.p50_change):>7} '
+                f'{format_ms(base_stats.p95):>8} {format_ms(target_stats.p95):>8} {format_change(it.p95_change):>7} '
+                f'{target_stats.count:>8}  {it.kind} {it.name}')
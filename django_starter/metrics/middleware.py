@@ -0,0 +1,160 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import os
+import signal
+from logging import getLogger
+from threading import get_ident, Lock
+from weakref import WeakSet
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+
+from django_starter.memory import rss_bytes, peak_rss_bytes, MemoryTracer
+from django_starter.middleware import HybridMiddleware
+from metrics.collector import collector
+from metrics.instrumentation import http_requests, http_request_duration, http_requests_in_progress, \
+    request_rss_growth, request_peak_rss_growth, resident_memory
+from metrics.models import MetricKind
+from metrics.profiler import _activities
+
+log = getLogger('default')
+
+
+def route_name(request: HttpRequest) -> str:
+    """
+    URL pattern of the view (not the path, which contains ids)
+    """
+    match = getattr(request, 'resolver_match', None)
+    return f'/{match.route}' if match else '<unresolved>'
+
+
+def endpoint_name(request: HttpRequest) -> str:
+    return f'{request.method} {route_name(request)}'
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Records the duration of the following middleware and the view per endpoint (`settings.METRICS_ENABLED`)
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+
+    def process_request(self, request: HttpRequest):
+        request.metrics_start = perf_counter()
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        collector.record(MetricKind.request, endpoint_name(request), perf_counter() - request.metrics_start)
+        return response
+
+
+class PrometheusMiddleware(HybridMiddleware):
+    """
+    Counts the responses and observes their durations per endpoint (`settings.PROMETHEUS_ENABLED`)
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROMETHEUS_ENABLED:
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+
+    def process_request(self, request: HttpRequest):
+        http_requests_in_progress.inc()
+        request.prometheus_start = perf_counter()
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        seconds = perf_counter() - request.prometheus_start
+        http_requests_in_progress.dec()
+        route = route_name(request)
+        http_requests.labels(request.method, route, response.status_code).inc()
+        http_request_duration.labels(request.method, route).observe(seconds)
+        return response
+
+
+class ProfilerMiddleware(HybridMiddleware):
+    """
+    Attributes the samples of `metrics.profiler` to the endpoint of the request being handled by each thread.
+    Sync requests only, async requests share the thread of the event loop.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.is_async:
+            raise MiddlewareNotUsed()
+
+    def process_request(self, request: HttpRequest):
+        _activities[get_ident()] = request
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        _activities.pop(get_ident(), None)
+        return response
+
+
+class MemoryMiddleware(HybridMiddleware):
+    """
+    Tracks the memory of the worker (Linux):
+
+    - growth of the resident and peak resident memory per endpoint (`PROMETHEUS_ENABLED`). The memory is only
+      measured per process, so only requests which didn't overlap with others are attributed (threaded workers and
+      ASGI handle several at a time).
+    - `tracemalloc` reports every `MEMORY_TRACE_INTERVAL` seconds in each worker (slow, to investigate leaks)
+    - restarts the worker with `MEMORY_RESTART_SIGNAL` (graceful for gunicorn: finishes the current requests) once
+      the resident memory exceeds `MEMORY_MAX_RSS` bytes
+    """
+
+    def __init__(self, get_response):
+        if rss_bytes() is None or not (settings.PROMETHEUS_ENABLED or settings.MEMORY_TRACE_INTERVAL
+                                       or settings.MEMORY_MAX_RSS):
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+        self.tracer_pid = None
+        self.restarting = False
+        self.lock = Lock()
+        # Weak, so requests cancelled before their response (ASGI disconnects) don't stay active
+        self.active: WeakSet = WeakSet()
+        # Number of started requests, a request overlapped others if it changed while it was active
+        self.started = 0
+
+    def process_request(self, request: HttpRequest):
+        if settings.MEMORY_TRACE_INTERVAL and self.tracer_pid != os.getpid():
+            # Per worker, threads aren't inherited by forked workers
+            self.tracer_pid = os.getpid()
+            MemoryTracer(settings.MEMORY_TRACE_INTERVAL, output=log.info).start()
+
+        with self.lock:
+            self.started += 1
+            # None if other requests are active, their growth can't be told apart
+            request.memory_started = None if self.active else self.started
+            self.active.add(request)
+        request.memory_start = (rss_bytes(), peak_rss_bytes())
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        rss, peak = rss_bytes(), peak_rss_bytes()
+        with self.lock:
+            self.active.discard(request)
+            exclusive = request.memory_started == self.started
+        start_rss, start_peak = request.memory_start
+        if settings.PROMETHEUS_ENABLED:
+            route = route_name(request)
+            if exclusive and rss > start_rss:
+                request_rss_growth.labels(request.method, route).inc(rss - start_rss)
+            if exclusive and peak is not None and peak > start_peak:
+                request_peak_rss_growth.labels(request.method, route).inc(peak - start_peak)
+            resident_memory.set(rss)
+
+        if settings.MEMORY_MAX_RSS and rss > settings.MEMORY_MAX_RSS and not self.restarting:
+            self.restarting = True
+            log.warning(f'Restarting worker {os.getpid()} using {rss / 1024 / 1024:.0f}MB')
+            os.kill(os.getpid(), getattr(signal, settings.MEMORY_RESTART_SIGNAL))
+
+        return response
@@ -0,0 +1,36 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from django.db.models import Model, CharField, DateTimeField, PositiveIntegerField, FloatField, JSONField, Index
+
+
+class MetricKind:
+    request = 'request'
+    command = 'command'
+
+
+class MetricRollup(Model):
+    """
+    Durations of a request endpoint or command of one process aggregated over a flush interval
+    (see `metrics.collector`), `histogram` holds the counts per bucket of `metrics.histogram`
+    """
+    version = CharField(max_length=64)
+    kind = CharField(max_length=16)
+    name = CharField(max_length=200)
+    period_start = DateTimeField()
+    count = PositiveIntegerField()
+    total = FloatField()
+    min = FloatField()
+    max = FloatField()
+    histogram = JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            Index(fields=['version', 'kind', 'name'], name='metric_rollup_version_idx'),
+            Index(fields=['period_start'], name='metric_rollup_period_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.version} {self.kind} {self.name} ({self.count})'
@@ -0,0 +1,258 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import os
+import signal
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from threading import Lock, Thread, Event, get_ident
+from time import monotonic
+from types import CodeType, FrameType
+from typing import Dict, Tuple, Optional, Union, Any, Iterator, Iterable, List
+
+from django.conf import settings
+from django.http import HttpRequest
+
+log = getLogger('default')
+
+# What each thread is working on (thread id: label or request), set by `ProfilerMiddleware` and `LogCommand`
+_activities: Dict[int, Union[str, HttpRequest]] = {}
+
+
+@contextmanager
+def activity(label: str) -> Iterator[None]:
+    """
+    Attributes the samples of the current thread to `label`
+    """
+    ident = get_ident()
+    previous = _activities.get(ident)
+    _activities[ident] = label
+    try:
+        yield
+    finally:
+        if previous is None:
+            _activities.pop(ident, None)
+        else:
+            _activities[ident] = previous
+
+
+def activity_label(value: Union[str, HttpRequest, None]) -> Optional[str]:
+    if isinstance(value, HttpRequest):
+        # Resolved when sampled, the URL pattern is known after the request started
+        from metrics.middleware import endpoint_name
+        return f'request:{endpoint_name(value)}'
+
+    return value
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads every `interval` seconds from a background thread (no tracing overhead in the
+    profiled code) and counts them per activity (`activity`, the endpoint or command). The result is in the
+    collapsed stack format of flamegraph.pl, also read by speedscope.
+
+    :param all_threads: include threads without activity, e.g. idle workers waiting for requests
+    """
+
+    def __init__(self, interval: float = 0.01, all_threads: bool = False):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples = 0
+        self.stacks: Dict[Tuple[Optional[str], Tuple[CodeType, ...]], int] = {}
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    def sample(self):
+        own = get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+
+            label = activity_label(_activities.get(ident))
+            if label is None and not self.all_threads:
+                continue
+
+            codes = []
+            current: Optional[FrameType] = frame
+            while current is not None:
+                codes.append(current.f_code)
+                current = current.f_back
+
+            key = (label, tuple(reversed(codes)))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def start(self, seconds: Optional[float] = None):
+        self._thread = Thread(target=self.run, args=(seconds, ), name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def run(self, seconds: Optional[float] = None):
+        """
+        Samples in the current thread until stopped or `seconds` passed
+        """
+        end = monotonic() + seconds if seconds else None
+        while not self._stopped.wait(self.interval):
+            self.sample()
+            if end is not None and monotonic() >= end:
+                break
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """
+        :return: one line per stack: `activity;outer frame;...;inner frame count`
+        """
+        names: Dict[CodeType, str] = {}
+        lines: Dict[str, int] = {}
+        for (label, codes), count in self.stacks.items():
+            frames = []
+            for code in codes:
+                name = names.get(code)
+                if name is None:
+                    name = names[code] = frame_name(code)
+                frames.append(name)
+            line = ';'.join([label or '<other>', *frames])
+            lines[line] = lines.get(line, 0) + count
+
+        return ''.join(f'{line} {count}\n' for line, count in sorted(lines.items()))
+
+
+def frame_name(code: CodeType) -> str:
+    filename = code.co_filename
+    for path in sys.path:
+        if path and filename.startswith(path):
+            filename = filename[len(path):].lstrip(os.sep)
+            break
+
+    # `;` separates the frames, spaces the count
+    return f'{getattr(code, "co_qualname", code.co_name)} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+# Longest profile started from the admin
+MAX_SECONDS = 600
+
+_lock = Lock()
+_running: Optional[SamplingProfiler] = None
+
+
+def profile_dir() -> Path:
+    directory = Path(settings.PROFILER_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def start_profiling(seconds: Optional[float] = None) -> Optional[Path]:
+    """
+    Profiles this process for `seconds` (`settings.PROFILER_SECONDS`) in the background
+
+    :return: the file the collapsed stacks will be written to, None if already profiling
+    """
+    global _running
+
+    seconds = seconds or settings.PROFILER_SECONDS
+    path = profile_dir() / f'{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.collapsed'
+    # Not blocking, also called from the signal handler, which may interrupt the holder of the lock
+    if not _lock.acquire(blocking=False):
+        return None
+    try:
+        if _running is not None:
+            return None
+        profiler = _running = SamplingProfiler(settings.PROFILER_INTERVAL)
+    finally:
+        _lock.release()
+
+    Thread(target=_profile, args=(profiler, seconds, path), name='sampling-profiler-writer', daemon=True).start()
+    return path
+
+
+def _profile(profiler: SamplingProfiler, seconds: float, path: Path):
+    global _running
+
+    try:
+        log.info(f'Profiling process {os.getpid()} for {seconds}s')
+        profiler.run(seconds)
+        path.write_text(profiler.collapsed())
+        log.info(f'Wrote {profiler.samples} samples to {path}')
+    finally:
+        _running = None
+
+
+def _reset_after_fork():
+    # The profiler thread and the activities of other threads don't exist in the child
+    global _running
+    _running = None
+    _activities.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _handle_signal(signum: int, frame: Any):
+    start_profiling()
+
+
+def install_signal_handler():
+    """
+    Starts profiling on `settings.PROFILER_SIGNAL` (e.g. `kill -URG <pid>`), only possible in the main thread.
+    Called in `ready()` and again per gunicorn worker (`post_worker_init`), as servers may reset signal handlers
+    of forked workers.
+    """
+    name = settings.PROFILER_SIGNAL
+    if not name or not hasattr(signal, name) or threading.current_thread() is not threading.main_thread():
+        return
+
+    signal.signal(getattr(signal, name), _handle_signal)
+
+
+def parent_pid(pid: int) -> Optional[int]:
+    """
+    :return: the parent of the process `pid` (Linux only, None otherwise)
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as file:
+            stat = file.read()
+    except OSError:
+        return None
+
+    # The process name in parentheses may contain spaces, the state and parent id follow it
+    return int(stat[stat.rindex(b')') + 2:].split()[1])
+
+
+def sibling_workers(pids: Iterable[int]) -> List[int]:
+    """
+    :return: the processes of `pids` forked by the parent of this process (the other workers of the server), not
+        e.g. commands which recorded metrics or processes reusing the id of an exited worker
+    """
+    parent = os.getppid()
+    if parent <= 1:
+        return []
+
+    return [it for it in pids if it != os.getpid() and parent_pid(it) == parent]
+
+
+def signal_workers(pids: Iterable[int]) -> int:
+    """
+    Sends `settings.PROFILER_SIGNAL` to the worker processes `pids`
+
+    :return: the number of signaled processes
+    """
+    signum = getattr(signal, settings.PROFILER_SIGNAL)
+    signaled = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signum)
+            signaled += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    return signaled
@@ -0,0 +1,458 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import atexit
+import json
+import math
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Tuple, List, Iterator, Sequence, Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (development only): files of exited processes aren't compacted
+    fcntl = None
+
+# Values are stored in one file per process and type (`<type>_<pid>.db`), which only this process writes to, so
+# workers never wait for each other. A scrape sums the files of all processes (see `collect`).
+_HEADER = struct.Struct('<Q')
+_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 7.5, 10.0, math.inf)
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class MmapValues:
+    """
+    Float values by key in a memory mapped file: a header with the used bytes, followed by entries of the key
+    length, the UTF-8 key (padded to 8 bytes) and the value. New entries are written before the header is updated,
+    so readers of other processes never see partial entries.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = Lock()
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        self._positions = {key: position for key, _, position in read_entries(self._mmap, self._used)}
+
+    def _position(self, key: str) -> int:
+        position = self._positions.get(key)
+        if position is not None:
+            return position
+
+        encoded = key.encode()
+        length = _LENGTH.size + len(encoded)
+        length += -length % 8
+        if self._used + length + _VALUE.size > self._capacity:
+            self._resize(self._used + length + _VALUE.size)
+
+        self._mmap[self._used:self._used + _LENGTH.size + len(encoded)] = _LENGTH.pack(len(encoded)) + encoded
+        position = self._positions[key] = self._used + length
+        _VALUE.pack_into(self._mmap, position, 0.0)
+        self._used = position + _VALUE.size
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        return position
+
+    def _resize(self, required: int):
+        while self._capacity < required:
+            self._capacity *= 2
+        self._mmap.close()
+        self._file.truncate(self._capacity)
+        self._mmap = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def inc(self, key: str, amount: float):
+        with self.lock:
+            position = self._position(key)
+            _VALUE.pack_into(self._mmap, position, _VALUE.unpack_from(self._mmap, position)[0] + amount)
+
+    def inc_many(self, increments: Sequence[Tuple[str, float]]):
+        with self.lock:
+            for key, amount in increments:
+                position = self._position(key)
+                _VALUE.pack_into(self._mmap, position, _VALUE.unpack_from(self._mmap, position)[0] + amount)
+
+    def set(self, key: str, value: float):
+        with self.lock:
+            _VALUE.pack_into(self._mmap, self._position(key), value)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+def read_entries(data, used: Optional[int] = None) -> Iterator[Tuple[str, float, int]]:
+    """
+    :return: key, value and value position of the entries of a `MmapValues` file
+    """
+    used = used or _HEADER.unpack_from(data, 0)[0]
+    position = _HEADER.size
+    while position < used:
+        length = _LENGTH.unpack_from(data, position)[0]
+        key = bytes(data[position + _LENGTH.size:position + _LENGTH.size + length]).decode()
+        position += _LENGTH.size + length
+        position += -position % 8
+        yield key, _VALUE.unpack_from(data, position)[0], position
+        position += _VALUE.size
+
+
+def read_file(path: Path) -> Iterator[Tuple[str, float]]:
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < _HEADER.size:
+        return
+
+    for key, value, _ in read_entries(data):
+        yield key, value
+
+
+def multiprocess_dir() -> Path:
+    directory = Path(settings.PROMETHEUS_MULTIPROC_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+_files_lock = Lock()
+_files: Dict[str, MmapValues] = {}
+
+
+def values_file(file_type: str) -> MmapValues:
+    """
+    :return: the file of this process for a metric type
+    """
+    values = _files.get(file_type)
+    if values is None:
+        with _files_lock:
+            values = _files.get(file_type)
+            if values is None:
+                values = _files[file_type] = MmapValues(multiprocess_dir() / f'{file_type}_{os.getpid()}.db')
+
+    return values
+
+
+@atexit.register
+def close_files():
+    """
+    Closes the files of this process, they are reopened when written to again
+    """
+    for it in list(_files.values()):
+        it.close()
+    _files.clear()
+
+
+def _reset_files():
+    # The child writes its own files. Closing the inherited descriptors and mappings doesn't affect the parent.
+    global _files_lock
+    _files_lock = Lock()
+    close_files()
+
+
+@receiver(setting_changed)
+def _reset_files_on_dir_change(setting, **kwargs):
+    if setting == 'PROMETHEUS_MULTIPROC_DIR':
+        close_files()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_files)
+
+
+registry: Dict[str, 'Metric'] = {}
+
+
+def sample_key(name: str, sample: str, labels: Sequence[Tuple[str, str]]) -> str:
+    return json.dumps([name, sample, labels])
+
+
+class Metric:
+    type = ''
+    file_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        registry[name] = self
+
+    def labels(self, *values: str):
+        """
+        :return: the metric of the label values (cached, keep a reference for hot paths)
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects the labels {", ".join(self.labelnames)}')
+            child = self._children[values] = self.child(tuple(zip(self.labelnames, map(str, values))))
+
+        return child
+
+    def child(self, labels: Tuple[Tuple[str, str], ...]):
+        raise NotImplementedError()
+
+
+class CounterChild:
+
+    def __init__(self, metric: 'Counter', labels: Tuple[Tuple[str, str], ...]):
+        self.file_type = metric.file_type
+        self.key = sample_key(metric.name, metric.name, labels)
+
+    def inc(self, amount: float = 1):
+        values_file(self.file_type).inc(self.key, amount)
+
+
+class Counter(Metric):
+    type = 'counter'
+    file_type = 'counter'
+
+    def child(self, labels):
+        return CounterChild(self, labels)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class GaugeChild(CounterChild):
+
+    def dec(self, amount: float = 1):
+        values_file(self.file_type).inc(self.key, -amount)
+
+    def set(self, value: float):
+        values_file(self.file_type).set(self.key, value)
+
+
+class Gauge(Metric):
+    """
+    :param multiprocess_mode: how the values of the running processes are combined: `sum`, `max`, `min`
+        or `all` (a `pid` label per process)
+    """
+    type = 'gauge'
+    MODES = ('sum', 'max', 'min', 'all')
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), multiprocess_mode='sum'):
+        if multiprocess_mode not in self.MODES:
+            raise ValueError(f'Unknown multiprocess mode: {multiprocess_mode}')
+
+        self.file_type = f'gauge-{multiprocess_mode}'
+        super().__init__(name, documentation, labelnames)
+
+    def child(self, labels):
+        return GaugeChild(self, labels)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class HistogramChild:
+
+    def __init__(self, metric: 'Histogram', labels: Tuple[Tuple[str, str], ...]):
+        self.buckets = metric.buckets
+        # Counts per bucket are stored non-cumulative (one increment per observation), `collect` sums them up
+        self.bucket_keys = [sample_key(metric.name, f'{metric.name}_bucket', (*labels, ('le', format_value(it))))
+                            for it in metric.buckets]
+        self.sum_key = sample_key(metric.name, f'{metric.name}_sum', labels)
+        self.count_key = sample_key(metric.name, f'{metric.name}_count', labels)
+        self._values: Optional[MmapValues] = None
+
+    def observe(self, value: float):
+        values = values_file('histogram')
+        bucket_key = self.bucket_keys[bisect_left(self.buckets, value)]
+        increments = [(bucket_key, 1), (self.sum_key, value), (self.count_key, 1)]
+        if values is not self._values:
+            # Creates the empty buckets as well, all of them are exposed
+            increments += [(it, 0) for it in self.bucket_keys]
+            self._values = values
+        values.inc_many(increments)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+    file_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != math.inf:
+            self.buckets += (math.inf, )
+        super().__init__(name, documentation, labelnames)
+
+    def child(self, labels):
+        return HistogramChild(self, labels)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def process_ids() -> List[int]:
+    """
+    :return: the running processes which recorded metrics (the workers of this host)
+    """
+    pids = {int(path.stem.rpartition('_')[2]) for path in multiprocess_dir().glob('*_[0-9]*.db')}
+    return sorted(it for it in pids if process_alive(it))
+
+
+def compact_exited(directory: Path, files: List[Tuple[Path, str, str]]) -> List[Tuple[Path, str, str]]:
+    """
+    Adds the counters and histograms of exited processes to the `archive` files and removes the files of exited
+    processes, so the directory doesn't grow with restarted workers. Requires the exclusive lock of `collect`.
+
+    :return: the remaining files
+    """
+    remaining = []
+    archives: Dict[str, MmapValues] = {}
+    for path, file_type, pid in files:
+        if pid == 'archive' or process_alive(int(pid)):
+            remaining.append((path, file_type, pid))
+            continue
+
+        if not file_type.startswith('gauge'):
+            archive = archives.get(file_type)
+            if archive is None:
+                archive = archives[file_type] = MmapValues(directory / f'{file_type}_archive.db')
+                remaining.append((archive.path, file_type, 'archive'))
+            archive.inc_many(list(read_file(path)))
+        path.unlink()
+
+    for it in archives.values():
+        it.close()
+
+    return list({it[0]: it for it in remaining}.values())
+
+
+def collect() -> Dict[str, Tuple[str, Dict[Sample, float]]]:
+    """
+    :return: the type and values per sample (name and labels) of each metric of all processes
+    """
+    directory = multiprocess_dir()
+    files = []
+    for path in directory.glob('*.db'):
+        file_type, _, pid = path.stem.rpartition('_')
+        if pid == 'archive' or pid.isdigit():
+            files.append((path, file_type, pid))
+
+    metrics: Dict[str, Tuple[str, Dict[Sample, float]]] = {}
+    with open(directory / '.lock', 'w') as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            files = compact_exited(directory, files)
+
+        for path, file_type, pid in files:
+            metric_type, _, mode = file_type.partition('-')
+            if metric_type == 'gauge' and not process_alive(int(pid)):
+                continue
+
+            for key, value in read_file(path):
+                name, sample, labels = json.loads(key)
+                labels = tuple(tuple(it) for it in labels)
+                if mode == 'all':
+                    labels += (('pid', pid), )
+                samples = metrics.setdefault(name, (metric_type, {}))[1]
+                current = samples.get((sample, labels))
+                if current is None:
+                    samples[(sample, labels)] = value
+                elif mode == 'max':
+                    samples[(sample, labels)] = max(current, value)
+                elif mode == 'min':
+                    samples[(sample, labels)] = min(current, value)
+                else:
+                    samples[(sample, labels)] = current + value
+
+    for name, (metric_type, samples) in metrics.items():
+        if metric_type == 'histogram':
+            metrics[name] = (metric_type, cumulative_buckets(samples))
+
+    return metrics
+
+
+def sample_order(sample: Sample) -> Tuple:
+    # Buckets by their bound instead of the string
+    name, labels = sample
+    le = dict(labels).get('le')
+    return name, tuple(it for it in labels if it[0] != 'le'), float(le) if le else 0
+
+
+def cumulative_buckets(samples: Dict[Sample, float]) -> Dict[Sample, float]:
+    result = {}
+    total = 0
+    group = None
+    for sample in sorted(samples, key=sample_order):
+        if sample[0].endswith('_bucket'):
+            order = sample_order(sample)
+            if order[:2] != group:
+                group = order[:2]
+                total = 0
+            total += samples[sample]
+            result[sample] = total
+        else:
+            result[sample] = samples[sample]
+
+    return result
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    elif value == -math.inf:
+        return '-Inf'
+    elif math.isnan(value):
+        return 'NaN'
+
+    return repr(float(value))
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def exposition(metrics: Optional[Dict[str, Tuple[str, Dict[Sample, float]]]] = None) -> str:
+    """
+    :return: the metrics of `collect` in the Prometheus text format (version 0.0.4)
+    """
+    metrics = collect() if metrics is None else metrics
+    lines = []
+    for name in sorted(metrics):
+        metric_type, samples = metrics[name]
+        if name in registry:
+            lines.append(f'# HELP {name} {registry[name].documentation}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for (sample, labels), value in sorted(samples.items(), key=lambda it: sample_order(it[0])):
+            label_string = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+            lines.append(f'{sample}{{{label_string}}} {format_value(value)}' if labels
+                         else f'{sample} {format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,99 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Max
+
+from metrics import histogram
+from metrics.models import MetricRollup
+
+
+@dataclass
+class Stats:
+    count: int
+    p50: float
+    p95: float
+
+
+@dataclass
+class Comparison:
+    kind: str
+    name: str
+    base: Optional[Stats]
+    target: Optional[Stats]
+
+    @property
+    def p50_change(self) -> Optional[float]:
+        return relative_change(self.base and self.base.p50, self.target and self.target.p50)
+
+    @property
+    def p95_change(self) -> Optional[float]:
+        return relative_change(self.base and self.base.p95, self.target and self.target.p95)
+
+
+def relative_change(base: Optional[float], target: Optional[float]) -> Optional[float]:
+    """
+    :return: the change in percent, None if not comparable
+    """
+    if not base or target is None or math.isnan(base) or math.isnan(target):
+        return None
+
+    return (target - base) / base * 100
+
+
+def latest_versions(count: int = 2) -> List[str]:
+    """
+    :return: the versions with the most recent rollups, newest first
+    """
+    versions = MetricRollup.objects.values('version').annotate(last=Max('period_start')).order_by('-last')
+    return [it['version'] for it in versions[:count]]
+
+
+def version_stats(version: str, kind: Optional[str] = None, since: Optional[datetime] = None) \
+        -> Dict[Tuple[str, str], Stats]:
+    """
+    Merges the histograms of all rollups of `version` per (kind, name)
+    """
+    queryset = MetricRollup.objects.filter(version=version)
+    if kind:
+        queryset = queryset.filter(kind=kind)
+    if since:
+        queryset = queryset.filter(period_start__gte=since)
+
+    merged: Dict[Tuple[str, str], histogram.Histogram] = {}
+    counts: Dict[Tuple[str, str], int] = {}
+    for it in queryset.values_list('kind', 'name', 'count', 'histogram').iterator():
+        key = (it[0], it[1])
+        merged[key] = histogram.merge([merged.get(key, {}), it[3]])
+        counts[key] = counts.get(key, 0) + it[2]
+
+    return {key: Stats(
+        count=counts[key],
+        p50=histogram.percentile(it, 50),
+        p95=histogram.percentile(it, 95),
+    ) for key, it in merged.items()}
+
+
+def compare_versions(base: str, target: str, kind: Optional[str] = None, min_count: int = 1) -> List[Comparison]:
+    """
+    :return: p50/p95 of both versions per (kind, name), the largest p95 regressions first
+    """
+    base_stats = version_stats(base, kind)
+    target_stats = version_stats(target, kind)
+    comparisons = [Comparison(
+        kind=key[0],
+        name=key[1],
+        base=base_stats.get(key),
+        target=target_stats.get(key),
+    ) for key in sorted({*base_stats, *target_stats})]
+    comparisons = [it for it in comparisons if max(it.base.count if it.base else 0,
+                                                   it.target.count if it.target else 0) >= min_count]
+
+    return sorted(comparisons, key=lambda it: it.p95_change if it.p95_change is not None else -math.inf,
+                  reverse=True)
@@ -0,0 +1,29 @@
+__author__ = 'Adrian Geuß'
+__contact__ = 'adrian@viagis.app'
+__copyright__ = 'Copyright 2021 VIAGIS'
+__project__ = 'django-starter'
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import HttpRequest, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+
+from metrics.prometheus import exposition
+
+
+def exposition_response(request: HttpRequest) -> HttpResponse:
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@never_cache
+def prometheus_metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Metrics of all worker processes for staff users or scrapers sending `Authorization: Bearer <token>`
+    (`settings.PROMETHEUS_SCRAPE_TOKEN`)
+    """
+    token = settings.PROMETHEUS_SCRAPE_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return exposition_response(request)
+
+    return admin.site.admin_view(exposition_response)(request)
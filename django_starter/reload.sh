@@ -0,0 +1,32 @@
+#!/usr/bin/env bash
+# Reloads the application after a deployment: ./reload.sh [gunicorn pid file]
+# gunicorn: the master re-executes itself with the new code (USR2). Once the new master booted as many workers as the
+# old one has, the old master is stopped gracefully (TERM): its workers stop accepting and finish their requests
+# (up to `graceful_timeout`). Both masters share the listening socket, so no connection is dropped.
+# Without pid file wsgi.py is touched, which restarts the mod_wsgi daemon processes.
+
+PID_FILE="$1"
+if [ -z "$PID_FILE" ]; then
+  touch django_starter/wsgi.py || (echo 'touch failed' && exit 1)
+  exit $?
+fi
+
+OLD_PID=$(cat "$PID_FILE") || exit 1
+WORKERS=$(pgrep -c -P "$OLD_PID")
+[ "$WORKERS" -gt 0 ] 2>/dev/null || WORKERS=1
+kill -USR2 "$OLD_PID" || exit 1
+
+for _ in $(seq 60); do
+  sleep 1
+  # The new master writes `<pid file>.2` and renames it once the old master stopped
+  NEW_PID=$(cat "$PID_FILE.2" 2>/dev/null)
+  if [ -n "$NEW_PID" ] && kill -0 "$NEW_PID" 2>/dev/null \
+      && [ "$(pgrep -c -P "$NEW_PID")" -ge "$WORKERS" ]; then
+    kill -TERM "$OLD_PID"
+    echo "Reloaded gunicorn master $OLD_PID -> $NEW_PID"
+    exit 0
+  fi
+done
+
+echo 'Reload failed: new gunicorn master did not boot its workers' >&2
+exit 1
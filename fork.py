@@ -5,14 +5,19 @@ __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
+import os
 import re
 import shutil
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import repeat
 from pathlib import Path
 from subprocess import run, DEVNULL, PIPE
 from sys import stderr
-from typing import List, Pattern, Iterable, Optional
+from tempfile import NamedTemporaryFile
+from time import time
+from typing import List, Pattern, Iterable, Optional, Tuple, Dict
 
 SCRIPT_DIR = Path(__file__).absolute().parent
 IGNORED_DIRECTORY_PATTERNS = {
@@ -25,6 +30,9 @@ IGNORED_FILE_PATTERNS = {
     re.compile(r'\.DS_Store'),
 }
 TP = 40
+BINARY_SNIFF_SIZE = 8192
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+verbose = False
 
 
 @dataclass
@@ -50,38 +58,97 @@ def rename_dir(source_path: Path, target_path: Path, dir_title: str) -> Path:
     return new_path
 
 
-def replace_in_dir(dir_path: Path, subs: Iterable[ReSub]) -> List[Path]:
-    adjusted_files = []
+class CombinedSub:
+    """
+    Applies all substitutions in one pass with a single compiled alternation.
+    Unlike applying them one after another, replacements are never matched again by other patterns.
+    """
+
+    def __init__(self, subs: Iterable[ReSub]):
+        subs = list(subs)
+        self.pattern = re.compile('|'.join(f'(?P<s{i}>{it.pattern.pattern})' for i, it in enumerate(subs)))
+        self.replacements = {f's{i}': it.replacement for i, it in enumerate(subs)}
+
+    def subn(self, text: str) -> Tuple[str, int]:
+        return self.pattern.subn(lambda match: self.replacements[match.lastgroup], text)
+
+
+def is_binary(path: Path) -> bool:
+    with path.open('rb') as f:
+        return b'\0' in f.read(BINARY_SNIFF_SIZE)
+
+
+def write_atomic(path: Path, lines: Iterable[str]):
+    """
+    Writes to a temporary file next to `path` and replaces `path` with it, keeping the permissions
+    """
+    with NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, prefix=f'.{path.name}.', delete=False) as f:
+        f.writelines(lines)
+    shutil.copymode(path, f.name)
+    os.replace(f.name, path)
+
+
+def rewrite_file(path: Path, sub: CombinedSub, dry_run: bool = False) -> Optional[int]:
+    """
+    :return: number of replacements, `None` if the file was skipped (binary or not UTF-8)
+    """
+    try:
+        if is_binary(path):
+            return None
+
+        if path.stat().st_size <= LARGE_FILE_SIZE:
+            with path.open(encoding='utf-8', newline='') as f:
+                content, count = sub.subn(f.read())
+            if count and not dry_run:
+                write_atomic(path, [content])
+            return count
+
+        # Stream large files line by line (patterns don't span lines)
+        count = 0
+        with path.open(encoding='utf-8', newline='') as f:
+            for line in f:
+                count += sub.subn(line)[1]
+        if count and not dry_run:
+            with path.open(encoding='utf-8', newline='') as f:
+                write_atomic(path, (sub.subn(line)[0] for line in f))
+        return count
+    except UnicodeDecodeError:
+        return None
+
+
+def list_files(dir_path: Path) -> List[Path]:
+    files = []
     for item in dir_path.iterdir():
         if item.is_dir():
             if any(it.match(item.name) for it in IGNORED_DIRECTORY_PATTERNS):
                 continue
 
-            adjusted_files += replace_in_dir(item, subs)
+            files += list_files(item)
         elif item.is_file():
             if any(it.match(item.name) for it in IGNORED_FILE_PATTERNS):
                 continue
 
-            updated_lines = []
-            total_replacements = 0
-            try:
-                with item.open() as f:
-                    for line in f.readlines():
-                        updated_line = line
-                        for sub in subs:
-                            updated_line, count = sub.pattern.subn(sub.replacement, updated_line)
-                            total_replacements += count
-
-                        updated_lines.append(updated_line)
-            except UnicodeDecodeError:
-                print(f'Unable to read: {item}', file=stderr)
-                continue
+            files.append(item)
+
+    return files
 
-            if total_replacements:
-                adjusted_files.append(item)
 
-                with item.open('w') as f:
-                    f.writelines(updated_lines)
+def replace_in_dir(dir_path: Path, subs: Iterable[ReSub], dry_run: bool = False) -> Dict[Path, int]:
+    """
+    Rewrites the files of `dir_path` in parallel processes
+
+    :return: number of replacements per adjusted file
+    """
+    sub = CombinedSub(subs)
+    files = list_files(dir_path)
+    adjusted_files = {}
+    with ProcessPoolExecutor() as executor:
+        for path, count in zip(files, executor.map(rewrite_file, files, repeat(sub), repeat(dry_run), chunksize=16)):
+            if count is None:
+                if verbose:
+                    print(f'Skipped binary or non UTF-8 file: {path}', file=stderr)
+            elif count:
+                adjusted_files[path] = count
 
     return adjusted_files
 
@@ -99,9 +166,12 @@ if __name__ == '__main__':
     parser.add_argument('-d', '--destination', type=Path, default=SCRIPT_DIR.parent,
                         help='Path to the destination directory where the fork should be created in')
     parser.add_argument('-v', '--verbose', action='store_true')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='Only list the replacements per file (in this project) without creating the fork')
     args = parser.parse_args()
     destination_dir: Path = args.destination
     verbose = args.verbose
+    dry_run = args.dry_run
 
     if not destination_dir.is_dir():
         fatal_error(f'Destination directory does not exist: {destination_dir}')
@@ -121,6 +191,22 @@ if __name__ == '__main__':
     django_root = project_root.joinpath(django_project_name)
     django_project_dir = django_root.joinpath(django_project_name)
 
+    # Replace project name and directory references in files (django-starter, django_starter)
+    project_subs = [
+        ReSub(re.compile('django-starter'), project_name),
+        ReSub(re.compile('django_starter'), django_project_name),
+        ReSub(re.compile('Django Starter'), project_name),
+    ]
+
+    if dry_run:
+        start = time()
+        replacements = replace_in_dir(SCRIPT_DIR, project_subs, dry_run=True)
+        replacements.pop(Path(__file__).absolute(), None)
+        for path, count in sorted(replacements.items()):
+            print(f'{str(path.relative_to(SCRIPT_DIR)):<{TP * 2}}{count:>6}')
+        print(f'{len(replacements)} files, {sum(replacements.values())} replacements, took {time() - start:.3f}s')
+        exit(0)
+
     if project_root.is_dir():
         fatal_error(f'Project root already exists: {project_root}')
 
@@ -133,14 +219,10 @@ if __name__ == '__main__':
     django_root = rename_dir(project_root.joinpath('django_starter'), django_root, 'Django Root')
     django_project_dir = rename_dir(django_root.joinpath('django_starter'), django_project_dir, 'Django Project Dir')
 
-    # Replace project name and directory references in files (django-starter, django_starter)
     print(f'{"Rewriting project files":<{TP}}', end='', flush=True)
-    updated_files = set(replace_in_dir(project_root, [
-        ReSub(re.compile('django-starter'), project_name),
-        ReSub(re.compile('django_starter'), django_project_name),
-        ReSub(re.compile('Django Starter'), project_name),
-    ]))
-    print(len(updated_files))
+    start = time()
+    updated_files = replace_in_dir(project_root, project_subs)
+    print(f'{len(updated_files)} ({time() - start:.2f}s)')
 
     # Rename Intellij .iml file
     idea_dir = project_root.joinpath('.idea')
@@ -5,16 +5,19 @@ __contact__ = 'adrian@viagis.app'
 __copyright__ = 'Copyright 2021 VIAGIS'
 __project__ = 'django-starter'
 
+import json
 import re
 import shutil
+import stat
 import string
 from argparse import ArgumentParser
 from enum import Enum
 from hashlib import sha256
+from os import environ
 from pathlib import Path
 from random import SystemRandom
 from sys import stderr
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 
 
 class Environment(Enum):
@@ -30,6 +33,12 @@ SCRIPT_DIR = Path(__file__).absolute().parent
 ENV_FILE_NAME = '.env'
 SECRET_TXT_FILE_NAME = 'secret.txt'
 SETTINGS_LOCAL_FILE_NAME = 'settings_local.py'
+STATE_FILE_NAME = '.init-state.json'
+STATE_VERSION = 1
+
+OK = 'OK'
+CREATED = 'CREATED'
+UPDATED = 'UPDATED'
 
 
 def fatal_error(message: str, exit_code: int = 1):
@@ -37,26 +46,76 @@ def fatal_error(message: str, exit_code: int = 1):
     exit(exit_code)
 
 
-def find_django_dir() -> Optional[Path]:
-    for item in SCRIPT_DIR.iterdir():
-        if not item.is_dir() or item.name.startswith('.'):
+def find_dir_containing(directory: Path, file_name: str, hint: Optional[Path] = None) -> Optional[Path]:
+    """
+    Finds the sub directory of `directory` containing `file_name`, trying `hint` (e.g. from the state) first
+
+    :return: None if not found
+    """
+    if hint and hint.joinpath(file_name).is_file():
+        return hint
+
+    for item in directory.iterdir():
+        if item.name.startswith('.') or not item.is_dir():
             continue
 
-        if next(item.glob('manage.py'), None):
+        if item.joinpath(file_name).is_file():
             return item
 
     return None
 
 
-def find_django_settings_dir(directory: Path) -> Optional[Path]:
-    for item in directory.iterdir():
-        if not item.is_dir():
-            continue
+def find_django_dir(hint: Optional[Path] = None) -> Optional[Path]:
+    return find_dir_containing(SCRIPT_DIR, 'manage.py', hint)
 
-        if next(item.glob('settings.py'), None):
-            return item
 
-    return None
+def find_django_settings_dir(directory: Path, hint: Optional[Path] = None) -> Optional[Path]:
+    return find_dir_containing(directory, 'settings.py', hint)
+
+
+def file_signature(file_path: Path) -> Optional[List[int]]:
+    """
+    Cheap change detection without reading the file
+
+    :return: modification time, size and permissions or None if the file doesn't exist
+    """
+    try:
+        file_stat = file_path.stat()
+    except FileNotFoundError:
+        return None
+
+    return [file_stat.st_mtime_ns, file_stat.st_size, stat.S_IMODE(file_stat.st_mode)]
+
+
+def read_state(file_path: Path) -> dict:
+    try:
+        with file_path.open() as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    return state if isinstance(state, dict) and state.get('version') == STATE_VERSION else {}
+
+
+def write_state(file_path: Path, state: dict):
+    with file_path.open('w') as f:
+        json.dump({'version': STATE_VERSION, **state}, f, indent=2)
+
+
+def is_up_to_date(state: dict, env: Environment, hook_scripts: List[Path]) -> bool:
+    """
+    Whether nothing changed since the state was written: same environment, PATH (part of the git hooks), hook scripts
+    and unchanged signatures of all files written by this script
+    """
+    if not state or state.get('environment') != env.name or state.get('path') != environ.get('PATH'):
+        return False
+
+    files: Dict[str, list] = state.get('files', {})
+    hook_names = {str(it.relative_to(SCRIPT_DIR)) for it in hook_scripts}
+    if env == Environment.debug and not hook_names.issubset(files):
+        return False
+
+    return all(file_signature(SCRIPT_DIR.joinpath(path)) == signature for path, signature in files.items())
 
 
 def update_env_file(file_path: Path, env: Environment, dry_run: bool = False) -> bool:
@@ -93,27 +152,142 @@ def update_secret_txt(file_path: Path, length: int):
         f.write(''.join(sys_random.choices(letters, k=length)))
 
 
+def sha256_from_file(file_path: Path) -> str:
+    file_hash = sha256()
+    with file_path.open('rb') as f:
+        file_hash.update(f.read())
+
+    return file_hash.hexdigest()
+
+
+def init_env_file(file_path: Path, env: Environment, dry_run: bool = False) -> str:
+    if file_path.exists():
+        if not file_path.is_file():
+            fatal_error(f'{ENV_FILE_NAME} is not a file!')
+
+        return UPDATED if update_env_file(file_path, env, dry_run) else OK
+
+    env_file_sample = SCRIPT_DIR.joinpath('.env.example')
+    if not env_file_sample.is_file():
+        fatal_error(f'Missing file: {env_file_sample}')
+
+    if not dry_run:
+        shutil.copy(env_file_sample, file_path)
+        update_env_file(file_path, env)
+
+    return CREATED
+
+
+def init_secret_txt(file_path: Path, length: int, force: bool = False, dry_run: bool = False) -> str:
+    if file_path.exists():
+        if not file_path.is_file():
+            fatal_error(f'{SECRET_TXT_FILE_NAME} is not a file!')
+
+        if not force:
+            return OK
+
+    if not dry_run:
+        update_secret_txt(file_path, length)
+
+    return CREATED
+
+
+def init_settings_local(file_path: Path, dry_run: bool = False) -> str:
+    if file_path.exists():
+        if not file_path.is_file():
+            fatal_error(f'{SETTINGS_LOCAL_FILE_NAME} is not a file!')
+
+        return OK
+
+    settings_local_example = file_path.parent.joinpath('settings_local.example.py')
+    if not settings_local_example.is_file():
+        fatal_error(f'Missing file: {settings_local_example}')
+
+    if not dry_run:
+        shutil.copy(settings_local_example, file_path)
+
+    return CREATED
+
+
+def install_git_hooks(hook_scripts: List[Path], git_hook_dir: Path, dry_run: bool = False) -> Tuple[str, List[Path]]:
+    """
+    Installs the hook scripts with the current PATH, so the hooks find the tools of the environment (e.g. poetry)
+
+    :return: the status and the installed hook files
+    """
+    if not git_hook_dir.is_dir() and not dry_run:
+        git_hook_dir.mkdir()
+
+    status = OK
+    dest_files = []
+    permissions = 0o755
+    for script_file in hook_scripts:
+        dest_file = git_hook_dir.joinpath(script_file.stem)
+        dest_files.append(dest_file)
+
+        with script_file.open() as f:
+            script_contents = f.read()
+
+        script_contents = f"""#!/usr/bin/env bash
+
+export PATH="$PATH:{environ.get('PATH')}"
+
+{script_contents}"""
+
+        script_hash = sha256(script_contents.encode()).hexdigest()
+        if not dest_file.is_file() or sha256_from_file(dest_file) != script_hash:
+            if not dry_run:
+                with dest_file.open('w+') as f:
+                    f.write(script_contents)
+
+            status = CREATED
+
+        if dest_file.is_file() and stat.S_IMODE(dest_file.stat().st_mode) != permissions:
+            if not dry_run:
+                dest_file.chmod(permissions)
+
+            status = status if status == CREATED else UPDATED
+
+    return status, dest_files
+
+
 if __name__ == '__main__':
-    parser = ArgumentParser(description='Creates the necessary files for running the project.')
+    parser = ArgumentParser(description='Creates the necessary files for running the project. '
+                                        'Does nothing if nothing changed since the last run (see .init-state.json).')
     parser.add_argument('environment', type=str, help=f'Project environment ({ENVIRONMENT_OPTIONS_NAMES})')
     parser.add_argument('-l', '--length', type=int, default=512, help='Length of the generated secret')
     parser.add_argument('-f', '--force', action='store_true', help='Overwrite existing secret.txt')
+    parser.add_argument('-c', '--check', action='store_true',
+                        help='Only check whether the project is initialized, fails if a file would be changed (CI)')
     args = parser.parse_args()
 
     secret_length = args.length
     force = args.force
+    check = args.check
     environment_name = args.environment
     environment: Environment = next((it for it in ENVIRONMENT_OPTIONS if it.name == environment_name), None)
     if environment not in ENVIRONMENT_OPTIONS:
         fatal_error(f'Invalid environment specified! ({ENVIRONMENT_OPTIONS_NAMES})')
 
+    state_file = SCRIPT_DIR.joinpath(STATE_FILE_NAME)
+    state = read_state(state_file)
+
+    git_hook_dir = SCRIPT_DIR.joinpath('.git', 'hooks')
+    hook_dir = SCRIPT_DIR.joinpath('git-hooks')
+    hook_scripts = sorted(hook_dir.glob('*.sh')) if environment == Environment.debug else []
+
+    if not force and is_up_to_date(state, environment, hook_scripts):
+        print(f'Up to date ({environment.name})')
+        exit(0)
+
     env_file = SCRIPT_DIR.joinpath(ENV_FILE_NAME)
 
-    django_dir = find_django_dir()
+    django_dir = find_django_dir(SCRIPT_DIR.joinpath(state['django_dir']) if 'django_dir' in state else None)
     if not django_dir:
         fatal_error('Unable to find django dir.')
 
-    settings_dir = find_django_settings_dir(django_dir)
+    settings_dir = find_django_settings_dir(
+        django_dir, SCRIPT_DIR.joinpath(state['settings_dir']) if 'settings_dir' in state else None)
     if not settings_dir:
         fatal_error('Unable to find django project dir.')
 
@@ -126,98 +300,32 @@ if __name__ == '__main__':
         settings_local,
     ]) + 5
 
-    print(f'{str(env_file.relative_to(SCRIPT_DIR)):<{padding}}', end='')
-    if env_file.exists():
-        if not env_file.is_file():
-            fatal_error(f'{ENV_FILE_NAME} is not a file!')
-
-        if update_env_file(env_file, environment):
-            print('UPDATED')
-        else:
-            print('OK')
-    else:
-        env_file_sample = SCRIPT_DIR.joinpath('.env.example')
-        if not env_file_sample.is_file():
-            fatal_error(f'Missing file: {env_file_sample}')
-
-        shutil.copy(env_file_sample, env_file)
-        update_env_file(env_file, environment)
-        print('CREATED')
-
-    print(f'{str(secret_txt.relative_to(SCRIPT_DIR)):<{padding}}', end='')
-    if secret_txt.exists():
-        if not secret_txt.is_file():
-            fatal_error(f'{SECRET_TXT_FILE_NAME} is not a file!')
-
-        if force:
-            update_secret_txt(secret_txt, secret_length)
-            print('CREATED')
-        else:
-            print('OK')
-    else:
-        secret_txt.touch()
-        update_secret_txt(secret_txt, secret_length)
-        print('CREATED')
-
-    print(f'{str(settings_local.relative_to(SCRIPT_DIR)):<{padding}}', end='')
-    if settings_local.exists():
-        if not settings_local.is_file():
-            fatal_error(f'{SETTINGS_LOCAL_FILE_NAME} is not a file!')
+    statuses = []
+    tracked_files = [env_file, secret_txt, settings_local]
 
-        print('OK')
-    else:
-        settings_local_example = settings_dir.joinpath('settings_local.example.py')
-        if not settings_local_example.is_file():
-            fatal_error(f'Missing file: {settings_local_example}')
+    def print_status(title: str, status: str):
+        statuses.append(status)
+        print(f'{title:<{padding}}{status if status == OK or not check else f"{status} (required)"}')
 
-        shutil.copy(settings_local_example, settings_local)
-        print('CREATED')
+    print_status(str(env_file.relative_to(SCRIPT_DIR)), init_env_file(env_file, environment, check))
+    print_status(str(secret_txt.relative_to(SCRIPT_DIR)), init_secret_txt(secret_txt, secret_length, force, check))
+    print_status(str(settings_local.relative_to(SCRIPT_DIR)), init_settings_local(settings_local, check))
 
     if environment == Environment.debug:
-        print(f'{"Git Hooks":<{padding}}', end='')
-
-        project_root = SCRIPT_DIR
-        git_hook_dir = project_root.joinpath('.git', 'hooks')
-        hook_dir = project_root.joinpath('git-hooks')
-        if not git_hook_dir.is_dir():
-            git_hook_dir.mkdir()
         if not hook_dir.is_dir():
             fatal_error('Unable to find git hooks in project!')
 
-        created = False
-        for script_file in hook_dir.glob('*.sh'):
-            dest_file = git_hook_dir.joinpath(script_file.name.replace(script_file.suffix, ''))
-
-
-            def sha256_from_file(file_path: Path) -> str:
-                file_hash = sha256()
-                with file_path.open('rb') as f:
-                    file_hash.update(f.read())
-
-                return file_hash.hexdigest()
-
-
-            with script_file.open() as f:
-                script_contents = f.read()
-
-            from os import environ
-
-            script_contents = f"""#!/usr/bin/env bash
-    
-    export PATH="$PATH:{environ.get('PATH')}"
-    
-    {script_contents}"""
-
-            script_hash = sha256(script_contents.encode()).hexdigest()
-            if not dest_file.is_file() or sha256_from_file(dest_file) != script_hash:
-                with dest_file.open('w+') as f:
-                    f.write(script_contents)
-
-                created = True
-
-            permissions = 0o755
-            if dest_file.stat().st_mode != permissions:
-                dest_file.chmod(permissions)
+        hooks_status, hook_files = install_git_hooks(hook_scripts, git_hook_dir, check)
+        print_status('Git Hooks', hooks_status)
+        tracked_files += hook_scripts + hook_files
 
-        print('CREATED' if created else 'OK')
+    if check:
+        exit(0 if all(it == OK for it in statuses) else 1)
 
+    write_state(state_file, {
+        'environment': environment.name,
+        'path': environ.get('PATH'),
+        'django_dir': str(django_dir.relative_to(SCRIPT_DIR)),
+        'settings_dir': str(settings_dir.relative_to(SCRIPT_DIR)),
+        'files': {str(it.relative_to(SCRIPT_DIR)): file_signature(it) for it in tracked_files},
+    })